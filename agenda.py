@@ -0,0 +1,260 @@
+"""Motor de agendamento: detecção de conflitos de sala e de médico.
+
+Centraliza a pergunta "o intervalo [inicio, inicio + duracao) cruza algum
+agendamento desta sala ou deste médico?", usada pela rota de agendamento e por
+chamadores em lote, a busca de horários livres e a criação de séries
+recorrentes.
+"""
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from itertools import product
+
+from sqlalchemy import bindparam, or_, select
+
+from extensions import db
+from models import Appointment
+
+# Maior duração aceita em AppointmentForm.duracao (minutos). Um agendamento que
+# começa antes de `inicio - DURACAO_MAXIMA` não alcança `inicio`, então a busca
+# por conflitos vira uma única consulta por intervalo em `data_hora`.
+DURACAO_MAXIMA = 60
+
+# Expediente da clínica: agendamentos começam entre HORA_ABERTURA e HORA_FECHAMENTO,
+# inclusive (a rota de agendamento aceita uma consulta às 17:00, que termina depois)
+HORA_ABERTURA = 9
+HORA_FECHAMENTO = 17
+
+SALAS = ('Sala 1', 'Sala 2', 'Sala 3', 'Sala 4')
+
+Ocupacao = namedtuple('Ocupacao', 'id sala medico_id inicio fim')
+Livre = namedtuple('Livre', 'sala inicio fim')
+
+
+def _ocupacao(row):
+    return Ocupacao(row.id, row.sala, row.medico_id, row.data_hora,
+                    row.data_hora + timedelta(minutes=row.duracao))
+
+
+def _consulta_ocupacoes(por_sala, por_medico, excluir):
+    """Monta (uma vez por combinação de filtros) o SELECT por intervalo em data_hora."""
+    colunas = Appointment.__table__.c
+    stmt = select(colunas.id, colunas.sala, colunas.medico_id, colunas.data_hora, colunas.duracao).where(
+        colunas.data_hora > bindparam('desde'),
+        colunas.data_hora < bindparam('ate'),
+    )
+    filtros = []
+    if por_sala:
+        filtros.append(colunas.sala == bindparam('sala'))
+    if por_medico:
+        filtros.append(colunas.medico_id == bindparam('medico_id'))
+    if filtros:
+        stmt = stmt.where(or_(*filtros))
+    if excluir:
+        stmt = stmt.where(colunas.id != bindparam('excluir_id'))
+    return stmt.order_by(colunas.data_hora)
+
+
+_CONSULTAS = {chave: _consulta_ocupacoes(*chave) for chave in product((False, True), repeat=3)}
+
+
+def buscar_ocupacoes(inicio, fim, sala=None, medico_id=None, excluir_id=None):
+    """Agendamentos da sala e/ou do médico que podem cruzar [inicio, fim)."""
+    stmt = _CONSULTAS[(sala is not None, medico_id is not None, excluir_id is not None)]
+    params = {'desde': inicio - timedelta(minutes=DURACAO_MAXIMA), 'ate': fim,
+              'sala': sala, 'medico_id': medico_id, 'excluir_id': excluir_id}
+    return [_ocupacao(row) for row in db.session.connection().execute(stmt, params)]
+
+
+def verificar_conflito(inicio, duracao, sala=None, medico_id=None, excluir_id=None):
+    """Retorna o primeiro agendamento que se sobrepõe ao novo horário, ou None.
+
+    O conflito pode ser de sala (`ocupacao.sala == sala`) ou do médico.
+    """
+    fim = inicio + timedelta(minutes=duracao)
+    for ocupacao in buscar_ocupacoes(inicio, fim, sala, medico_id, excluir_id):
+        if inicio < ocupacao.fim and fim > ocupacao.inicio:
+            return ocupacao
+    return None
+
+
+class IndiceOcupacao:
+    """Índice em memória dos horários ocupados, por sala e por médico, em cada dia.
+
+    Pensado para verificar muitos horários de uma vez: carrega o período com
+    uma única consulta e responde cada verificação com busca binária.
+    """
+
+    def __init__(self, ocupacoes=()):
+        # (tipo, chave, dia) -> (inícios ordenados, ocupações na mesma ordem)
+        self._intervalos = defaultdict(lambda: ([], []))
+        for ocupacao in ocupacoes:
+            self.adicionar(ocupacao)
+
+    @classmethod
+    def carregar(cls, inicio, fim, sala=None, medico_id=None):
+        return cls(buscar_ocupacoes(inicio, fim, sala, medico_id))
+
+    def adicionar(self, ocupacao):
+        dia = ocupacao.inicio.date()
+        chaves = []
+        if ocupacao.sala is not None:
+            chaves.append(('sala', ocupacao.sala, dia))
+        if ocupacao.medico_id is not None:
+            chaves.append(('medico', ocupacao.medico_id, dia))
+        for chave in chaves:
+            inicios, ocupacoes = self._intervalos[chave]
+            pos = bisect_right(inicios, ocupacao.inicio)
+            inicios.insert(pos, ocupacao.inicio)
+            ocupacoes.insert(pos, ocupacao)
+
+    def _conflito_em(self, chave, inicio, fim):
+        if chave not in self._intervalos:
+            return None
+        inicios, ocupacoes = self._intervalos[chave]
+        # Só os intervalos que começam antes de `fim` podem cruzar; como nenhum
+        # dura mais que DURACAO_MAXIMA, basta olhar para trás até esse limite.
+        limite = inicio - timedelta(minutes=DURACAO_MAXIMA)
+        pos = bisect_left(inicios, fim) - 1
+        while pos >= 0 and inicios[pos] > limite:
+            if ocupacoes[pos].fim > inicio:
+                return ocupacoes[pos]
+            pos -= 1
+        return None
+
+    def conflito(self, inicio, duracao, sala=None, medico_id=None):
+        """Mesma semântica de `verificar_conflito`, sem acessar o banco."""
+        fim = inicio + timedelta(minutes=duracao)
+        dia = inicio.date()
+        if sala is not None:
+            ocupacao = self._conflito_em(('sala', sala, dia), inicio, fim)
+            if ocupacao:
+                return ocupacao
+        if medico_id is not None:
+            return self._conflito_em(('medico', medico_id, dia), inicio, fim)
+        return None
+
+
+def _expediente(dia, duracao):
+    """Janela do dia para consultas de `duracao` minutos: a última começa às HORA_FECHAMENTO."""
+    return (datetime.combine(dia, time(HORA_ABERTURA)),
+            datetime.combine(dia, time(HORA_FECHAMENTO)) + timedelta(minutes=duracao))
+
+
+def horarios_livres(desde, ate, duracao, sala=None, medico_id=None, agora=None):
+    """Intervalos livres de cada sala, dia a dia, onde cabe uma consulta de `duracao` minutos.
+
+    Um intervalo é livre quando a sala está vaga e, se `medico_id` for dado,
+    o médico também está (em qualquer sala). Considera só o expediente dos
+    dias de `desde` a `ate`, de HORA_ABERTURA até HORA_FECHAMENTO + `duracao`
+    (uma consulta pode começar às HORA_FECHAMENTO, como na rota de
+    agendamento) e, se `agora` for dado, ignora o que já passou.
+
+    Todos os agendamentos do período vêm de uma única consulta; cada dia é
+    resolvido com uma varredura dos eventos de início/fim em ordem.
+    """
+    salas = (sala,) if sala else SALAS
+    primeiro, _ = _expediente(desde, duracao)
+    _, ultimo = _expediente(ate, duracao)
+    # Sem sala fixa, a ocupação de todas as salas importa, então não dá para filtrar por médico
+    ocupacoes = buscar_ocupacoes(primeiro, ultimo, sala=sala, medico_id=medico_id if sala else None)
+
+    # Eventos (instante, delta, sala ou None para o médico), já recortados ao expediente
+    eventos = defaultdict(list)
+    for ocupacao in ocupacoes:
+        abre, fecha = _expediente(ocupacao.inicio.date(), duracao)
+        inicio, fim = max(ocupacao.inicio, abre), min(ocupacao.fim, fecha)
+        if inicio >= fim:
+            continue
+        chaves = []
+        if ocupacao.sala in salas:
+            chaves.append(ocupacao.sala)
+        if medico_id is not None and ocupacao.medico_id == medico_id:
+            chaves.append(None)
+        for chave in chaves:
+            eventos[inicio.date()] += [(inicio, 1, chave), (fim, -1, chave)]
+
+    minimo = timedelta(minutes=duracao)
+    livres = []
+    dia = desde
+    while dia <= ate:
+        abre, fecha = _expediente(dia, duracao)
+        if agora is not None:
+            abre = max(abre, agora)
+        ocupadas = dict.fromkeys(salas, 0)
+        medico = 0
+        livre_desde = dict.fromkeys(salas, abre)
+
+        def fechar(s, instante):
+            if livre_desde[s] is not None and instante - livre_desde[s] >= minimo:
+                livres.append(Livre(s, livre_desde[s], instante))
+            livre_desde[s] = None
+
+        # Fins antes de inícios no mesmo instante: consultas encostadas não deixam buraco
+        for instante, delta, chave in sorted(eventos.get(dia, ()), key=lambda e: (e[0], e[1])):
+            instante = max(instante, abre)
+            afetadas = salas if chave is None else (chave,)
+            if chave is None:
+                medico += delta
+            else:
+                ocupadas[chave] += delta
+            for s in afetadas:
+                vaga = ocupadas[s] == 0 and medico == 0
+                if not vaga and livre_desde[s] is not None:
+                    fechar(s, instante)
+                elif vaga and livre_desde[s] is None:
+                    livre_desde[s] = instante
+        for s in salas:
+            if abre < fecha:
+                fechar(s, fecha)
+        dia += timedelta(days=1)
+    return livres
+
+
+# --- Séries recorrentes ---
+
+# Regra de recorrência -> intervalo entre ocorrências
+RECORRENCIAS = {'semanal': timedelta(weeks=1), 'quinzenal': timedelta(weeks=2)}
+OCORRENCIAS_MAXIMAS = 52
+
+Ocorrencia = namedtuple('Ocorrencia', 'inicio conflito')
+
+
+def gerar_ocorrencias(inicio, recorrencia, ocorrencias):
+    passo = RECORRENCIAS[recorrencia]
+    return [inicio + passo * i for i in range(ocorrencias)]
+
+
+def verificar_serie(inicios, duracao, sala, medico_id):
+    """Verifica todas as ocorrências de uma série com uma única consulta.
+
+    Retorna uma `Ocorrencia` por início, com o agendamento em conflito (de
+    sala ou do médico) ou None. As ocorrências livres entram no índice à
+    medida que são aceitas, então a série também não conflita consigo mesma.
+    """
+    if not inicios:
+        return []
+    fim = max(inicios) + timedelta(minutes=duracao)
+    indice = IndiceOcupacao.carregar(min(inicios), fim, sala=sala, medico_id=medico_id)
+    resultado = []
+    for inicio in inicios:
+        conflito = indice.conflito(inicio, duracao, sala=sala, medico_id=medico_id)
+        if conflito is None:
+            indice.adicionar(Ocupacao(None, sala, medico_id, inicio, inicio + timedelta(minutes=duracao)))
+        resultado.append(Ocorrencia(inicio, conflito))
+    return resultado
+
+
+def criar_serie(ocorrencias, paciente_id, medico_id, sala, duracao, observacoes=None):
+    """Insere as ocorrências livres num único INSERT em lote e retorna o id da série.
+
+    Não faz commit: quem chama decide a transação.
+    """
+    serie_id = uuid.uuid4().hex
+    linhas = [dict(paciente_id=paciente_id, medico_id=medico_id, sala=sala, data_hora=ocorrencia.inicio,
+                   duracao=duracao, observacoes=observacoes, serie_id=serie_id, criado_em=datetime.utcnow())
+              for ocorrencia in ocorrencias if ocorrencia.conflito is None]
+    if linhas:
+        db.session.execute(Appointment.__table__.insert(), linhas)
+    return serie_id
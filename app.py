@@ -1,36 +1,76 @@
-import os
+import click
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
-from flask_migrate import Migrate
-
-# --- Configuração do App ---
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'uma-chave-super-secreta-para-desenvolvimento')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///clinica.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-login_manager.login_message = 'Por favor, faça login para acessar esta página.'
-login_manager.login_message_category = 'warning'
-
-# Importar modelos, rotas e decoradores após instanciar app, db, login_manager
-from models import User
-from routes import *
-from decorators import *
-
-@login_manager.user_loader
+from flask.cli import with_appcontext
+
+from config import carregar_config, verificar_config
+from database import opcoes_engine, configurar_banco
+from extensions import db, migrate, login_manager
+from metrics import configurar_metricas
+from query_budget import configurar_orcamento
+
+
+# --- Fábrica da aplicação ---
+def create_app(config=None):
+    """Cria a aplicação. `config` é o nome do perfil (ver config.py) ou uma classe de configuração."""
+    app = Flask(__name__)
+    app.config.from_object(config if isinstance(config, type) else carregar_config(config))
+    verificar_config(app.config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(app.config)
+
+    db.init_app(app)
+    configurar_banco(app, db)
+    configurar_orcamento(app, db)
+    configurar_metricas(app, db)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+
+    # Importados aqui para que modelos, rotas e listeners só carreguem com a aplicação
+    from archive import arquivar_comando, configurar_arquivo
+    from assets import configurar_estaticos, construir_estaticos
+    from fragment_cache import configurar_fragmentos
+    from identity_cache import cache_usuarios
+    from jobs import interromper_exportacoes
+    from routes import bp as rotas
+    from patient_search import reindexar_pacientes
+    from record_search import reindexar_evolucoes
+    from patient_import import importar_pacientes_comando
+    from reminders import enviar_lembretes_comando
+    from query_plans import verificar_planos
+    from stats import reconstruir_estatisticas
+    from synthetic_data import gerar_dados_comando
+
+    cache_usuarios.configurar(app.config['USER_CACHE_TTL'], app.config['USER_CACHE_MAX'])
+    login_manager.user_loader(load_user)
+    configurar_fragmentos(app)
+    configurar_arquivo(app)
+    configurar_estaticos(app)
+
+    app.register_blueprint(rotas)
+    app.cli.add_command(create_admin)
+    app.cli.add_command(reindexar_pacientes)
+    app.cli.add_command(reindexar_evolucoes)
+    app.cli.add_command(verificar_planos)
+    app.cli.add_command(reconstruir_estatisticas)
+    app.cli.add_command(importar_pacientes_comando)
+    app.cli.add_command(gerar_dados_comando)
+    app.cli.add_command(arquivar_comando)
+    app.cli.add_command(construir_estaticos)
+    app.cli.add_command(enviar_lembretes_comando)
+    app.cli.add_command(interromper_exportacoes)
+    return app
+
+
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    from identity_cache import cache_usuarios, carregar_usuario
+    return cache_usuarios.obter(int(user_id), carregar_usuario)
+
 
 # Comando para criar usuário admin via CLI
-@app.cli.command("create-admin")
+@click.command("create-admin")
+@with_appcontext
 def create_admin():
-    from werkzeug.security import generate_password_hash
+    from models import User
+    from passwords import gerar_hash
     if User.query.filter_by(username='admin').first():
         print("Usuário 'admin' já existe.")
         return
@@ -38,7 +78,7 @@ def create_admin():
     print("Criando usuário admin inicial...")
     admin_user = User(
         username='admin',
-        senha=generate_password_hash('admin123', method='pbkdf2:sha256'),
+        senha=gerar_hash('admin123'),
         nome_completo='Dr. Admin',
         funcao='médico'
     )
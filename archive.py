@@ -0,0 +1,263 @@
+"""Arquivamento de agendamentos e evoluções antigos em um banco SQLite anexado.
+
+`appointment` e `medical_record` só crescem. `flask arquivar` move as linhas
+anteriores ao corte (ARQUIVO_DIAS) para cópias das duas tabelas em um segundo
+arquivo SQLite, anexado a cada conexão com o nome `arquivo` (ATTACH). As
+consultas do dia a dia (dashboard, agenda, conflitos, listagens) continuam
+lendo só as tabelas principais, que ficam do tamanho do período recente; o
+histórico completo de um paciente (prontuário e exportações) lê as duas com
+`uniao()`.
+
+Cada lote é movido em duas transações: a cópia é gravada e confirmada no
+arquivo (com synchronous=FULL) e só então as linhas saem do banco principal.
+Em WAL o COMMIT não é atômico entre dois arquivos; nessa ordem, uma falha no
+meio deixa a linha nos dois bancos, nunca em nenhum, e `uniao()` ignora a
+cópia arquivada de um id que ainda está no principal. Rodar o comando de novo
+termina o lote. Uma linha alterada entre as duas transações também fica no
+principal até a próxima execução.
+
+Os triggers das tabelas principais tratam a saída como exclusão: as versões
+de recurso (conditional.py) mudam, invalidando as páginas em cache, e a
+evolução sai do índice de busca do principal (record_search.py) e entra no
+índice do arquivo, na mesma transação da cópia: a busca continua cobrindo o
+histórico inteiro. As estatísticas (stats.py) recebem de volta, no mesmo lote,
+as linhas arquivadas. Como o DELETE do principal passa pelo trigger do índice
+de busca, `arquivar` recusa rodar se esse índice estiver incompleto (ver
+`flask reindexar-evolucoes`).
+
+A linha de maior id de cada tabela nunca é arquivada: o SQLite reaproveitaria
+esse id no próximo INSERT, e ele passaria a existir nos dois bancos. Se ela
+for excluída depois, o maior id do principal pode ficar abaixo do maior
+arquivado e os próximos INSERTs reaproveitarem ids do arquivo (que `uniao()`
+esconderia); `arquivar` confere isso antes de mover e para com
+IdsReaproveitados, para alguém decidir o que fazer com as linhas repetidas.
+
+As tabelas do arquivo são criadas com as colunas e índices dos modelos; uma
+migração que acrescente colunas a `appointment` ou `medical_record` precisa
+acrescentá-las também em `arquivo.<tabela>`.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Column, DateTime, Index, MetaData, Table, bindparam, event, exists, select, text, union_all
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import stats
+from calendar_feed import ICS_DIAS_ANTES
+from extensions import db
+from models import Appointment, MedicalRecord
+
+ESQUEMA = 'arquivo'
+LOTE_PADRAO = 2000
+
+_metadados = MetaData()
+
+
+def _copia(tabela):
+    """Mesmas colunas e índices de `tabela`, no esquema do arquivo (chaves estrangeiras não cruzam bancos)."""
+    copia = Table(tabela.name, _metadados,
+                  *(Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in tabela.columns),
+                  schema=ESQUEMA)
+    for indice in tabela.indexes:
+        Index(indice.name, *(copia.c[c.name] for c in indice.columns), unique=indice.unique)
+    return copia
+
+
+# Tabela principal -> coluna de data comparada com o corte
+DATAS = {Appointment.__table__: 'data_hora', MedicalRecord.__table__: 'data_sessao'}
+COPIAS = {tabela.name: _copia(tabela) for tabela in DATAS}
+
+_dialeto = sqlite.dialect()
+CRIAR_TABELAS = [str(CreateTable(copia, if_not_exists=True).compile(dialect=_dialeto)) for copia in COPIAS.values()]
+CRIAR_TABELAS += [str(CreateIndex(indice, if_not_exists=True).compile(dialect=_dialeto))
+                  for copia in COPIAS.values() for indice in copia.indexes]
+
+
+# --- Conexões ---
+
+def caminho_padrao(url):
+    """Ao lado do banco principal (clinica.db -> clinica_arquivo.db); em memória, outro banco em memória."""
+    url = make_url(url)
+    if url.database in (None, '', ':memory:'):
+        return ':memory:'
+    base, extensao = os.path.splitext(url.database)
+    return f'{base}_arquivo{extensao or ".db"}'
+
+
+def anexar(engine, caminho, journal_mode='WAL'):
+    """Anexa o arquivo a cada conexão nova do engine, criando as tabelas na primeira vez."""
+    import record_search  # importa ESQUEMA deste módulo
+
+    @event.listens_for(engine, 'connect')
+    def _anexar(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute(f'ATTACH DATABASE ? AS {ESQUEMA}', (caminho,))
+            cursor.execute(f'PRAGMA {ESQUEMA}.journal_mode = {journal_mode}')
+            # A cópia precisa estar no disco antes de a linha sair do banco principal
+            cursor.execute(f'PRAGMA {ESQUEMA}.synchronous = FULL')
+            for comando in CRIAR_TABELAS:
+                cursor.execute(comando)
+            # Índice de busca das evoluções arquivadas, preenchido ao nascer (arquivos anteriores a ele)
+            cursor.execute(f"SELECT 1 FROM {ESQUEMA}.sqlite_master WHERE name = 'evolucao_busca'")
+            if cursor.fetchone() is None:
+                for comando in record_search.criar_indice(ESQUEMA):
+                    cursor.execute(comando)
+                dbapi_conn.commit()
+        finally:
+            cursor.close()
+
+
+def configurar_arquivo(app):
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    # Gravado já resolvido: os processos de exportação (jobs.py) anexam o mesmo arquivo
+    app.config['ARQUIVO_DATABASE'] = app.config['ARQUIVO_DATABASE'] or caminho_padrao(engine.url)
+    anexar(engine, app.config['ARQUIVO_DATABASE'], app.config['SQLITE_JOURNAL_MODE'])
+
+
+# --- Leitura ---
+
+def uniao(tabela, *filtros):
+    """UNION ALL das linhas de `tabela` e da sua cópia arquivada que atendem aos `filtros`.
+
+    Cada filtro recebe as colunas (`.c`) de uma das duas tabelas e devolve a
+    condição, aplicada dos dois lados para que cada um use os seus índices.
+    """
+    copia = COPIAS[tabela.name]
+    principal = select(tabela).where(*(filtro(tabela.c) for filtro in filtros))
+    arquivada = select(copia).where(*(filtro(copia.c) for filtro in filtros),
+                                    ~exists().where(tabela.c.id == copia.c.id))
+    return union_all(principal, arquivada)
+
+
+def origem_completa(nome, colunas):
+    """Subconsulta SQL com `colunas` da tabela `nome` e da cópia arquivada, se houver (SQL textual, ex. stats.py)."""
+    if nome not in COPIAS:
+        return nome
+    return (f'(SELECT {colunas} FROM main.{nome} UNION ALL SELECT {colunas} FROM {ESQUEMA}.{nome} AS a '
+            f'WHERE NOT EXISTS (SELECT 1 FROM main.{nome} WHERE id = a.id))')
+
+
+# --- Arquivamento ---
+
+class IdsReaproveitados(Exception):
+    """O maior id do banco principal não passa do maior id arquivado."""
+
+
+class IndiceDeBuscaIncompleto(Exception):
+    """O índice de busca das evoluções não tem todas as linhas de medical_record."""
+
+
+def _conferir_indice_de_busca(conn):
+    # evolucao_busca_docsize tem uma linha por evolução indexada
+    indexadas = conn.execute(text('SELECT count(*) FROM main.evolucao_busca_docsize')).scalar()
+    evolucoes = conn.execute(text('SELECT count(*) FROM main.medical_record')).scalar()
+    if indexadas != evolucoes:
+        raise IndiceDeBuscaIncompleto(
+            f'O índice de busca tem {indexadas} de {evolucoes} evoluções; rode `flask reindexar-evolucoes` '
+            f'antes de arquivar (excluir uma evolução não indexada corrompe o índice).')
+
+
+def _conferir_ids(conn, nome):
+    principal = conn.execute(text(f'SELECT max(id) FROM main.{nome}')).scalar()
+    arquivado = conn.execute(text(f'SELECT max(id) FROM {ESQUEMA}.{nome}')).scalar()
+    if arquivado is not None and (principal or 0) <= arquivado:
+        raise IdsReaproveitados(
+            f'{nome}: o maior id do banco principal ({principal}) não passa do maior arquivado ({arquivado}); '
+            f'novas linhas podem ter reaproveitado ids do arquivo. Confira-as antes de arquivar de novo.')
+
+
+def _mover_lote(conn, tabela, corte, lote):
+    """Move até `lote` linhas anteriores ao corte; retorna quantas saíram do banco principal."""
+    import record_search  # importa ESQUEMA deste módulo
+    nome = tabela.name
+    nomes = [c.name for c in COPIAS[nome].columns]
+    colunas = ', '.join(nomes)
+    no_lote = 'id IN (SELECT id FROM temp.lote_arquivo)'
+
+    conn.execute(text('DELETE FROM temp.lote_arquivo'))
+    selecionadas = conn.execute(text(f"""
+        INSERT INTO temp.lote_arquivo (id)
+        SELECT id FROM main.{nome}
+        WHERE {DATAS[tabela]} < :corte AND id < (SELECT max(id) FROM main.{nome})
+        LIMIT :lote
+    """).bindparams(bindparam('corte', type_=DateTime)), {'corte': corte, 'lote': lote}).rowcount
+    if selecionadas:
+        indexada = nome == MedicalRecord.__tablename__
+        if indexada:
+            # Cópias de uma execução interrompida são substituídas: saem do índice antes
+            conn.execute(text(record_search.desindexar(ESQUEMA, no_lote)))
+        conn.execute(text(f'INSERT OR REPLACE INTO {ESQUEMA}.{nome} ({colunas}) '
+                          f'SELECT {colunas} FROM main.{nome} WHERE {no_lote}'))
+        if indexada:
+            conn.execute(text(record_search.indexar(ESQUEMA, no_lote)))
+    conn.commit()
+    if not selecionadas:
+        return 0
+
+    # Só sai do principal a linha idêntica à cópia já confirmada no arquivo
+    iguais = ' AND '.join(f'a.{c} IS main.{nome}.{c}' for c in nomes)
+    movidas = conn.execute(text(f"""
+        DELETE FROM main.{nome}
+        WHERE {no_lote} AND EXISTS (SELECT 1 FROM {ESQUEMA}.{nome} AS a WHERE {iguais})
+    """)).rowcount
+    conn.execute(text(f'DELETE FROM temp.lote_arquivo WHERE id IN (SELECT id FROM main.{nome})'))
+    # Os triggers de DELETE subtraíram as linhas das estatísticas; elas continuam valendo
+    for comando in stats.somas(nome, f'{ESQUEMA}.{nome}', no_lote):
+        conn.execute(text(comando))
+    conn.commit()
+    return movidas
+
+
+def arquivar(corte, lote=LOTE_PADRAO, eco=None):
+    """Move agendamentos e evoluções anteriores a `corte` para o arquivo, em lotes.
+
+    Retorna {tabela: linhas movidas}; levanta IdsReaproveitados ou IndiceDeBuscaIncompleto (ver o
+    início do módulo).
+    """
+    eco = eco or (lambda mensagem: None)
+    movidas = {}
+    with db.engine.connect() as conn:
+        _conferir_indice_de_busca(conn)
+        conn.execute(text('CREATE TEMP TABLE IF NOT EXISTS lote_arquivo (id INTEGER PRIMARY KEY)'))
+        conn.commit()
+        for tabela in DATAS:
+            _conferir_ids(conn, tabela.name)
+            movidas[tabela.name] = 0
+            while True:
+                no_lote = _mover_lote(conn, tabela, corte, lote)
+                # Lote vazio: nada mais a mover (ou só linhas que mudaram durante o lote)
+                if not no_lote:
+                    break
+                movidas[tabela.name] += no_lote
+                eco(f'{tabela.name}: {movidas[tabela.name]} linhas arquivadas.')
+    return movidas
+
+
+@click.command('arquivar')
+@click.option('--dias', type=int, default=None,
+              help='Arquiva o que for mais antigo que isso, em dias (padrão: ARQUIVO_DIAS).')
+@click.option('--lote', type=int, default=None, help='Linhas por lote (padrão: ARQUIVO_LOTE).')
+@with_appcontext
+def arquivar_comando(dias, lote):
+    """Move agendamentos e evoluções antigos para o banco de arquivo."""
+    dias = dias or current_app.config['ARQUIVO_DIAS']
+    # A agenda e o feed .ics leem só o banco principal
+    if dias <= ICS_DIAS_ANTES:
+        raise click.BadParameter(f'a agenda publica os últimos {ICS_DIAS_ANTES} dias; use mais que isso.',
+                                 param_hint='--dias')
+    corte = datetime.combine(date.today() - timedelta(days=dias), datetime.min.time())
+    try:
+        movidas = arquivar(corte, lote or current_app.config['ARQUIVO_LOTE'], eco=print)
+    except (IdsReaproveitados, IndiceDeBuscaIncompleto) as erro:
+        raise click.ClickException(str(erro))
+    print(f'Arquivados antes de {corte:%d/%m/%Y}: {movidas["appointment"]} agendamentos e '
+          f'{movidas["medical_record"]} evoluções em {current_app.config["ARQUIVO_DATABASE"]}.')
@@ -0,0 +1,263 @@
+"""Arquivos estáticos locais: dependências baixadas, nomes com hash e versões pré-comprimidas.
+
+`flask construir-estaticos` lê static/ (inclusive as dependências em
+static/vendor/, baixadas da CDN com --baixar) e grava em static/dist/ uma cópia
+de cada arquivo com o hash do conteúdo no nome (css/styles.3f2a1b9c0d.css),
+versões .br e .gz dos arquivos de texto e o manifest.json que liga o nome
+original ao compilado. As referências url(...) do CSS passam a apontar para os
+nomes com hash.
+
+Nos templates, `url_for` é a função deste módulo, que substitui a do Flask no
+Jinja: para o endpoint 'static' de um arquivo do manifesto ela devolve o
+endereço compilado, servido por `enviar_compilado` com Cache-Control immutable
+de um ano e a versão comprimida que o navegador aceitar. Como o nome muda com
+o conteúdo, o navegador nunca precisa revalidar. A sessão não é gravada nessas
+respostas (SessaoSemEstaticos): sem Set-Cookie nem Vary: Cookie, um cache
+compartilhado guarda uma cópia só por codificação. Fora do manifesto é o
+url_for de sempre, e uma dependência ainda não baixada cai no endereço da CDN.
+
+O manifesto é lido na inicialização: depois de construir, reinicie os workers.
+Arquivos de compilações anteriores continuam em static/dist, para páginas
+ainda em cache nos navegadores, até um `--limpar`.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import urllib.request
+
+import click
+from flask import current_app, request, send_from_directory, url_for as url_for_flask
+from flask.cli import with_appcontext
+from flask.sessions import SecureCookieSessionInterface
+
+PASTA_COMPILADOS = 'dist'
+ENDPOINT_COMPILADOS = 'main.estatico_compilado'
+MANIFESTO = 'manifest.json'
+UM_ANO = 365 * 24 * 3600
+TAMANHO_HASH = 10
+
+# Dependências copiadas para static/: caminho -> endereço da versão fixada
+DEPENDENCIAS = {
+    'vendor/bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'vendor/chart.js/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+}
+
+# Imagens e fontes já são comprimidas; só arquivos de texto ganham .br/.gz
+COMPRIMIVEIS = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml', '.ico'}
+# A versão comprimida só é guardada se tiver até 90% do tamanho original
+GANHO_MINIMO = 0.9
+# Codificação -> sufixo, na ordem de preferência
+CODIFICACOES = {'br': '.br', 'gzip': '.gz'}
+
+_URL_CSS = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def caminho_manifesto(app):
+    return os.path.join(app.static_folder, PASTA_COMPILADOS, MANIFESTO)
+
+
+def _gravar(caminho, conteudo):
+    """Grava de forma atômica: quem lê nunca encontra um arquivo pela metade."""
+    pasta = os.path.dirname(caminho)
+    os.makedirs(pasta, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+# --- Construção ---
+
+def baixar_dependencias(pasta_static, atualizar=False, eco=None):
+    """Baixa as DEPENDENCIAS que ainda não estão em static/ (todas, com `atualizar`)."""
+    eco = eco or (lambda mensagem: None)
+    for nome, url in DEPENDENCIAS.items():
+        destino = os.path.join(pasta_static, nome)
+        if os.path.exists(destino) and not atualizar:
+            continue
+        with urllib.request.urlopen(url, timeout=30) as resposta:
+            conteudo = resposta.read()
+        _gravar(destino, conteudo)
+        eco(f'{nome}: {len(conteudo)} bytes de {url}')
+
+
+def _fontes(pasta_static):
+    """Caminhos (com '/') dos arquivos de static/, fora static/dist e arquivos ocultos."""
+    for raiz, pastas, arquivos in os.walk(pasta_static):
+        if raiz == pasta_static:
+            pastas[:] = [pasta for pasta in pastas if pasta != PASTA_COMPILADOS]
+        for arquivo in arquivos:
+            if not arquivo.startswith('.'):
+                yield os.path.relpath(os.path.join(raiz, arquivo), pasta_static).replace(os.sep, '/')
+
+
+def _com_hash(nome, conteudo):
+    base, extensao = posixpath.splitext(nome)
+    return f'{base}.{hashlib.sha256(conteudo).hexdigest()[:TAMANHO_HASH]}{extensao}'
+
+
+def _reescrever_css(nome, conteudo, compilados):
+    """Troca os url(...) que apontam para arquivos de static/ pelos nomes com hash."""
+    pasta = posixpath.dirname(nome)
+
+    def trocar(encontrado):
+        aspas, alvo = encontrado.groups()
+        caminho = re.split('[?#]', alvo, maxsplit=1)[0]
+        if caminho.startswith('/static/'):
+            referido = caminho[len('/static/'):]
+        elif caminho and not caminho.startswith(('/', 'data:', 'http:', 'https:')):
+            referido = posixpath.normpath(posixpath.join(pasta, caminho))
+        else:
+            return encontrado.group(0)
+        if referido not in compilados:
+            return encontrado.group(0)
+        # O CSS compilado fica na mesma estrutura de pastas, dentro de static/dist
+        novo = posixpath.relpath(compilados[referido], pasta or '.')
+        return f'url({aspas}{novo}{alvo[len(caminho):]}{aspas})'
+
+    return _URL_CSS.sub(trocar, conteudo.decode('utf-8')).encode('utf-8')
+
+
+def _compressores(eco):
+    compressores = {}
+    try:
+        import brotli
+    except ImportError:
+        eco('Módulo brotli não instalado: só versões .gz.')
+    else:
+        compressores['br'] = lambda dados: brotli.compress(dados, quality=11)
+    compressores['gzip'] = lambda dados: gzip.compress(dados, compresslevel=9, mtime=0)
+    return compressores
+
+
+def construir(pasta_static, limpar=False, eco=None):
+    """Compila static/ em static/dist/ e grava o manifesto; retorna o manifesto."""
+    eco = eco or (lambda mensagem: None)
+    destino = os.path.join(pasta_static, PASTA_COMPILADOS)
+    compressores = _compressores(eco)
+    # CSS por último: os arquivos que ele referencia já precisam ter o nome com hash
+    nomes = sorted(_fontes(pasta_static), key=lambda nome: (nome.endswith('.css'), nome))
+    manifesto, compilados = {}, {}
+    for nome in nomes:
+        with open(os.path.join(pasta_static, nome), 'rb') as arquivo:
+            conteudo = arquivo.read()
+        if nome.endswith('.css'):
+            conteudo = _reescrever_css(nome, conteudo, compilados)
+        compilado = _com_hash(nome, conteudo)
+        caminho = os.path.join(destino, compilado)
+        # Mesmo hash, mesmo conteúdo: o que já existe não é refeito
+        if not os.path.exists(caminho):
+            _gravar(caminho, conteudo)
+        codificacoes = []
+        if posixpath.splitext(nome)[1] in COMPRIMIVEIS:
+            for codificacao, comprimir in compressores.items():
+                variante = caminho + CODIFICACOES[codificacao]
+                if not os.path.exists(variante):
+                    comprimido = comprimir(conteudo)
+                    if len(comprimido) > GANHO_MINIMO * len(conteudo):
+                        continue
+                    _gravar(variante, comprimido)
+                codificacoes.append(codificacao)
+        compilados[nome] = compilado
+        manifesto[nome] = {'arquivo': compilado, 'codificacoes': codificacoes}
+        eco(f'{nome} -> {compilado} {" ".join(codificacoes)}'.rstrip())
+    _gravar(os.path.join(destino, MANIFESTO), json.dumps(manifesto, indent=1, sort_keys=True).encode())
+
+    if limpar:
+        atuais = {MANIFESTO}
+        for item in manifesto.values():
+            atuais.add(item['arquivo'])
+            atuais.update(item['arquivo'] + CODIFICACOES[codificacao] for codificacao in item['codificacoes'])
+        for nome in list(_fontes(destino)):
+            if nome not in atuais:
+                os.remove(os.path.join(destino, nome))
+                eco(f'Removido: {nome}')
+    return manifesto
+
+
+@click.command('construir-estaticos')
+@click.option('--baixar', is_flag=True,
+              help='Baixa as dependências (Bootstrap, Chart.js) que faltam em static/vendor.')
+@click.option('--atualizar', is_flag=True, help='Com --baixar, baixa de novo mesmo as que já existem.')
+@click.option('--limpar', is_flag=True, help='Remove de static/dist o que não é da compilação atual.')
+@with_appcontext
+def construir_estaticos(baixar, atualizar, limpar):
+    """Gera static/dist: arquivos com hash no nome, versões .br/.gz e o manifesto."""
+    pasta = current_app.static_folder
+    if baixar:
+        baixar_dependencias(pasta, atualizar, eco=print)
+    manifesto = construir(pasta, limpar, eco=print)
+    print(f'{len(manifesto)} arquivos em {os.path.join(pasta, PASTA_COMPILADOS)}. Reinicie os workers.')
+
+
+# --- Uso ---
+
+def carregar_manifesto(app):
+    """{nome original: {'arquivo', 'codificacoes'}}; vazio sem compilação ou com ESTATICOS_MANIFESTO=0."""
+    if not app.config['ESTATICOS_MANIFESTO']:
+        return {}
+    try:
+        with open(caminho_manifesto(app), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+
+def url_for(endpoint, **values):
+    """url_for do Flask, com os arquivos estáticos compilados e as dependências ainda não baixadas."""
+    if endpoint == 'static' and 'filename' in values:
+        estado = current_app.extensions['estaticos']
+        compilado = estado['manifesto'].get(values['filename'])
+        if compilado is not None:
+            values.pop('filename')
+            return url_for_flask(ENDPOINT_COMPILADOS, nome=compilado['arquivo'], **values)
+        if values['filename'] in estado['faltando']:
+            return DEPENDENCIAS[values['filename']]
+    return url_for_flask(endpoint, **values)
+
+
+def enviar_compilado(nome):
+    """Arquivo de static/dist com cache de um ano, na versão comprimida que o navegador aceitar."""
+    pasta = os.path.join(current_app.static_folder, PASTA_COMPILADOS)
+    codificacao, sufixo = None, ''
+    for candidata, extensao in CODIFICACOES.items():
+        if request.accept_encodings[candidata] and os.path.isfile(os.path.join(pasta, nome + extensao)):
+            codificacao, sufixo = candidata, extensao
+            break
+    resposta = send_from_directory(pasta, nome + sufixo, max_age=UM_ANO,
+                                   mimetype=mimetypes.guess_type(nome)[0] or 'application/octet-stream')
+    if codificacao:
+        resposta.content_encoding = codificacao
+    resposta.vary.add('Accept-Encoding')
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
+
+
+class SessaoSemEstaticos(SecureCookieSessionInterface):
+    """Sessão de sempre, exceto nos arquivos compilados, onde nunca é gravada.
+
+    O after_request do Flask-Login lê a sessão em toda requisição, e o Flask
+    responde a qualquer leitura com Vary: Cookie.
+    """
+
+    def save_session(self, app, session, response):
+        if request.endpoint == ENDPOINT_COMPILADOS:
+            return
+        super().save_session(app, session, response)
+
+
+def configurar_estaticos(app):
+    app.session_interface = SessaoSemEstaticos()
+    app.extensions['estaticos'] = {
+        'manifesto': carregar_manifesto(app),
+        'faltando': {nome for nome in DEPENDENCIAS if not os.path.exists(os.path.join(app.static_folder, nome))},
+    }
+    app.jinja_env.globals['url_for'] = url_for
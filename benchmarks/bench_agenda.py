@@ -0,0 +1,98 @@
+"""Custo de /api/agenda e do feed .ics (calendar_feed.py).
+
+Gera dados com synthetic_data.gerar_dados e mede: uma semana de agenda da
+clínica toda e de um médico em /api/agenda, com o tamanho do JSON colunar
+comparado ao mesmo conteúdo em uma lista de objetos; e o feed .ics de um
+médico completo e revalidado com If-None-Match, como fazem os clientes de
+calendário a cada poucos minutos.
+
+Uso:
+    python benchmarks/bench_agenda.py --pacientes 5000 --agendamentos 100000 --repeticoes 100
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_agenda_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from calendar_feed import token_agenda  # noqa: E402
+from extensions import db  # noqa: E402
+from synthetic_data import gerar_dados  # noqa: E402
+
+app = create_app()
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+SENHA = 'bench123'
+
+
+def medir(motor, cliente, url, repeticoes, cabecalhos=None):
+    comandos = 0
+
+    def contar(*args):
+        nonlocal comandos
+        comandos += 1
+
+    event.listen(motor, 'before_cursor_execute', contar)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resposta = cliente.get(url, headers=cabecalhos or {})
+        corpo = resposta.get_data()
+    total = time.perf_counter() - inicio
+    event.remove(motor, 'before_cursor_execute', contar)
+    return resposta, corpo, total / repeticoes * 1000, comandos / repeticoes
+
+
+def como_objetos(agenda):
+    """O mesmo conteúdo como lista de objetos, com os nomes repetidos em cada item."""
+    colunas = agenda['colunas']
+    return [dict({chave: valores[i] for chave, valores in colunas.items()},
+                 paciente=agenda['pacientes'][str(colunas['paciente_id'][i])],
+                 medico=agenda['medicos'][str(colunas['medico_id'][i])])
+            for i in range(agenda['total'])]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pacientes', type=int, default=5000)
+    parser.add_argument('--agendamentos', type=int, default=100000)
+    parser.add_argument('--repeticoes', type=int, default=100)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        gerar_dados(args.pacientes, args.agendamentos, 0, senha=SENHA, anos=1)
+        motor = db.engine
+        link = f'/agenda/{token_agenda(1)}.ics'
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico001', 'password': SENHA})
+
+    segunda = date.today() - timedelta(days=date.today().weekday())
+    semana = f'inicio={segunda.isoformat()}&fim={(segunda + timedelta(days=7)).isoformat()}'
+    for nome, url in (('clínica, 1 semana', f'/api/agenda?{semana}'),
+                      ('médico, 1 semana', f'/api/agenda?{semana}&medico=1')):
+        resposta, corpo, ms, comandos = medir(motor, cliente, url, args.repeticoes)
+        agenda = json.loads(corpo)
+        objetos = len(json.dumps(como_objetos(agenda), ensure_ascii=False, separators=(',', ':')).encode())
+        print(f'{nome:<20} {agenda["total"]:5d} agendamentos  {ms:7.2f} ms  {comandos:.1f} SQL  '
+              f'{len(corpo):8d} bytes (objetos: {objetos} bytes)')
+
+    anonimo = app.test_client()
+    resposta, corpo, ms, comandos = medir(motor, anonimo, link, args.repeticoes)
+    print(f'{"feed .ics":<20} {corpo.count(b"BEGIN:VEVENT"):5d} eventos       {ms:7.2f} ms  {comandos:.1f} SQL  '
+          f'{len(corpo):8d} bytes')
+    resposta, corpo, ms, comandos = medir(motor, anonimo, link, args.repeticoes, {'If-None-Match': resposta.headers['ETag']})
+    print(f'{"feed .ics (304)":<20} {"":19} {ms:7.2f} ms  {comandos:.1f} SQL  {len(corpo):8d} bytes  [{resposta.status_code}]')
+
+
+if __name__ == '__main__':
+    main()
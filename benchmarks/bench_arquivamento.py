@@ -0,0 +1,115 @@
+"""Rotas antes e depois de arquivar o histórico antigo (archive.py).
+
+Gera alguns anos de agendamentos e evoluções com synthetic_data.gerar_dados,
+mede as rotas do dia a dia (só banco principal) e as do histórico completo de
+um paciente (UNION ALL com o arquivo), arquiva tudo que for mais antigo que
+--dias e mede de novo. O cache de fragmentos fica desligado para que cada
+requisição chegue ao banco.
+
+Uso:
+    python benchmarks/bench_arquivamento.py --agendamentos 300000 --registros 300000 --dias 365
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_arquivamento_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+os.environ.setdefault('FRAGMENTOS_MAX_ITENS', '0')
+
+from sqlalchemy import event, func, select, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from archive import arquivar  # noqa: E402
+from extensions import db  # noqa: E402
+from models import MedicalRecord  # noqa: E402
+from synthetic_data import gerar_dados  # noqa: E402
+
+app = create_app()
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+SENHA = 'bench123'
+
+
+def medir(motor, cliente, url, repeticoes):
+    comandos = 0
+
+    def contar(*args):
+        nonlocal comandos
+        comandos += 1
+
+    cliente.get(url).get_data()
+    event.listen(motor, 'before_cursor_execute', contar)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resposta = cliente.get(url)
+        resposta.get_data()
+    total = time.perf_counter() - inicio
+    event.remove(motor, 'before_cursor_execute', contar)
+    assert resposta.status_code == 200, (url, resposta.status_code)
+    return total / repeticoes * 1000, comandos / repeticoes
+
+
+def contagens():
+    return {tabela: (db.session.execute(text(f'SELECT count(*) FROM main.{tabela}')).scalar(),
+                     db.session.execute(text(f'SELECT count(*) FROM arquivo.{tabela}')).scalar())
+            for tabela in ('appointment', 'medical_record')}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pacientes', type=int, default=5000)
+    parser.add_argument('--agendamentos', type=int, default=300000)
+    parser.add_argument('--registros', type=int, default=300000)
+    parser.add_argument('--anos', type=int, default=5)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        gerar_dados(args.pacientes, args.agendamentos, args.registros, anos=args.anos, senha=SENHA)
+        # O paciente com mais evoluções: o pior caso do prontuário e da exportação
+        paciente_id = db.session.execute(
+            select(MedicalRecord.paciente_id).group_by(MedicalRecord.paciente_id)
+            .order_by(func.count().desc()).limit(1)).scalar()
+        motor = db.engine
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico001', 'password': SENHA})
+
+    segunda = date.today() - timedelta(days=date.today().weekday())
+    rotas = [
+        ('dashboard', '/dashboard'),
+        ('agendamento', '/agendamento'),
+        ('lista_agendamentos', '/lista_agendamentos'),
+        ('horarios_livres', '/api/horarios_livres'),
+        ('api_agenda (semana)', f'/api/agenda?inicio={segunda.isoformat()}&medico=1'),
+        ('prontuario', f'/prontuario/{paciente_id}'),
+        ('exportar_xlsx', f'/exportar_xlsx/{paciente_id}'),
+    ]
+    antes = {nome: medir(motor, cliente, url, args.repeticoes) for nome, url in rotas}
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        corte = datetime.combine(date.today() - timedelta(days=args.dias), datetime.min.time())
+        movidas = arquivar(corte, app.config['ARQUIVO_LOTE'])
+        segundos = time.perf_counter() - inicio
+        total = sum(movidas.values())
+        print(f'Arquivamento: {total} linhas em {segundos:.1f} s ({total / segundos:.0f}/s)')
+        for tabela, (principal, arquivo) in contagens().items():
+            print(f'  {tabela:<16} principal {principal:8d}   arquivo {arquivo:8d}')
+    depois = {nome: medir(motor, cliente, url, args.repeticoes) for nome, url in rotas}
+
+    print(f'{"rota":<22} {"antes":>10} {"depois":>10}   SQL')
+    for nome, _ in rotas:
+        (ms_antes, sql_antes), (ms_depois, sql_depois) = antes[nome], depois[nome]
+        print(f'{nome:<22} {ms_antes:8.2f} ms {ms_depois:8.2f} ms   {sql_antes:.0f} -> {sql_depois:.0f}')
+
+
+if __name__ == '__main__':
+    main()
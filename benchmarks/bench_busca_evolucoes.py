@@ -0,0 +1,73 @@
+"""Busca nas evoluções: índice FTS5 (record_search.py) contra varredura com LIKE.
+
+Gera evoluções com synthetic_data.gerar_dados, reconstrói o índice com
+record_search.reindexar (mostrando a vazão do 'rebuild') e mede
+uma página de resultados para termos frequentes e raros, com e sem filtro de
+paciente. A varredura com LIKE é o que se faria sem o índice: lê todos os
+textos e ainda não encontra "insonia" escrito "insônia".
+
+Uso:
+    python benchmarks/bench_busca_evolucoes.py --registros 200000 --repeticoes 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_busca_evolucoes_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from record_search import buscar_evolucoes, reindexar  # noqa: E402
+from synthetic_data import gerar_dados  # noqa: E402
+
+app = create_app()
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+LIKE = text("""
+    SELECT m.id, m.paciente_id, m.data_sessao, substr(m.evolucao, 1, 200) FROM medical_record AS m
+    WHERE m.evolucao LIKE :padrao {filtro} ORDER BY m.data_sessao DESC LIMIT 21
+""")
+
+
+def cronometrar(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registros', type=int, default=200000)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        gerar_dados(pacientes=max(args.registros // 20, 1), registros=args.registros)
+        inicio = time.perf_counter()
+        indexados = reindexar()
+        segundos = time.perf_counter() - inicio
+        print(f'Reindexação: {indexados} evoluções em {segundos:.1f} s ({indexados / segundos:.0f}/s)')
+
+        for termo, filtro in (('"higiene do sono"', None), ('insonia', None), ('clonazepam', None),
+                              ('"crises de panico"', None), ('insonia', 1), ('clonazepam', 1)):
+            ms_fts, (resultados, _) = cronometrar(lambda: buscar_evolucoes(termo, paciente_id=filtro),
+                                                  args.repeticoes)
+            padrao = '%' + termo.strip('"').replace('insonia', 'insônia').replace('panico', 'pânico') + '%'
+            consulta = text(LIKE.text.format(filtro='AND m.paciente_id = :paciente_id' if filtro else ''))
+            ms_like, linhas = cronometrar(lambda: db.session.execute(
+                consulta, {'padrao': padrao, 'paciente_id': filtro}).all(), args.repeticoes)
+            rotulo = f'{termo}' + (f' (paciente {filtro})' if filtro else '')
+            print(f'{rotulo:<30} FTS5 {ms_fts:8.2f} ms ({len(resultados)} na página)   '
+                  f'LIKE {ms_like:8.2f} ms ({len(linhas)} linhas)')
+
+
+if __name__ == '__main__':
+    main()
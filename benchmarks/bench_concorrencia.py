@@ -0,0 +1,148 @@
+"""Vazão mista de leitura/escrita no SQLite com vários perfis de PRAGMAs.
+
+Threads leitoras abrem o dashboard enquanto threads escritoras gravam
+agendamentos (POST /agendamento) sem conflito de horário entre si. Cada
+perfil roda em um processo separado com seu próprio banco temporário, já que
+os PRAGMAs são aplicados quando o engine abre as conexões.
+
+Uso:
+    python benchmarks/bench_concorrencia.py --leitores 8 --escritores 4 --segundos 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERFIS = {
+    # Padrões do SQLite (journal em rollback, fsync a cada commit) e o timeout de 5 s do driver
+    'legado': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT': '5000',
+               'SQLITE_MMAP_SIZE': '0', 'SQLITE_CACHE_SIZE': '-2000'},
+    # Perfil padrão de config.py
+    'wal': {},
+}
+
+SENHA = 'bench123'
+SLOTS_POR_DIA = 16  # 09:00 a 16:30, de 30 em 30 minutos
+
+
+def _executar_perfil(leitores, escritores, segundos):
+    sys.path.insert(0, RAIZ)
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import text
+
+    from app import create_app
+    from extensions import db
+    from models import User, Patient
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    # O custo do hash não interessa aqui; com o método padrão o login regravaria a senha
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        db.create_all()
+        senha_hash = generate_password_hash(SENHA, method=app.config['PASSWORD_HASH_METHOD'])
+        for i in range(max(escritores, 1)):
+            db.session.add(User(username=f'medico{i}', senha=senha_hash, nome_completo=f'Médico {i}',
+                                funcao='médico'))
+        paciente = Patient(nome_completo='Paciente Benchmark', data_nascimento=date(1990, 1, 1), endereco='Rua',
+                           email='bench@x.com', telefone='11999990000', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia')
+        db.session.add(paciente)
+        db.session.commit()
+        paciente_id = paciente.id
+        journal = db.session.execute(text('PRAGMA journal_mode')).scalar()
+
+    def autenticado(username):
+        cliente = app.test_client()
+        cliente.post('/login', data={'username': username, 'password': SENHA})
+        return cliente
+
+    clientes_leitura = [autenticado('medico0') for _ in range(leitores)]
+    clientes_escrita = [autenticado(f'medico{n}') for n in range(escritores)]
+
+    fim = None
+    contadores = {'leituras': 0, 'escritas': 0, 'bloqueios': 0, 'outros_erros': 0}
+    lock = threading.Lock()
+    inicio_agenda = datetime.combine(date.today() + timedelta(days=1), datetime.min.time()).replace(hour=9)
+
+    def contar(chave):
+        with lock:
+            contadores[chave] += 1
+
+    def requisitar(funcao, chave):
+        try:
+            resposta = funcao()
+        except Exception as exc:
+            contar('bloqueios' if 'database is locked' in str(exc) else 'outros_erros')
+            return
+        if resposta.status_code in (200, 302):
+            contar(chave)
+        else:
+            contar('outros_erros')
+
+    def leitor(cliente):
+        while time.monotonic() < fim:
+            requisitar(lambda: cliente.get('/dashboard'), 'leituras')
+
+    def escritor(cliente, n):
+        i = 0
+        while time.monotonic() < fim:
+            # Cada escritor usa slots próprios, então nenhuma gravação é recusada por conflito
+            slot = i * escritores + n
+            data_hora = inicio_agenda + timedelta(days=slot // SLOTS_POR_DIA,
+                                                  minutes=30 * (slot % SLOTS_POR_DIA))
+            dados = {'paciente_id': paciente_id, 'sala': f'Sala {n % 4 + 1}', 'duracao': '30',
+                     'data_hora': data_hora.strftime('%Y-%m-%dT%H:%M'), 'observacoes': ''}
+            requisitar(lambda: cliente.post('/agendamento', data=dados), 'escritas')
+            i += 1
+
+    threads = [threading.Thread(target=leitor, args=(cliente,)) for cliente in clientes_leitura]
+    threads += [threading.Thread(target=escritor, args=(cliente, n)) for n, cliente in enumerate(clientes_escrita)]
+    inicio = time.perf_counter()
+    fim = time.monotonic() + segundos
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contadores['segundos'] = time.perf_counter() - inicio
+    contadores['journal_mode'] = journal
+    print(json.dumps(contadores))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--leitores', type=int, default=8)
+    parser.add_argument('--escritores', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--perfil', choices=PERFIS, nargs='+', default=list(PERFIS))
+    parser.add_argument('--filho', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        _executar_perfil(args.leitores, args.escritores, args.segundos)
+        return
+
+    print(f'{args.leitores} leitores (GET /dashboard) + {args.escritores} escritores (POST /agendamento), '
+          f'{args.segundos:g} s por perfil, {os.cpu_count()} CPUs')
+    for nome in args.perfil:
+        ambiente = dict(os.environ, **PERFIS[nome])
+        ambiente['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_conc_'), 'bench.db')
+        saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--filho',
+                                '--leitores', str(args.leitores), '--escritores', str(args.escritores),
+                                '--segundos', str(args.segundos)],
+                               env=ambiente, capture_output=True, text=True, check=True)
+        r = json.loads(saida.stdout.strip().splitlines()[-1])
+        print(f'{nome:<8} ({r["journal_mode"]:<6}): '
+              f'leituras {r["leituras"] / r["segundos"]:7.1f}/s  escritas {r["escritas"] / r["segundos"]:6.1f}/s  '
+              f'"database is locked" {r["bloqueios"]}  outros erros {r["outros_erros"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark da verificação de conflitos de agendamento.
+
+Compara o laço antigo da rota /agendamento (carrega o dia inteiro da sala e
+testa em Python) com `agenda.verificar_conflito` e `agenda.IndiceOcupacao`.
+
+Uso:
+    python benchmarks/bench_conflitos.py --dias 365 --verificacoes 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_conflitos_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Patient, Appointment  # noqa: E402
+from agenda import verificar_conflito, IndiceOcupacao  # noqa: E402
+
+app = create_app()
+
+SALAS = ['Sala 1', 'Sala 2', 'Sala 3', 'Sala 4']
+INICIO = datetime(2025, 1, 6)
+
+
+def popular(dias, medicos):
+    db.create_all()
+    for i in range(medicos):
+        db.session.add(User(username=f'medico{i}', senha='x', nome_completo=f'Médico {i}', funcao='médico'))
+    db.session.add(Patient(nome_completo='Paciente', data_nascimento=INICIO.date(), endereco='-',
+                           email='p@exemplo.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia'))
+    db.session.commit()
+
+    linhas = []
+    for d in range(dias):
+        dia = INICIO + timedelta(days=d)
+        for s, sala in enumerate(SALAS):
+            hora = dia.replace(hour=9)
+            while hora.hour < 17:
+                duracao = random.choice((30, 40, 60))
+                linhas.append(dict(paciente_id=1, medico_id=(s % medicos) + 1, sala=sala,
+                                   data_hora=hora, duracao=duracao))
+                hora += timedelta(minutes=duracao)
+    db.session.execute(Appointment.__table__.insert(), linhas)
+    db.session.commit()
+    return len(linhas)
+
+
+def laco_antigo(novo_inicio, duracao, sala):
+    novo_fim = novo_inicio + timedelta(minutes=duracao)
+    inicio_dia = novo_inicio.replace(hour=0, minute=0, second=0, microsecond=0)
+    fim_dia = novo_inicio.replace(hour=23, minute=59, second=59, microsecond=999999)
+    agendamentos_no_dia = Appointment.query.filter(
+        Appointment.sala == sala,
+        Appointment.data_hora >= inicio_dia,
+        Appointment.data_hora <= fim_dia
+    ).all()
+    for ag in agendamentos_no_dia:
+        ag_inicio = ag.data_hora
+        ag_fim = ag_inicio + timedelta(minutes=ag.duracao)
+        if novo_inicio < ag_fim and novo_fim > ag_inicio:
+            return True
+    return False
+
+
+def medir(nome, funcao, casos):
+    inicio = time.perf_counter()
+    for caso in casos:
+        funcao(*caso)
+        db.session.expunge_all()
+    total = time.perf_counter() - inicio
+    print(f'{nome:<28} {total / len(casos) * 1e6:10.1f} µs/verificação')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--medicos', type=int, default=4)
+    parser.add_argument('--verificacoes', type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with app.app_context():
+        total = popular(args.dias, args.medicos)
+        print(f'{total} agendamentos em {args.dias} dias')
+        casos = [(INICIO + timedelta(days=random.randrange(args.dias), hours=random.randint(9, 16),
+                                     minutes=random.choice((0, 10, 20, 30, 40, 50))),
+                  random.choice((30, 40, 60)), random.choice(SALAS))
+                 for _ in range(args.verificacoes)]
+
+        medir('laço antigo (dia inteiro)', laco_antigo, casos)
+        medir('verificar_conflito', lambda i, d, s: verificar_conflito(i, d, sala=s, medico_id=1), casos)
+
+        indice = IndiceOcupacao.carregar(INICIO, INICIO + timedelta(days=args.dias))
+        for i, d, s in casos[:200]:
+            esperado = laco_antigo(i, d, s)
+            assert esperado == bool(verificar_conflito(i, d, sala=s)) == bool(indice.conflito(i, d, sala=s))
+        medir('IndiceOcupacao (memória)', lambda i, d, s: indice.conflito(i, d, sala=s, medico_id=1), casos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Arquivos estáticos: compilação (assets.py) e o que cada página custa em rede.
+
+Compila static/ em uma cópia temporária, mostra os tamanhos original, .gz e .br
+de cada arquivo e mede, pelo cliente de testes, o download dos estáticos de
+uma página em quatro situações: static/ servido direto pelo Flask (toda
+navegação revalida com If-Modified-Since) e compilado sem compressão, com
+gzip e com br. Com o Cache-Control immutable dos compilados, as
+navegações seguintes não fazem requisição nenhuma; o benchmark só conta quantas
+o navegador faria.
+
+Sem static/vendor (antes de `flask construir-estaticos --baixar`), usa
+arquivos sintéticos do tamanho aproximado do Bootstrap e do Chart.js.
+
+Uso:
+    python benchmarks/bench_estaticos.py --repeticoes 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_estaticos_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+import assets  # noqa: E402
+from app import create_app  # noqa: E402
+
+# Tamanhos aproximados das versões fixadas em assets.DEPENDENCIAS
+SINTETICOS = {
+    'vendor/bootstrap/bootstrap.min.css': 230000,
+    'vendor/bootstrap/bootstrap.bundle.min.js': 80000,
+    'vendor/chart.js/chart.umd.js': 200000,
+}
+
+
+def preparar_static(origem, destino):
+    shutil.copytree(origem, destino, ignore=shutil.ignore_patterns(assets.PASTA_COMPILADOS))
+    for nome, tamanho in SINTETICOS.items():
+        caminho = os.path.join(destino, nome)
+        if not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            # Texto repetitivo com alguma variação, para a compressão não ficar irreal
+            linhas = (f'.c{i % 997}{{margin:{i % 13}px;padding:{i % 7}rem}}\n' for i in range(tamanho // 30))
+            with open(caminho, 'w') as arquivo:
+                arquivo.writelines(linhas)
+
+
+def baixar(cliente, urls, codificacao, repeticoes):
+    """Tempo médio e bytes transferidos para baixar todos os `urls` uma vez."""
+    transferidos = 0
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        transferidos = 0
+        for url in urls:
+            resposta = cliente.get(url, headers={'Accept-Encoding': codificacao})
+            transferidos += len(resposta.get_data())
+            resposta.close()
+    return (time.perf_counter() - inicio) / repeticoes * 1000, transferidos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    pasta = os.path.join(_tmp, 'static')
+    preparar_static(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static'), pasta)
+
+    inicio = time.perf_counter()
+    manifesto = assets.construir(pasta)
+    print(f'Compilação: {len(manifesto)} arquivos em {(time.perf_counter() - inicio) * 1000:.0f} ms')
+    destino = os.path.join(pasta, assets.PASTA_COMPILADOS)
+    print(f'{"arquivo":<42} {"original":>10} {"gzip":>10} {"br":>10}')
+    for nome, item in sorted(manifesto.items()):
+        compilado = os.path.join(destino, item['arquivo'])
+        tamanhos = [os.path.getsize(compilado)] + [
+            os.path.getsize(compilado + assets.CODIFICACOES[c]) if c in item['codificacoes'] else None
+            for c in ('gzip', 'br')]
+        print(f'{nome:<42} ' + ' '.join(f'{t:10d}' if t is not None else f'{"-":>10}' for t in tamanhos))
+
+    # Os estáticos de uma página que usa base.html e o Chart.js (prontuário)
+    pagina = ['vendor/bootstrap/bootstrap.min.css', 'css/styles.css',
+              'vendor/bootstrap/bootstrap.bundle.min.js', 'vendor/chart.js/chart.umd.js']
+    app = create_app()
+    app.static_folder = pasta
+    resultados = []
+    for rotulo, manifesto_ativo, codificacao in (('static/ direto', 0, ''),
+                                                  ('compilado, sem compressão', 1, ''),
+                                                  ('compilado, gzip', 1, 'gzip'),
+                                                  ('compilado, br', 1, 'br, gzip')):
+        app.config['ESTATICOS_MANIFESTO'] = manifesto_ativo
+        assets.configurar_estaticos(app)
+        with app.test_request_context():
+            urls = [assets.url_for('static', filename=nome) for nome in pagina]
+        cliente = app.test_client()
+        ms, transferidos = baixar(cliente, urls, codificacao, args.repeticoes)
+        cabecalhos = cliente.get(urls[0]).headers
+        # Sem max-age o navegador revalida cada arquivo a cada navegação
+        revalidacoes = 0 if 'immutable' in cabecalhos.get('Cache-Control', '') else len(urls)
+        resultados.append((rotulo, ms, transferidos, revalidacoes))
+
+    print(f'\n{"estáticos da página":<28} {"tempo":>10} {"bytes":>10}   requisições por navegação seguinte')
+    for rotulo, ms, transferidos, revalidacoes in resultados:
+        print(f'{rotulo:<28} {ms:7.2f} ms {transferidos:10d}   {revalidacoes}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark das exportações de prontuário (pico de memória e tempo).
+
+Cada variante roda em um subprocesso próprio, para que o pico de RSS
+(ru_maxrss) de uma não contamine a outra. "antigo" reproduz as rotas
+originais (.all() + documento inteiro na memória + BytesIO); "novo" usa
+exporters.py.
+
+Uso:
+    python benchmarks/bench_exportacao.py --registros 50000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def popular(registros, tamanho_texto):
+    from extensions import db
+    from models import User, Patient, MedicalRecord
+
+    db.create_all()
+    db.session.add(User(username='medico', senha='x', nome_completo='Médico', funcao='médico'))
+    db.session.add(Patient(nome_completo='Paciente Longo', data_nascimento=datetime(1980, 1, 1).date(),
+                           endereco='-', email='p@exemplo.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia'))
+    db.session.commit()
+    texto = ('Paciente relata melhora do sono e redução da ansiedade. ' * 20)[:tamanho_texto]
+    inicio = datetime(2010, 1, 1)
+    lote = []
+    for i in range(registros):
+        lote.append(dict(paciente_id=1, medico_id=1, data_sessao=inicio + timedelta(hours=i), evolucao=texto))
+        if len(lote) == 5000:
+            db.session.execute(MedicalRecord.__table__.insert(), lote)
+            lote = []
+    if lote:
+        db.session.execute(MedicalRecord.__table__.insert(), lote)
+    db.session.commit()
+
+
+def exportar_antigo(formato):
+    from io import BytesIO
+    from docx import Document
+    from openpyxl import Workbook
+    from models import Patient, MedicalRecord
+
+    paciente = Patient.query.get_or_404(1)
+    evolucoes = MedicalRecord.query.filter_by(paciente_id=1).order_by(MedicalRecord.data_sessao).all()
+    file_stream = BytesIO()
+    if formato == 'docx':
+        doc = Document()
+        doc.add_heading(f'Prontuário de {paciente.nome_completo}', 0)
+        for evo in evolucoes:
+            doc.add_paragraph(f'Data: {evo.data_sessao.strftime("%d/%m/%Y")}')
+            doc.add_paragraph(f'Evolução: {evo.evolucao}')
+            doc.add_paragraph('---')
+        doc.save(file_stream)
+    else:
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Prontuário"
+        ws.append(["Data", "Evolução"])
+        for evo in evolucoes:
+            ws.append([evo.data_sessao.strftime("%d/%m/%Y"), evo.evolucao])
+        wb.save(file_stream)
+    return len(file_stream.getvalue())
+
+
+def exportar_novo(formato):
+    from exporters import gerar_arquivo, registros_do_paciente, escrever_docx, escrever_xlsx
+    from models import Patient
+
+    paciente = Patient.query.get_or_404(1)
+    escrever = escrever_docx if formato == 'docx' else escrever_xlsx
+    arquivo = gerar_arquivo(escrever, paciente.nome_completo, registros_do_paciente(1))
+    tamanho = 0
+    while True:
+        bloco = arquivo.read(64 * 1024)
+        if not bloco:
+            break
+        tamanho += len(bloco)
+    arquivo.close()
+    return tamanho
+
+
+def filho(modo, formato):
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        inicio = time.perf_counter()
+        tamanho = (exportar_antigo if modo == 'antigo' else exportar_novo)(formato)
+        duracao = time.perf_counter() - inicio
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{modo:<7} {formato:<5} {duracao:7.2f} s  pico RSS {pico / 1024:8.1f} MiB '
+          f'(+{(pico - base) / 1024:.1f} MiB)  arquivo {tamanho / 1024 / 1024:.1f} MiB', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registros', type=int, default=50000)
+    parser.add_argument('--tamanho-texto', type=int, default=600)
+    parser.add_argument('--timeout', type=int, default=300,
+                        help='Limite por variante, em segundos (o DOCX antigo cresce de forma quadrática).')
+    parser.add_argument('--filho', nargs=2, metavar=('MODO', 'FORMATO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        filho(*args.filho)
+        return
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_export_'), 'bench.db')
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        popular(args.registros, args.tamanho_texto)
+    print(f'{args.registros} evoluções de {args.tamanho_texto} caracteres', flush=True)
+
+    for formato in ('xlsx', 'docx'):
+        for modo in ('antigo', 'novo'):
+            try:
+                subprocess.run([sys.executable, __file__, '--filho', modo, formato], check=True,
+                               env=os.environ, timeout=args.timeout)
+            except subprocess.TimeoutExpired:
+                print(f'{modo:<7} {formato:<5} excedeu {args.timeout} s', flush=True)
+
+
+if __name__ == '__main__':
+    main()
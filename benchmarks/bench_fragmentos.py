@@ -0,0 +1,106 @@
+"""Ganho do cache de fragmentos (fragment_cache.py) nas listagens.
+
+Mede a requisição completa de /lista_pacientes e /lista_agendamentos com o
+cache desligado, com o fragmento em memória e com o fragmento lido da pasta
+compartilhada (memória vazia, como num worker que ainda não o renderizou).
+Sem If-None-Match: é o caso em que o GET condicional não ajuda, como a
+primeira visita de cada usuário à página.
+
+Uso:
+    python benchmarks/bench_fragmentos.py --pacientes 2000 --por-pagina 100 --repeticoes 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_fragmentos_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from sqlalchemy import event  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from fragment_cache import cache_fragmentos  # noqa: E402
+from models import User, Patient, Appointment  # noqa: E402
+
+app = create_app()
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+SENHA = 'bench123'
+
+
+def popular(pacientes):
+    db.create_all()
+    medico = User(username='medico', senha=generate_password_hash(SENHA, method=app.config['PASSWORD_HASH_METHOD']),
+                  nome_completo='Médico', funcao='médico')
+    db.session.add(medico)
+    db.session.commit()
+    db.session.execute(Patient.__table__.insert(), [
+        dict(nome_completo=f'Paciente {i:05d}', data_nascimento=date(1980, 1, 1), endereco='Rua',
+             email=f'p{i}@exemplo.com', telefone=f'11{i:08d}', escolaridade='medio', estado_civil='solteiro',
+             servico_buscado='terapia') for i in range(pacientes)])
+    inicio = datetime(2025, 1, 6, 9)
+    db.session.execute(Appointment.__table__.insert(), [
+        dict(paciente_id=1 + i % pacientes, medico_id=medico.id, sala='Sala 1',
+             data_hora=inicio + timedelta(days=i // 8, minutes=60 * (i % 8)), duracao=60) for i in range(2000)])
+    db.session.commit()
+
+
+def medir(motor, cliente, url, repeticoes, preparar=None):
+    comandos = 0
+
+    def contar(*args):
+        nonlocal comandos
+        comandos += 1
+
+    event.listen(motor, 'before_cursor_execute', contar)
+    decorrido = 0.0
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        cliente.get(url)
+        decorrido += time.perf_counter() - inicio
+    event.remove(motor, 'before_cursor_execute', contar)
+    return decorrido / repeticoes * 1000, comandos / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pacientes', type=int, default=2000)
+    parser.add_argument('--por-pagina', type=int, default=100)
+    parser.add_argument('--repeticoes', type=int, default=300)
+    args = parser.parse_args()
+
+    with app.app_context():
+        popular(args.pacientes)
+        motor = db.engine
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico', 'password': SENHA})
+    pasta = tempfile.mkdtemp(prefix='fragmentos_', dir=_tmp)
+    maximo_itens, maximo_bytes = app.config['FRAGMENTOS_MAX_ITENS'], app.config['FRAGMENTOS_MAX_BYTES']
+
+    cenarios = [
+        ('sem cache', lambda: cache_fragmentos.configurar(0, 0), None),
+        ('memória', lambda: cache_fragmentos.configurar(maximo_itens, maximo_bytes), None),
+        # Cada requisição começa com a memória vazia e encontra o fragmento na pasta
+        ('pasta', lambda: cache_fragmentos.configurar(maximo_itens, maximo_bytes, pasta),
+         lambda: cache_fragmentos.configurar(maximo_itens, maximo_bytes, pasta)),
+    ]
+    for url in (f'/lista_pacientes?por_pagina={args.por_pagina}', f'/lista_agendamentos?por_pagina={args.por_pagina}'):
+        print(url)
+        for nome, configurar, preparar in cenarios:
+            configurar()
+            cliente.get(url)  # aquece o cache
+            ms, comandos = medir(motor, cliente, url, args.repeticoes, preparar)
+            print(f'    {nome:<10} {ms:7.2f} ms  {comandos:4.1f} comandos SQL')
+
+
+if __name__ == '__main__':
+    main()
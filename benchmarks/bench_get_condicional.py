@@ -0,0 +1,97 @@
+"""Trabalho economizado pelo GET condicional (conditional.py).
+
+Para cada página decorada com @get_condicional mede a requisição completa
+(consultas + Jinja) e a revalidação com If-None-Match, que responde 304 só
+com a leitura dos contadores de versão. Mostra latência, comandos SQL e
+bytes enviados por requisição.
+
+Uso:
+    python benchmarks/bench_get_condicional.py --pacientes 2000 --registros 300 --repeticoes 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_condicional_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from sqlalchemy import event  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Patient, Appointment, MedicalRecord  # noqa: E402
+
+app = create_app()
+app.config['WTF_CSRF_ENABLED'] = False
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+SENHA = 'bench123'
+
+
+def popular(pacientes, registros):
+    db.create_all()
+    medico = User(username='medico', senha=generate_password_hash(SENHA, method=app.config['PASSWORD_HASH_METHOD']),
+                  nome_completo='Médico', funcao='médico')
+    db.session.add(medico)
+    db.session.commit()
+    db.session.execute(Patient.__table__.insert(), [
+        dict(nome_completo=f'Paciente {i:05d}', data_nascimento=date(1980, 1, 1), endereco='Rua',
+             email=f'p{i}@exemplo.com', telefone=f'11{i:08d}', escolaridade='medio', estado_civil='solteiro',
+             servico_buscado='terapia') for i in range(pacientes)])
+    inicio = datetime(2025, 1, 6, 9)
+    db.session.execute(Appointment.__table__.insert(), [
+        dict(paciente_id=1 + i % pacientes, medico_id=medico.id, sala='Sala 1',
+             data_hora=inicio + timedelta(days=i // 8, minutes=60 * (i % 8)), duracao=60) for i in range(500)])
+    db.session.execute(MedicalRecord.__table__.insert(), [
+        dict(paciente_id=1, medico_id=medico.id, data_sessao=inicio + timedelta(days=i),
+             evolucao='Paciente relata melhora do sono e redução da ansiedade. ' * 20) for i in range(registros)])
+    db.session.commit()
+
+
+def medir(motor, cliente, url, etag, repeticoes):
+    comandos = 0
+
+    def contar(*args):
+        nonlocal comandos
+        comandos += 1
+
+    event.listen(motor, 'before_cursor_execute', contar)
+    cabecalhos = {'If-None-Match': etag} if etag else {}
+    enviados = 0
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resposta = cliente.get(url, headers=cabecalhos)
+        enviados += len(resposta.get_data())
+    total = time.perf_counter() - inicio
+    event.remove(motor, 'before_cursor_execute', contar)
+    return resposta.status_code, total / repeticoes * 1000, comandos / repeticoes, enviados / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pacientes', type=int, default=2000)
+    parser.add_argument('--registros', type=int, default=300)
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        popular(args.pacientes, args.registros)
+        motor = db.engine
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico', 'password': SENHA})
+
+    for url in ('/lista_pacientes', '/lista_agendamentos', '/prontuario/1'):
+        etag = cliente.get(url).headers['ETag']
+        print(url)
+        for nome, cabecalho in (('completa', None), ('If-None-Match', etag)):
+            status, ms, comandos, enviados = medir(motor, cliente, url, cabecalho, args.repeticoes)
+            print(f'    {nome:<14} {status}  {ms:7.2f} ms  {comandos:4.1f} comandos SQL  {enviados:8.0f} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark da busca de horários livres.
+
+Compara `agenda.horarios_livres` (uma consulta e uma varredura por dia) com a
+abordagem de tentativa e erro: testar cada início possível, de 10 em 10
+minutos, com `verificar_conflito` em cada sala. Os dois resultados são
+conferidos entre si antes da medição.
+
+Uso:
+    python benchmarks/bench_horarios_livres.py --dias 7 --ocupacao 0.7
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_horarios_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Patient, Appointment  # noqa: E402
+from agenda import (  # noqa: E402
+    horarios_livres, verificar_conflito, HORA_ABERTURA, HORA_FECHAMENTO, SALAS,
+)
+
+app = create_app()
+
+INICIO = datetime(2025, 1, 6)
+PASSO = timedelta(minutes=10)
+
+
+def popular(dias, medicos, ocupacao):
+    db.create_all()
+    for i in range(medicos):
+        db.session.add(User(username=f'medico{i}', senha='x', nome_completo=f'Médico {i}', funcao='médico'))
+    db.session.add(Patient(nome_completo='Paciente', data_nascimento=INICIO.date(), endereco='-',
+                           email='p@exemplo.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia'))
+    db.session.commit()
+
+    linhas = []
+    for d in range(dias):
+        dia = INICIO + timedelta(days=d)
+        for s, sala in enumerate(SALAS):
+            hora = dia.replace(hour=HORA_ABERTURA)
+            while hora.hour < HORA_FECHAMENTO:
+                duracao = random.choice((30, 40, 60))
+                if random.random() < ocupacao:
+                    linhas.append(dict(paciente_id=1, medico_id=(s % medicos) + 1, sala=sala,
+                                       data_hora=hora, duracao=duracao))
+                hora += timedelta(minutes=duracao)
+    db.session.execute(Appointment.__table__.insert(), linhas)
+    db.session.commit()
+    return len(linhas)
+
+
+def tentativa_e_erro(desde, ate, duracao):
+    """Inícios viáveis (sala, início) testando cada passo com verificar_conflito."""
+    viaveis = []
+    dia = desde
+    while dia <= ate:
+        for sala in SALAS:
+            inicio = datetime.combine(dia, datetime.min.time()).replace(hour=HORA_ABERTURA)
+            ultimo = inicio.replace(hour=HORA_FECHAMENTO)
+            while inicio <= ultimo:
+                if verificar_conflito(inicio, duracao, sala=sala) is None:
+                    viaveis.append((sala, inicio))
+                inicio += PASSO
+        dia += timedelta(days=1)
+    return viaveis
+
+
+def inicios_da_varredura(livres, duracao):
+    viaveis = []
+    for livre in livres:
+        inicio = livre.inicio
+        while inicio + timedelta(minutes=duracao) <= livre.fim:
+            viaveis.append((livre.sala, inicio))
+            inicio += PASSO
+    return viaveis
+
+
+def medir(nome, funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    total = time.perf_counter() - inicio
+    print(f'{nome:<28} {total / repeticoes * 1000:10.2f} ms/busca')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dias', type=int, default=7)
+    parser.add_argument('--medicos', type=int, default=4)
+    parser.add_argument('--ocupacao', type=float, default=0.7)
+    parser.add_argument('--duracao', type=int, choices=(30, 40, 60), default=40)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with app.app_context():
+        total = popular(args.dias, args.medicos, args.ocupacao)
+        desde, ate = INICIO.date(), (INICIO + timedelta(days=args.dias - 1)).date()
+        print(f'{total} agendamentos em {args.dias} dias e {len(SALAS)} salas')
+
+        livres = horarios_livres(desde, ate, args.duracao)
+        esperado = tentativa_e_erro(desde, ate, args.duracao)
+        assert sorted(inicios_da_varredura(livres, args.duracao)) == sorted(esperado)
+        print(f'{len(livres)} intervalos livres, {len(esperado)} inícios possíveis')
+
+        medir('tentativa e erro', lambda: tentativa_e_erro(desde, ate, args.duracao), max(args.repeticoes // 10, 1))
+        medir('horarios_livres', lambda: horarios_livres(desde, ate, args.duracao), args.repeticoes)
+
+
+if __name__ == '__main__':
+    main()
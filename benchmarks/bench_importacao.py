@@ -0,0 +1,83 @@
+"""Vazão e memória da importação de pacientes (patient_import.py).
+
+Para cada tamanho gera um CSV sintético (com ~2% de linhas inválidas e ~2% de
+duplicadas) e importa em um processo novo, com banco próprio. O pico de
+memória residente do processo deve ficar estável entre 10 mil e 100 mil
+linhas: nem o arquivo nem as chaves já vistas ficam na memória. O cache de
+páginas e o mmap do SQLite são reduzidos nessa medição, porque crescem com o
+banco até o limite configurado e mascarariam a memória da importação.
+
+Uso:
+    python benchmarks/bench_importacao.py --linhas 10000 100000 --lote 1000
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CABECALHO = ['nome_completo', 'data_nascimento', 'paciente_dependente', 'endereco', 'email', 'telefone',
+             'escolaridade', 'estado_civil', 'servico_buscado']
+
+
+def gerar_csv(caminho, linhas):
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(CABECALHO)
+        for i in range(linhas):
+            n = i - 1 if i % 50 == 49 else i  # duplicada da linha anterior
+            escritor.writerow([f'Paciente {i}', '12/03/1980' if i % 50 != 25 else '31/02/1980', 'Não',
+                               f'Rua {i}, {i % 1000}', f'paciente{n}@exemplo.com', f'(11) 9{n:08d}',
+                               'Médio', 'Solteiro(a)', 'Terapia'])
+
+
+def filho(arquivo, lote):
+    sys.path.insert(0, RAIZ)
+    from app import create_app
+    from extensions import db
+    from patient_import import importar_pacientes
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        inicio = time.perf_counter()
+        resultado = importar_pacientes(arquivo, arquivo + '.erros.csv', lote=lote)
+        duracao = time.perf_counter() - inicio
+    print(json.dumps({'segundos': duracao, 'resultado': resultado._asdict(),
+                      'pico_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--lote', type=int, default=1000)
+    parser.add_argument('--filho', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        filho(args.filho, args.lote)
+        return
+
+    for linhas in args.linhas:
+        pasta = tempfile.mkdtemp(prefix='bench_importacao_')
+        arquivo = os.path.join(pasta, 'pacientes.csv')
+        gerar_csv(arquivo, linhas)
+        ambiente = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(pasta, 'b.db'),
+                        SQLITE_CACHE_SIZE='-2000', SQLITE_MMAP_SIZE='0')
+        saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--filho', arquivo, '--lote', str(args.lote)],
+                               env=ambiente, capture_output=True, text=True, check=True)
+        medicao = json.loads(saida.stdout.strip().splitlines()[-1])
+        r = medicao['resultado']
+        print(f'{linhas:>7} linhas: {medicao["segundos"]:6.1f} s ({linhas / medicao["segundos"]:6.0f} linhas/s), '
+              f'pico {medicao["pico_mb"]:5.1f} MB - {r["importadas"]} importadas, {r["invalidas"]} inválidas, '
+              f'{r["duplicadas"]} duplicadas')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Tempo de inicialização a frio e latência das primeiras requisições.
+
+Cada medição roda em um processo Python novo: importa a aplicação e chama
+create_app() (o que um worker ou um comando `flask` paga ao subir), depois faz
+a primeira requisição a uma página comum e a primeira exportação DOCX, quando
+python-docx é importado sob demanda. A variante "preload" importa as
+bibliotecas de exportação junto com a aplicação, como em wsgi.py com
+PRELOAD_EXPORTERS=1.
+
+Uso:
+    python benchmarks/bench_inicializacao.py --repeticoes 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def filho(preload):
+    inicio = time.perf_counter()
+    sys.path.insert(0, RAIZ)
+    from app import create_app
+    app = create_app()
+    if preload:
+        from exporters import carregar_bibliotecas
+        carregar_bibliotecas()
+    importacao = time.perf_counter() - inicio
+
+    from datetime import date, datetime
+    from werkzeug.security import generate_password_hash
+    from extensions import db
+    from models import User, Patient, MedicalRecord
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        db.create_all()
+        medico = User(username='medico', senha=generate_password_hash('x', method='pbkdf2:sha256:1000'),
+                      nome_completo='Médico', funcao='médico')
+        paciente = Patient(nome_completo='Paciente', data_nascimento=date(1990, 1, 1), endereco='Rua',
+                           email='p@x.com', telefone='0', escolaridade='medio', estado_civil='solteiro',
+                           servico_buscado='terapia')
+        db.session.add_all([medico, paciente])
+        db.session.flush()
+        db.session.add(MedicalRecord(paciente_id=paciente.id, medico_id=medico.id, data_sessao=datetime.now(),
+                                     evolucao='Evolução'))
+        db.session.commit()
+        paciente_id = paciente.id
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico', 'password': 'x'})
+    tempos = {'importacao': importacao}
+    for nome, url in (('dashboard', '/dashboard'), ('exportar_docx', f'/exportar_docx/{paciente_id}'),
+                      ('exportar_docx (2ª)', f'/exportar_docx/{paciente_id}')):
+        inicio = time.perf_counter()
+        resposta = cliente.get(url)
+        resposta.get_data()
+        tempos[nome] = time.perf_counter() - inicio
+        assert resposta.status_code == 200, (url, resposta.status_code)
+    print(json.dumps(tempos))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filho', choices=('lazy', 'preload'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        filho(args.filho == 'preload')
+        return
+
+    for variante in ('lazy', 'preload'):
+        medicoes = []
+        for _ in range(args.repeticoes):
+            ambiente = dict(os.environ)
+            ambiente['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_init_'), 'b.db')
+            saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--filho', variante],
+                                   env=ambiente, capture_output=True, text=True, check=True)
+            medicoes.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+        print(f'{variante} (mediana de {args.repeticoes}):')
+        for chave in medicoes[0]:
+            print(f'    {chave:<20} {statistics.median(m[chave] for m in medicoes) * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
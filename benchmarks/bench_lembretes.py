@@ -0,0 +1,88 @@
+"""Lembretes de consulta (reminders.py): consulta, renderização e gravação no Maildir.
+
+Gera pacientes com synthetic_data.gerar_dados e --agendamentos consultas no dia
+seguinte, e mede `enviar_lembretes` em um só processo e com o pool, além da
+segunda execução, que não encontra nada a enviar (as marcas em
+lembrete_enviado). Entre as medições a caixa de saída e as marcas são zeradas.
+O tempo do pool inclui iniciar os processos, que importam este arquivo de novo
+('spawn'); com uma só CPU ele não tem como ganhar do processo único.
+
+Uso:
+    python benchmarks/bench_lembretes.py --agendamentos 5000 --workers 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_lembretes_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+os.environ.setdefault('LEMBRETES_DIR', os.path.join(_tmp, 'lembretes'))
+
+from sqlalchemy import delete, insert, select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Appointment, LembreteEnviado, Patient, User  # noqa: E402
+from reminders import consulta_lembretes, enviar_lembretes, pasta_lembretes  # noqa: E402
+from synthetic_data import gerar_dados  # noqa: E402
+
+
+def agendar_amanha(quantidade):
+    """`quantidade` consultas amanhã, espalhadas entre 8h e 18h e entre pacientes e médicos."""
+    pacientes = db.session.scalars(select(Patient.id)).all()
+    medicos = db.session.scalars(select(User.id).where(User.funcao == 'médico')).all()
+    inicio = datetime.combine(date.today() + timedelta(days=1), datetime.min.time()) + timedelta(hours=8)
+    db.session.execute(insert(Appointment), [
+        {'paciente_id': pacientes[i % len(pacientes)], 'medico_id': medicos[i % len(medicos)],
+         'sala': f'Sala {i % 50 + 1}', 'duracao': 50, 'data_hora': inicio + timedelta(minutes=(i // 50) * 60 % 600)}
+        for i in range(quantidade)])
+    db.session.commit()
+
+
+def zerar(app):
+    db.session.execute(delete(LembreteEnviado))
+    db.session.commit()
+    shutil.rmtree(pasta_lembretes(app), ignore_errors=True)
+
+
+def medir(app, workers, lote):
+    inicio = time.perf_counter()
+    resultado = enviar_lembretes(app, date.today() + timedelta(days=1), lote, workers)
+    return time.perf_counter() - inicio, resultado['gravados']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pacientes', type=int, default=5000)
+    parser.add_argument('--agendamentos', type=int, default=5000)
+    parser.add_argument('--lote', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # Criada aqui, e não no módulo: os processos do pool ('spawn') importam este arquivo de novo
+    app = create_app()
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        db.create_all()
+        gerar_dados(args.pacientes)
+        agendar_amanha(args.agendamentos)
+
+        inicio = time.perf_counter()
+        linhas = db.session.execute(consulta_lembretes(date.today() + timedelta(days=1))).all()
+        print(f'Consulta com os contatos: {len(linhas)} linhas em {(time.perf_counter() - inicio) * 1000:.1f} ms')
+
+        for rotulo, workers in (('1 processo', 1), (f'pool de {args.workers}', args.workers)):
+            zerar(app)
+            segundos, gravados = medir(app, workers, args.lote)
+            print(f'{rotulo:<16} {gravados:6d} lembretes em {segundos:6.2f} s ({gravados / segundos:.0f}/s)')
+        segundos, gravados = medir(app, args.workers, args.lote)
+        print(f'{"segunda execução":<16} {gravados:6d} lembretes em {segundos:6.2f} s')
+
+
+if __name__ == '__main__':
+    main()
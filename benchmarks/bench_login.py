@@ -0,0 +1,79 @@
+"""Vazão de logins simultâneos (troca de turno).
+
+Dispara logins em paralelo pelo cliente de teste do Flask e mede logins por
+segundo e latência, com o hash feito direto na thread da requisição
+(PASSWORD_HASH_WORKERS=0, comportamento antigo) e no pool limitado.
+
+Uso:
+    python benchmarks/bench_login.py --usuarios 40 --concorrencia 1 8 32
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'bench.db'))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+import passwords  # noqa: E402
+
+app = create_app()
+
+SENHA = 'turno123'
+
+
+def popular(usuarios):
+    with app.app_context():
+        db.create_all()
+        senha_hash = passwords.gerar_hash(SENHA)
+        for i in range(usuarios):
+            db.session.add(User(username=f'usuario{i}', senha=senha_hash, nome_completo=f'Usuário {i}',
+                                funcao='recepcao'))
+        db.session.commit()
+
+
+def login(i):
+    inicio = time.perf_counter()
+    resposta = app.test_client().post('/login', data={'username': f'usuario{i}', 'password': SENHA})
+    return resposta.status_code, time.perf_counter() - inicio
+
+
+def rodada(usuarios, concorrencia):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        resultados = list(executor.map(login, range(usuarios)))
+    total = time.perf_counter() - inicio
+    latencias = sorted(t for status, t in resultados if status == 302)
+    recusados = sum(1 for status, _ in resultados if status == 503)
+    p95 = latencias[int(len(latencias) * 0.95) - 1] if latencias else 0
+    return len(latencias) / total, statistics.median(latencias) if latencias else 0, p95, recusados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=40)
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    popular(args.usuarios)
+    print(f'método: {app.config["PASSWORD_HASH_METHOD"]}, {os.cpu_count()} CPUs')
+
+    for nome, workers in (('na requisição', 0), (f'pool ({args.workers} workers)', args.workers)):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        passwords.reconfigurar()
+        for concorrencia in args.concorrencia:
+            vazao, p50, p95, recusados = rodada(args.usuarios, concorrencia)
+            print(f'{nome:<22} concorrência {concorrencia:>3}: {vazao:6.1f} logins/s  '
+                  f'p50 {p50 * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  recusados {recusados}')
+
+
+if __name__ == '__main__':
+    main()
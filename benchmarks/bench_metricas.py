@@ -0,0 +1,73 @@
+"""Custo da coleta de métricas por requisição.
+
+Mede requisições/s em GET /dashboard com METRICAS_ATIVAS=0 e 1, cada variante
+em um processo novo com banco temporário próprio. As variantes são alternadas
+por algumas rodadas e vale o melhor tempo de cada uma, para reduzir o ruído.
+
+Uso:
+    python benchmarks/bench_metricas.py --requisicoes 3000 --rodadas 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def filho(requisicoes):
+    sys.path.insert(0, RAIZ)
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db
+    from models import User
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='medico', senha=generate_password_hash('x', method='pbkdf2:sha256:1000'),
+                            nome_completo='Médico', funcao='médico'))
+        db.session.commit()
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico', 'password': 'x'})
+    for _ in range(100):
+        cliente.get('/dashboard')
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        cliente.get('/dashboard')
+    print(json.dumps({'segundos': time.perf_counter() - inicio}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requisicoes', type=int, default=3000)
+    parser.add_argument('--rodadas', type=int, default=5)
+    parser.add_argument('--filho', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        filho(args.requisicoes)
+        return
+
+    melhores = {'0': float('inf'), '1': float('inf')}
+    for _ in range(args.rodadas):
+        for ativas in melhores:
+            ambiente = dict(os.environ, METRICAS_ATIVAS=ativas)
+            ambiente['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_metricas_'), 'b.db')
+            saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--filho',
+                                    '--requisicoes', str(args.requisicoes)],
+                                   env=ambiente, capture_output=True, text=True, check=True)
+            segundos = json.loads(saida.stdout.strip().splitlines()[-1])['segundos']
+            melhores[ativas] = min(melhores[ativas], segundos / args.requisicoes)
+    for ativas, por_requisicao in melhores.items():
+        print(f'METRICAS_ATIVAS={ativas}: {1 / por_requisicao:7.1f} req/s  {por_requisicao * 1e6:7.1f} µs/req')
+    print(f'custo da coleta: {(melhores["1"] - melhores["0"]) * 1e6:+.1f} µs/req')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Medição ponta a ponta das rotas principais, com linhas de base por commit.
+
+Gera um banco com `flask gerar-dados` (synthetic_data.py, semente fixa) num
+processo à parte e, com o cliente de teste do Flask, exercita login,
+dashboard, lista_pacientes, agendamento, prontuario e as exportações. Para
+cada rota mostra p50/p95/p99, vazão (requisições sequenciais por segundo),
+comandos SQL por requisição e o pico de memória alocada (tracemalloc, numa
+passada curta à parte para não distorcer a latência). No fim, o pico de
+memória residente do processo.
+
+--salvar grava o resultado em JSON (por padrão em benchmarks/resultados/,
+com o commit atual no nome); --comparar mostra a variação contra um arquivo
+salvo antes, por exemplo no commit anterior.
+
+Uso:
+    python benchmarks/bench_rotas.py --pacientes 10000 --agendamentos 100000 --registros 50000 --salvar
+    python benchmarks/bench_rotas.py --comparar benchmarks/resultados/<commit>.json
+    python benchmarks/bench_rotas.py --banco /caminho/clinica.db --usuario medico001 --senha dados123
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def gerar_banco(caminho, args):
+    """Cria o esquema e roda `flask gerar-dados` num processo separado."""
+    ambiente = dict(os.environ, DATABASE_URL='sqlite:///' + caminho, FLASK_APP='app')
+    subprocess.run([sys.executable, '-c', 'from app import create_app; from extensions import db; '
+                    'app = create_app(); app.app_context().push(); db.create_all()'],
+                   cwd=RAIZ, env=ambiente, check=True)
+    subprocess.run([sys.executable, '-m', 'flask', 'gerar-dados', '--pacientes', str(args.pacientes),
+                    '--agendamentos', str(args.agendamentos), '--registros', str(args.registros),
+                    '--senha', args.senha, '--semente', str(args.semente)],
+                   cwd=RAIZ, env=ambiente, check=True)
+
+
+def cenarios(app, args):
+    """(nome, função que recebe o índice da repetição e faz uma requisição)."""
+    from sqlalchemy import func, select
+    from extensions import db
+    from models import MedicalRecord
+
+    with app.app_context():
+        # Pacientes com histórico: os de mais evoluções primeiro, para os piores casos aparecerem no p99
+        pacientes = list(db.session.scalars(
+            select(MedicalRecord.paciente_id).group_by(MedicalRecord.paciente_id)
+            .order_by(func.count().desc()).limit(20))) or [1]
+
+    cliente = app.test_client()
+    credenciais = {'username': args.usuario, 'password': args.senha}
+    resposta = cliente.post('/login', data=credenciais)
+    if resposta.status_code != 302:
+        sys.exit(f'Login de {args.usuario} falhou; use --usuario/--senha de um médico do banco.')
+
+    def login(i):
+        return app.test_client().post('/login', data=credenciais)
+
+    def get(url):
+        return lambda i: cliente.get(url(i) if callable(url) else url)
+
+    def paciente(i):
+        return pacientes[i % len(pacientes)]
+
+    return [
+        ('login', login),
+        ('dashboard', get('/dashboard')),
+        ('lista_pacientes', get('/lista_pacientes')),
+        ('agendamento', get('/agendamento')),
+        ('prontuario', get(lambda i: f'/prontuario/{paciente(i)}')),
+        ('exportar_docx', get(lambda i: f'/exportar_docx/{paciente(i)}')),
+        ('exportar_xlsx', get(lambda i: f'/exportar_xlsx/{paciente(i)}')),
+    ]
+
+
+def medir(motor, requisicao, repeticoes, aquecimento, repeticoes_memoria):
+    from sqlalchemy import event
+
+    for i in range(aquecimento):
+        requisicao(i)
+
+    comandos = 0
+
+    def contar(*args):
+        nonlocal comandos
+        comandos += 1
+
+    duracoes, status = [], set()
+    event.listen(motor, 'before_cursor_execute', contar)
+    inicio_total = time.perf_counter()
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        resposta = requisicao(i)
+        resposta.get_data()
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+        status.add(resposta.status_code)
+    total = time.perf_counter() - inicio_total
+    event.remove(motor, 'before_cursor_execute', contar)
+
+    tracemalloc.start()
+    for i in range(repeticoes_memoria):
+        requisicao(i).get_data()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    percentis = statistics.quantiles(duracoes, n=100, method='inclusive')
+    return {
+        'p50': percentis[49], 'p95': percentis[94], 'p99': percentis[98],
+        'rps': repeticoes / total, 'sql': comandos / repeticoes, 'pico_kb': pico / 1024,
+        'status': sorted(status),
+    }
+
+
+def comparar(atual, base):
+    print(f'\nComparação com {base["commit"]} ({base["data"]}):')
+    for nome, medida in atual['rotas'].items():
+        anterior = base['rotas'].get(nome)
+        if not anterior:
+            continue
+        variacoes = '  '.join(f'{chave} {(medida[chave] / anterior[chave] - 1) * 100:+6.1f}%'
+                              for chave in ('p50', 'p95', 'p99', 'rps') if anterior[chave])
+        print(f'    {nome:<16} {variacoes}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--banco', help='Banco SQLite existente (padrão: gera um novo).')
+    parser.add_argument('--pacientes', type=int, default=10000)
+    parser.add_argument('--agendamentos', type=int, default=100000)
+    parser.add_argument('--registros', type=int, default=50000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--usuario', default='medico001')
+    parser.add_argument('--senha', default='dados123')
+    parser.add_argument('--repeticoes', type=int, default=200)
+    parser.add_argument('--aquecimento', type=int, default=5)
+    parser.add_argument('--repeticoes-memoria', type=int, default=3)
+    parser.add_argument('--rotas', nargs='+', help='Só estas rotas (nomes da tabela).')
+    parser.add_argument('--salvar', nargs='?', const='', help='Grava o resultado em JSON.')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior.')
+    args = parser.parse_args()
+
+    caminho = args.banco
+    if not caminho:
+        caminho = os.path.join(tempfile.mkdtemp(prefix='bench_rotas_'), 'bench.db')
+        inicio = time.perf_counter()
+        gerar_banco(caminho, args)
+        print(f'Banco gerado em {time.perf_counter() - inicio:.1f} s: {caminho}')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(caminho)
+
+    sys.path.insert(0, RAIZ)
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        motor = db.engine
+
+    resultado = {
+        'commit': commit_atual(), 'data': datetime.now().isoformat(timespec='seconds'),
+        'parametros': {chave: getattr(args, chave) for chave in
+                       ('banco', 'pacientes', 'agendamentos', 'registros', 'semente', 'repeticoes')},
+        'rotas': {},
+    }
+    print(f'{"rota":<16} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"SQL":>5} {"pico":>9}  status')
+    for nome, requisicao in cenarios(app, args):
+        if args.rotas and nome not in args.rotas:
+            continue
+        # O login é dominado pelo hash da senha: menos repetições bastam
+        repeticoes = max(args.repeticoes // 10, 10) if nome == 'login' else args.repeticoes
+        medida = medir(motor, requisicao, repeticoes, args.aquecimento, args.repeticoes_memoria)
+        resultado['rotas'][nome] = medida
+        print(f'{nome:<16} {medida["p50"]:6.2f}ms {medida["p95"]:6.2f}ms {medida["p99"]:6.2f}ms '
+              f'{medida["rps"]:8.1f} {medida["sql"]:5.1f} {medida["pico_kb"]:7.0f}KB  {medida["status"]}')
+    resultado['pico_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'Pico de memória residente: {resultado["pico_rss_mb"]:.1f} MB')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(resultado, json.load(arquivo))
+    if args.salvar is not None:
+        destino = args.salvar or os.path.join(RESULTADOS, f'{resultado["commit"]}.json')
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        with open(destino, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f'Resultado salvo em {destino}')
+
+
+if __name__ == '__main__':
+    main()
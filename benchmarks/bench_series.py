@@ -0,0 +1,99 @@
+"""Benchmark da criação de séries recorrentes.
+
+Compara agendar N sessões semanais uma a uma (verificar_conflito, INSERT e
+commit por sessão, como N envios de /agendamento) com `agenda.verificar_serie`
+e `agenda.criar_serie` (uma consulta, um INSERT em lote e um commit).
+
+Uso:
+    python benchmarks/bench_series.py --sessoes 52 --series 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix='bench_series_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Patient, Appointment  # noqa: E402
+from agenda import (  # noqa: E402
+    verificar_conflito, gerar_ocorrencias, verificar_serie, criar_serie, SALAS,
+)
+
+app = create_app()
+
+INICIO = datetime(2025, 1, 6, 9)
+
+
+def popular(medicos, dias):
+    db.create_all()
+    for i in range(medicos):
+        db.session.add(User(username=f'medico{i}', senha='x', nome_completo=f'Médico {i}', funcao='médico'))
+    db.session.add(Patient(nome_completo='Paciente', data_nascimento=INICIO.date(), endereco='-',
+                           email='p@exemplo.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia'))
+    db.session.commit()
+    # Ocupação esparsa: alguns conflitos por série, como numa agenda real
+    linhas = [dict(paciente_id=1, medico_id=random.randint(1, medicos), sala=random.choice(SALAS),
+                   data_hora=INICIO + timedelta(days=random.randrange(dias), minutes=30 * random.randrange(16)),
+                   duracao=30) for _ in range(dias * 2)]
+    db.session.execute(Appointment.__table__.insert(), linhas)
+    db.session.commit()
+
+
+def uma_a_uma(inicio, sala, medico_id, sessoes):
+    for data_hora in gerar_ocorrencias(inicio, 'semanal', sessoes):
+        if verificar_conflito(data_hora, 30, sala=sala, medico_id=medico_id) is None:
+            db.session.add(Appointment(paciente_id=1, medico_id=medico_id, sala=sala, data_hora=data_hora, duracao=30))
+            db.session.commit()
+
+
+def em_lote(inicio, sala, medico_id, sessoes):
+    ocorrencias = verificar_serie(gerar_ocorrencias(inicio, 'semanal', sessoes), 30, sala, medico_id)
+    criar_serie(ocorrencias, 1, medico_id, sala, 30)
+    db.session.commit()
+
+
+def medir(nome, funcao, casos, sessoes):
+    comandos = 0
+
+    def contar(*args):
+        nonlocal comandos
+        comandos += 1
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    inicio = time.perf_counter()
+    for caso in casos:
+        funcao(*caso, sessoes)
+    total = time.perf_counter() - inicio
+    event.remove(db.engine, 'before_cursor_execute', contar)
+    print(f'{nome:<14} {total / len(casos) * 1000:9.2f} ms/série {comandos / len(casos):7.1f} comandos SQL/série')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessoes', type=int, default=52)
+    parser.add_argument('--series', type=int, default=20)
+    parser.add_argument('--medicos', type=int, default=4)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with app.app_context():
+        popular(args.medicos, args.sessoes * 7)
+        horarios = [(INICIO + timedelta(minutes=30 * i), SALAS[i % len(SALAS)], (i % args.medicos) + 1)
+                    for i in range(args.series * 2)]
+        # Cada variante agenda em horários diferentes, para não conflitar com a outra
+        medir('uma a uma', uma_a_uma, horarios[::2], args.sessoes)
+        medir('em lote', em_lote, horarios[1::2], args.sessoes)
+
+
+if __name__ == '__main__':
+    main()
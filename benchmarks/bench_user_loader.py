@@ -0,0 +1,69 @@
+"""Requisições por segundo no /dashboard com e sem o cache do user_loader.
+
+Uso:
+    python benchmarks/bench_user_loader.py --requisicoes 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bench_user_'), 'bench.db'))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User, Patient  # noqa: E402
+from identity_cache import cache_usuarios  # noqa: E402
+
+app = create_app()
+
+SENHA = 'bench123'
+
+
+def popular():
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='medico', senha=generate_password_hash(SENHA),
+                            nome_completo='Médico', funcao='médico'))
+        db.session.add(Patient(nome_completo='Paciente', data_nascimento=date(1990, 1, 1), endereco='-',
+                               email='p@exemplo.com', telefone='0', escolaridade='medio',
+                               estado_civil='solteiro', servico_buscado='terapia'))
+        db.session.commit()
+
+
+def medir(requisicoes):
+    cliente = app.test_client()
+    cliente.post('/login', data={'username': 'medico', 'password': SENHA})
+    for _ in range(50):
+        cliente.get('/dashboard')
+    inicio = time.perf_counter()
+    for _ in range(requisicoes):
+        cliente.get('/dashboard')
+    return requisicoes / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    popular()
+
+    cache_usuarios.configurar(ttl=0, maximo=0)
+    sem_cache = medir(args.requisicoes)
+    cache_usuarios.configurar(ttl=300, maximo=1024)
+    com_cache = medir(args.requisicoes)
+
+    print(f'sem cache: {sem_cache:8.1f} req/s')
+    print(f'com cache: {com_cache:8.1f} req/s  ({com_cache / sem_cache - 1:+.1%})')
+    print(f'estatísticas: {cache_usuarios.estatisticas()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Agenda por período: JSON colunar para a interface e feed iCalendar por médico.
+
+Ambos partem de uma única consulta por intervalo em `appointment.data_hora`
+(índices por data_hora, por sala e por médico), com os nomes do paciente e do
+médico vindos do mesmo JOIN.
+
+O JSON é orientado a colunas: uma lista por campo, na ordem de data_hora, e
+os nomes num dicionário por id, sem repetir chaves nem nomes a cada
+agendamento.
+
+O feed .ics é gerado em streaming (`yield_per`) e protegido por um token
+assinado com a SECRET_KEY, que o calendário do médico usa sem login; o médico
+pode trocar o link, e o anterior deixa de valer. Com
+@get_condicional sobre a versão da agenda do médico (`agenda:<id>`, mantida
+por triggers, ver conditional.py), as consultas periódicas dos clientes de
+calendário respondem 304 com uma leitura pela chave primária.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import abort, current_app, g, request
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import bindparam, select
+
+from agenda import DURACAO_MAXIMA
+from conditional import incrementar_versao, ler_versoes
+from extensions import db
+from models import Appointment, Patient, User
+
+# Período máximo aceito por /api/agenda
+DIAS_MAXIMOS_AGENDA = 31
+
+# Janela publicada no feed .ics, em torno do dia da consulta
+ICS_DIAS_ANTES = 30
+ICS_DIAS_DEPOIS = 180
+
+LOTE = 500
+
+COLUNAS = ('id', 'inicio', 'duracao', 'sala', 'paciente_id', 'medico_id', 'observacoes')
+
+
+def chave_agenda(medico_id):
+    return f'agenda:{medico_id}'
+
+
+def _consulta_agenda(por_sala, por_medico):
+    a = Appointment.__table__.c
+    stmt = (
+        select(a.id, a.data_hora, a.duracao, a.sala, a.paciente_id, a.medico_id, a.observacoes, a.criado_em,
+               Patient.nome_completo.label('paciente'), User.nome_completo.label('medico'))
+        .join(Patient, Patient.id == a.paciente_id)
+        .join(User, User.id == a.medico_id)
+        # Quem começou até DURACAO_MAXIMA antes do início ainda pode estar em andamento
+        .where(a.data_hora > bindparam('desde'), a.data_hora < bindparam('ate'))
+        .order_by(a.data_hora, a.id)
+    )
+    if por_sala:
+        stmt = stmt.where(a.sala == bindparam('sala'))
+    if por_medico:
+        stmt = stmt.where(a.medico_id == bindparam('medico_id'))
+    return stmt
+
+
+_CONSULTAS = {(sala, medico): _consulta_agenda(sala, medico) for sala in (False, True) for medico in (False, True)}
+
+
+def consultar_agenda(inicio, fim, sala=None, medico_id=None, execution_options=None):
+    """Agendamentos que ocupam algum instante de [inicio, fim), em ordem de data_hora."""
+    parametros = {'desde': inicio - timedelta(minutes=DURACAO_MAXIMA), 'ate': fim}
+    if sala is not None:
+        parametros['sala'] = sala
+    if medico_id is not None:
+        parametros['medico_id'] = medico_id
+    linhas = db.session.execute(_CONSULTAS[sala is not None, medico_id is not None], parametros,
+                                execution_options=execution_options or {})
+    return (linha for linha in linhas if linha.data_hora + timedelta(minutes=linha.duracao) > inicio)
+
+
+def agenda_colunar(inicio, fim, sala=None, medico_id=None):
+    colunas = {coluna: [] for coluna in COLUNAS}
+    pacientes, medicos = {}, {}
+    for linha in consultar_agenda(inicio, fim, sala, medico_id):
+        colunas['id'].append(linha.id)
+        colunas['inicio'].append(linha.data_hora.isoformat(timespec='minutes'))
+        colunas['duracao'].append(linha.duracao)
+        colunas['sala'].append(linha.sala)
+        colunas['paciente_id'].append(linha.paciente_id)
+        colunas['medico_id'].append(linha.medico_id)
+        colunas['observacoes'].append(linha.observacoes)
+        pacientes[linha.paciente_id] = linha.paciente
+        medicos[linha.medico_id] = linha.medico
+    return {
+        'inicio': inicio.isoformat(timespec='minutes'),
+        'fim': fim.isoformat(timespec='minutes'),
+        'total': len(colunas['id']),
+        'colunas': colunas,
+        'pacientes': pacientes,
+        'medicos': medicos,
+    }
+
+
+# --- Token do feed ---
+# O token leva o id do médico e a versão do link (chave agenda_link:<id> em
+# versao_recurso). "Gerar novo link" incrementa a versão e os links antigos
+# passam a dar 404. A versão é lida junto com as do GET condicional, sem
+# consulta a mais.
+
+def chave_link_agenda(medico_id):
+    return f'agenda_link:{medico_id}'
+
+
+def _assinador():
+    return URLSafeSerializer(current_app.secret_key, salt='agenda-ics')
+
+
+def versao_link_agenda(medico_id):
+    """Versão atual do link do médico, das versões já lidas por @get_condicional quando houver."""
+    chave = chave_link_agenda(medico_id)
+    versoes = g.get('versoes_recurso') or {}
+    if chave not in versoes:
+        versoes, _ = ler_versoes([chave])
+    return versoes[chave]
+
+
+def token_agenda(medico_id):
+    return _assinador().dumps([medico_id, versao_link_agenda(medico_id)])
+
+
+def _ler_token(token):
+    """(id do médico, versão do link), ou 404 se a assinatura não confere."""
+    try:
+        conteudo = _assinador().loads(token)
+    except BadSignature:
+        abort(404)
+    # Links gerados antes da versão trazem só o id: valem até a primeira troca
+    return (conteudo, 0) if isinstance(conteudo, int) else tuple(conteudo)
+
+
+def medico_do_token(token):
+    """Id do médico do token, ou 404 se a assinatura não confere ou o link foi trocado."""
+    medico_id, versao = _ler_token(token)
+    if versao != versao_link_agenda(medico_id):
+        abort(404)
+    return medico_id
+
+
+def chave_agenda_do_token(token):
+    return chave_agenda(_ler_token(token)[0])
+
+
+def chave_link_do_token(token):
+    return chave_link_agenda(_ler_token(token)[0])
+
+
+def chave_link_do_usuario():
+    return chave_link_agenda(current_user.id)
+
+
+def chave_agenda_do_usuario():
+    return chave_agenda(current_user.id)
+
+
+def chave_agenda_da_consulta():
+    """agenda:<id> quando a consulta filtra por médico (?medico=); senão, todos os agendamentos."""
+    medico_id = request.args.get('medico', type=int)
+    return chave_agenda(medico_id) if medico_id is not None else 'agendamentos'
+
+
+def trocar_link_agenda(medico_id):
+    """Invalida o link do feed do médico; o próximo token_agenda já sai com a nova versão."""
+    incrementar_versao(chave_link_agenda(medico_id))
+    db.session.commit()
+
+
+# --- iCalendar (RFC 5545) ---
+
+def _escapar(texto):
+    return (texto or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _dobrar(linha):
+    """Quebra linhas com mais de 75 octetos, continuando com um espaço."""
+    codificada = linha.encode('utf-8')
+    if len(codificada) <= 75:
+        return linha + '\r\n'
+    partes, atual = [], ''
+    for caractere in linha:
+        if len((atual + caractere).encode('utf-8')) > (75 if not partes else 74):
+            partes.append(atual)
+            atual = ''
+        atual += caractere
+    partes.append(atual)
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _data_hora(valor):
+    # Horário local da clínica, sem fuso ("floating"), como está no banco
+    return valor.strftime('%Y%m%dT%H%M%S')
+
+
+def _evento(linha):
+    fim = linha.data_hora + timedelta(minutes=linha.duracao)
+    campos = [
+        'BEGIN:VEVENT',
+        f'UID:agendamento-{linha.id}@clinica',
+        f'DTSTAMP:{(linha.criado_em or linha.data_hora).strftime("%Y%m%dT%H%M%SZ")}',
+        f'DTSTART:{_data_hora(linha.data_hora)}',
+        f'DTEND:{_data_hora(fim)}',
+        f'SUMMARY:{_escapar(linha.paciente)}',
+        f'LOCATION:{_escapar(linha.sala)}',
+    ]
+    if linha.observacoes:
+        campos.append(f'DESCRIPTION:{_escapar(linha.observacoes)}')
+    campos.append('END:VEVENT')
+    return ''.join(_dobrar(campo) for campo in campos)
+
+
+def gerar_ics(medico_id, hoje=None):
+    """Gera o calendário do médico em pedaços, lendo os agendamentos em lotes."""
+    hoje = hoje or date.today()
+    inicio = datetime.combine(hoje - timedelta(days=ICS_DIAS_ANTES), datetime.min.time())
+    fim = datetime.combine(hoje + timedelta(days=ICS_DIAS_DEPOIS), datetime.min.time())
+    yield ''.join(_dobrar(campo) for campo in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Clinica//Agenda//PT-BR', 'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:Agenda da clínica'))
+    bloco = []
+    for linha in consultar_agenda(inicio, fim, medico_id=medico_id, execution_options={'yield_per': LOTE}):
+        bloco.append(_evento(linha))
+        if len(bloco) == LOTE:
+            yield ''.join(bloco)
+            bloco = []
+    yield ''.join(bloco) + 'END:VCALENDAR\r\n'
@@ -0,0 +1,171 @@
+"""GET condicional (ETag/Last-Modified) para páginas de listagem e prontuário.
+
+Cada recurso tem um contador em `versao_recurso` (models.py) incrementado por
+triggers a cada INSERT/UPDATE/DELETE nas tabelas de origem:
+
+    pacientes           qualquer alteração em patient
+    agendamentos        qualquer alteração em appointment
+    agenda:<id>         os agendamentos do médico <id> (feed .ics, lista do médico, /api/agenda?medico=)
+    agenda_link:<id>    o link do feed do médico <id>, trocado a pedido (sem trigger)
+    prontuario:<id>     o paciente <id> ou os registros do seu prontuário
+
+Rotas decoradas com `@get_condicional(...)` leem só esses contadores (uma
+consulta pela chave primária) e respondem 304 quando o If-None-Match do
+navegador ainda vale, sem executar as consultas da página nem o Jinja. O
+ETag também cobre o usuário, a query string, o token CSRF e as mensagens
+flash da sessão e a versão dos templates/código, já que tudo isso muda o HTML.
+
+O Last-Modified é enviado, mas não é usado para validar: ele não distingue
+usuários que compartilham o navegador da recepção.
+"""
+import hashlib
+import os
+import time
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import DDL, bindparam, event, select, text
+
+from assets import caminho_manifesto
+from extensions import db
+from models import Appointment, MedicalRecord, Patient, VersaoRecurso
+
+
+def chave_prontuario(paciente_id):
+    return f'prontuario:{paciente_id}'
+
+
+# --- Triggers ---
+
+def _incrementar(chave, condicao='1'):
+    # O WHERE evita a ambiguidade entre o SELECT e o ON CONFLICT do upsert
+    return (f'INSERT INTO versao_recurso (chave, versao, alterado_em) SELECT {chave}, 1, CURRENT_TIMESTAMP '
+            f'WHERE {condicao} ON CONFLICT (chave) DO UPDATE SET versao = versao + 1, alterado_em = excluded.alterado_em;')
+
+
+# Tabela de origem -> função que gera as chaves afetadas a partir de NEW/OLD
+RECURSOS = {
+    'patient': lambda p: ["'pacientes'", f"'prontuario:' || {p}.id"],
+    'appointment': lambda p: ["'agendamentos'", f"'agenda:' || {p}.medico_id"],
+    'medical_record': lambda p: [f"'prontuario:' || {p}.paciente_id"],
+}
+
+
+def _triggers(tabela):
+    chaves = RECURSOS[tabela]
+    corpo = {
+        'ai': [_incrementar(chave) for chave in chaves('NEW')],
+        'ad': [_incrementar(chave) for chave in chaves('OLD')],
+        # Um UPDATE pode mover o registro para outro paciente: aí a chave antiga também muda
+        'au': [_incrementar(nova) for nova in chaves('NEW')]
+              + [_incrementar(antiga, f'{antiga} <> {nova}')
+                 for antiga, nova in zip(chaves('OLD'), chaves('NEW')) if antiga != nova],
+    }
+    evento = {'ai': 'AFTER INSERT', 'ad': 'AFTER DELETE', 'au': 'AFTER UPDATE'}
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {tabela}_versao_{sufixo} {evento[sufixo]} ON {tabela} BEGIN\n    '
+        + '\n    '.join(comandos) + '\nEND'
+        for sufixo, comandos in corpo.items()
+    ]
+
+
+# Com db.create_all() os triggers nascem junto das tabelas de origem; em bancos
+# existentes eles são criados pela migração correspondente.
+for _modelo in (Patient, Appointment, MedicalRecord):
+    for _trigger in _triggers(_modelo.__tablename__):
+        event.listen(_modelo.__table__, 'after_create', DDL(_trigger).execute_if(dialect='sqlite'))
+
+
+def incrementar_versao(chave):
+    """Incrementa pela aplicação um recurso que não vem de uma tabela com triggers."""
+    db.session.execute(text(_incrementar(':chave')), {'chave': chave})
+
+
+# --- Leitura ---
+
+_VERSOES = select(VersaoRecurso.chave, VersaoRecurso.versao, VersaoRecurso.alterado_em)\
+    .where(VersaoRecurso.chave.in_(bindparam('chaves', expanding=True)))
+
+
+def ler_versoes(chaves):
+    """Retorna ({chave: versão}, instante da última alteração ou None) com uma consulta."""
+    versoes, ultima = dict.fromkeys(chaves, 0), None
+    for chave, versao, alterado_em in db.session.execute(_VERSOES, {'chaves': list(chaves)}):
+        versoes[chave] = versao
+        ultima = alterado_em if ultima is None else max(ultima, alterado_em)
+    return versoes, ultima
+
+
+_versao_aplicacao = {}
+
+
+def versao_aplicacao(app):
+    """Identifica a versão instalada pelo mtime mais recente do código, dos templates e do manifesto de estáticos."""
+    if app.root_path not in _versao_aplicacao:
+        mtimes = [0.0]
+        for pasta in (app.root_path, os.path.join(app.root_path, app.template_folder or 'templates')):
+            with os.scandir(pasta) as entradas:
+                mtimes += [e.stat().st_mtime for e in entradas if e.name.endswith(('.py', '.html'))]
+        # As páginas trazem os endereços com hash dos arquivos estáticos
+        if os.path.exists(caminho_manifesto(app)):
+            mtimes.append(os.path.getmtime(caminho_manifesto(app)))
+        _versao_aplicacao[app.root_path] = str(max(mtimes))
+    return _versao_aplicacao[app.root_path]
+
+
+def _janela_csrf(app):
+    """Troca a cada meia validade do token CSRF, para a página em cache nunca ter um token vencido."""
+    limite = app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if not app.config.get('WTF_CSRF_ENABLED', True) or not limite:
+        return ''
+    return str(int(time.time() // (limite / 2)))
+
+
+def calcular_etag(versoes):
+    app = current_app
+    partes = [
+        versao_aplicacao(app),
+        str(current_user.get_id()), getattr(current_user, 'funcao', ''),
+        request.full_path,
+        session.get('csrf_token', ''), _janela_csrf(app),
+        # Mensagens flash pendentes: se a página as exibir, a próxima resposta já não as terá
+        repr(session.get('_flashes', ())),
+        *(f'{chave}={versao}' for chave, versao in sorted(versoes.items())),
+    ]
+    return hashlib.blake2b('\x1f'.join(partes).encode(), digest_size=16).hexdigest()
+
+
+# --- Decorator ---
+
+def get_condicional(*recursos):
+    """Responde 304 quando nenhum dos `recursos` mudou desde o ETag do navegador.
+
+    Cada recurso é uma chave fixa ou uma função que recebe os argumentos da
+    rota e devolve a chave. Use abaixo de @login_required/@roles_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            chaves = [recurso(**kwargs) if callable(recurso) else recurso for recurso in recursos]
+            versoes, alterado_em = ler_versoes(chaves)
+            # Reaproveitadas pelas chaves do cache de fragmentos (fragment_cache.py)
+            g.versoes_recurso = versoes
+            etag = calcular_etag(versoes)
+            if request.if_none_match.contains_weak(etag):
+                resposta = current_app.response_class(status=304)
+            else:
+                resposta = make_response(f(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            resposta.set_etag(etag, weak=True)
+            if alterado_em is not None:
+                resposta.last_modified = alterado_em
+            # O navegador guarda a página, mas sempre revalida antes de mostrar
+            resposta.cache_control.private = True
+            resposta.cache_control.no_cache = True
+            return resposta
+        return decorated_function
+    return decorator
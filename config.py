@@ -0,0 +1,111 @@
+"""Perfis de configuração da aplicação.
+
+O perfil é escolhido por CLINICA_ENV (development, testing, production) e
+qualquer valor pode ser sobrescrito pela variável de ambiente de mesmo nome.
+"""
+import os
+
+
+def _env(nome, padrao, tipo=str):
+    valor = os.environ.get(nome)
+    return padrao if valor is None else tipo(valor)
+
+
+class Config:
+    SECRET_KEY = _env('SECRET_KEY', 'uma-chave-super-secreta-para-desenvolvimento')
+    SQLALCHEMY_DATABASE_URI = _env('DATABASE_URL', 'sqlite:///clinica.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool de conexões (ignorado para SQLite em memória)
+    DB_POOL_SIZE = _env('DB_POOL_SIZE', 10, int)
+    DB_MAX_OVERFLOW = _env('DB_MAX_OVERFLOW', 10, int)
+    DB_POOL_TIMEOUT = _env('DB_POOL_TIMEOUT', 30, int)
+    DB_POOL_RECYCLE = _env('DB_POOL_RECYCLE', 3600, int)
+
+    # PRAGMAs aplicados a cada nova conexão SQLite (ver database.py)
+    SQLITE_JOURNAL_MODE = _env('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = _env('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = _env('SQLITE_BUSY_TIMEOUT', 5000, int)  # ms
+    SQLITE_MMAP_SIZE = _env('SQLITE_MMAP_SIZE', 256 * 1024 * 1024, int)  # bytes
+    SQLITE_CACHE_SIZE = _env('SQLITE_CACHE_SIZE', -64 * 1024, int)  # negativo = KiB
+
+    # Cache do user_loader (ver identity_cache.py); TTL 0 desativa
+    USER_CACHE_TTL = _env('USER_CACHE_TTL', 300, int)
+    USER_CACHE_MAX = _env('USER_CACHE_MAX', 1024, int)
+
+    # Hash de senhas (ver passwords.py); hashes em outro formato são atualizados no login
+    PASSWORD_HASH_METHOD = _env('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = _env('PASSWORD_HASH_WORKERS', 4, int)
+    PASSWORD_HASH_FILA = _env('PASSWORD_HASH_FILA', 32, int)
+    PASSWORD_HASH_TIMEOUT = _env('PASSWORD_HASH_TIMEOUT', 5, float)
+
+    # Orçamento de comandos SQL por rota (ver query_budget.py): estrito levanta exceção
+    SQL_ORCAMENTO_ESTRITO = _env('SQL_ORCAMENTO_ESTRITO', 0, int)
+
+    # Coleta de latência/SQL/templates por endpoint exposta em /metrics (ver metrics.py)
+    METRICAS_ATIVAS = _env('METRICAS_ATIVAS', 1, int)
+
+    # Linhas por INSERT na importação de pacientes (ver patient_import.py)
+    IMPORTACAO_LOTE = _env('IMPORTACAO_LOTE', 1000, int)
+
+    # Cache de fragmentos de template (ver fragment_cache.py); 0 itens desativa.
+    # FRAGMENTOS_DIR: pasta compartilhada entre workers (opcional)
+    FRAGMENTOS_MAX_ITENS = _env('FRAGMENTOS_MAX_ITENS', 256, int)
+    FRAGMENTOS_MAX_BYTES = _env('FRAGMENTOS_MAX_BYTES', 8 * 1024 * 1024, int)
+    FRAGMENTOS_DIR = _env('FRAGMENTOS_DIR', None)
+
+    # Banco de arquivo anexado (ver archive.py); padrão: <banco>_arquivo.db ao lado do principal.
+    # ARQUIVO_DIAS: `flask arquivar` move agendamentos e evoluções mais antigos que isso
+    ARQUIVO_DATABASE = _env('ARQUIVO_DATABASE', None)
+    ARQUIVO_DIAS = _env('ARQUIVO_DIAS', 730, int)
+    ARQUIVO_LOTE = _env('ARQUIVO_LOTE', 2000, int)
+
+    # Arquivos estáticos compilados por `flask construir-estaticos` (ver assets.py); 0 serve static/ direto
+    ESTATICOS_MANIFESTO = _env('ESTATICOS_MANIFESTO', 1, int)
+
+    # Lembretes de consulta (ver reminders.py); LEMBRETES_DIR padrão: instance/lembretes (Maildir)
+    # LEMBRETES_WORKERS: processos do pool (0 = um por CPU)
+    LEMBRETES_DIR = _env('LEMBRETES_DIR', None)
+    LEMBRETES_REMETENTE = _env('LEMBRETES_REMETENTE', 'Clínica Mente e Corpo <nao-responda@clinica.local>')
+    LEMBRETES_WORKERS = _env('LEMBRETES_WORKERS', 0, int)
+    LEMBRETES_LOTE = _env('LEMBRETES_LOTE', 500, int)
+
+    # Importar python-docx/openpyxl já em wsgi.py (útil com gunicorn --preload)
+    PRELOAD_EXPORTERS = _env('PRELOAD_EXPORTERS', 0, int)
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = _env('DATABASE_URL', 'sqlite://')
+    PASSWORD_HASH_METHOD = _env('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    USER_CACHE_TTL = _env('USER_CACHE_TTL', 0, int)
+    SQL_ORCAMENTO_ESTRITO = _env('SQL_ORCAMENTO_ESTRITO', 1, int)
+
+
+class ProductionConfig(Config):
+    # Obrigatória: create_app recusa iniciar sem ela (ver `verificar_config`)
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+
+
+config_por_nome = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
+
+
+def verificar_config(config):
+    """Levanta RuntimeError se faltar algo sem o qual a aplicação não deve subir."""
+    if not config.get('SECRET_KEY'):
+        # Assina a sessão, o CSRF e os links da agenda .ics (calendar_feed.py)
+        raise RuntimeError('SECRET_KEY não definida: defina a variável de ambiente SECRET_KEY.')
+
+
+def carregar_config(nome=None):
+    nome = nome or os.environ.get('CLINICA_ENV', 'development')
+    return config_por_nome[nome]
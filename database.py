@@ -0,0 +1,81 @@
+"""Ajustes do engine do banco: pool de conexões e PRAGMAs do SQLite.
+
+Com journal_mode=WAL leitores não bloqueiam o escritor (e vice-versa), e
+busy_timeout faz a conexão esperar pelo lock em vez de falhar na hora com
+"database is locked". synchronous=NORMAL é seguro em WAL e evita um fsync
+por transação.
+
+Com servidores que fazem fork depois de carregar a aplicação (gunicorn
+--preload), o pool herdado é descartado no processo filho para que nenhuma
+conexão SQLite seja compartilhada entre processos.
+"""
+import os
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def _em_memoria(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def opcoes_engine(config):
+    """SQLALCHEMY_ENGINE_OPTIONS a partir das chaves DB_POOL_* da configuração."""
+    opcoes = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if _em_memoria(url):
+        return opcoes
+    opcoes.setdefault('pool_size', config['DB_POOL_SIZE'])
+    opcoes.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    opcoes.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    opcoes.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    opcoes.setdefault('pool_pre_ping', False)
+    return opcoes
+
+
+def pragmas_sqlite(config):
+    """PRAGMAs na ordem em que devem ser aplicados."""
+    return [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+    ]
+
+
+def registrar_pragmas(engine, pragmas):
+    """Aplica os PRAGMAs em cada conexão nova do engine (só SQLite)."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _aplicar(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for nome, valor in pragmas:
+                cursor.execute(f'PRAGMA {nome} = {valor}')
+        finally:
+            cursor.close()
+
+
+# Engines das aplicações criadas neste processo; as descartadas saem sozinhas
+_engines = weakref.WeakSet()
+
+
+def _descartar_pools_herdados():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+# Um só handler por processo, não um por create_app()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_descartar_pools_herdados)
+
+
+def configurar_banco(app, db):
+    with app.app_context():
+        engine = db.engine
+    registrar_pragmas(engine, pragmas_sqlite(app.config))
+    _engines.add(engine)
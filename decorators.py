@@ -1,7 +1,7 @@
 from functools import wraps
 from flask_login import current_user
 from flask import flash, redirect, url_for
-from app import login_manager  # Certifique-se que importou corretamente
+from extensions import login_manager
 
 def role_required(role):
     """Decorator para permitir acesso somente a um papel específico."""
@@ -12,7 +12,7 @@ def role_required(role):
                 return login_manager.unauthorized()
             if current_user.funcao != role:
                 flash(f"Acesso negado. Apenas usuários com a função '{role}' podem acessar esta página.", 'danger')
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -27,7 +27,7 @@ def roles_required(*roles):
             if current_user.funcao not in roles:
                 roles_str = ', '.join(roles)
                 flash(f"Acesso negado. Apenas usuários com as funções {roles_str} podem acessar esta página.", 'danger')
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             return f(*args, **kwargs)
         return decorated_function
     return decorator
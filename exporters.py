@@ -0,0 +1,137 @@
+"""Exportação do prontuário (DOCX/XLSX) com memória constante.
+
+As evoluções são lidas em lotes (`yield_per`), escritas direto em um arquivo
+temporário e a resposta é enviada em blocos a partir dele. Nem a lista de
+registros nem o documento inteiro ficam na memória, independente do tamanho
+do prontuário.
+
+python-docx e openpyxl só são importados na primeira exportação, para não
+pesar na inicialização dos workers e dos comandos `flask`. Servidores que
+carregam a aplicação antes do fork podem chamar `carregar_bibliotecas()` para
+compartilhar os módulos já importados entre os workers.
+
+O prontuário exportado é o histórico completo: as evoluções do banco principal
+e as do banco de arquivo (archive.py) em uma só ordem cronológica.
+"""
+import os
+import re
+import tempfile
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from flask import send_file
+from sqlalchemy import select
+
+from archive import uniao
+from extensions import db
+from models import MedicalRecord
+
+LOTE = 500
+
+MIMETYPE_DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Caracteres de controle não são aceitos em XML (o python-docx também os rejeita)
+_CONTROLE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def carregar_bibliotecas():
+    """Importa antecipadamente as bibliotecas dos formatos de exportação."""
+    import docx  # noqa: F401
+    import openpyxl  # noqa: F401
+
+
+def consulta_registros(paciente_id):
+    """SELECT de (data_sessao, evolucao) do paciente em ordem cronológica, incluindo o arquivo."""
+    registros = uniao(MedicalRecord.__table__, lambda c: c.paciente_id == paciente_id).subquery()
+    return select(registros.c.data_sessao, registros.c.evolucao).order_by(registros.c.data_sessao)
+
+
+def registros_do_paciente(paciente_id):
+    """Registros do paciente lidos em lotes de LOTE linhas."""
+    return db.session.execute(consulta_registros(paciente_id), execution_options={'yield_per': LOTE})
+
+
+def nome_arquivo(paciente, extensao):
+    return f'prontuario_{paciente.nome_completo.replace(" ", "_")}.{extensao}'
+
+
+def escrever_xlsx(destino, nome_paciente, registros):
+    """Planilha em modo write-only: cada linha vai para o disco ao ser adicionada."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Prontuário")
+    ws.append(["Data", "Evolução"])
+    for data_sessao, evolucao in registros:
+        ws.append([data_sessao.strftime("%d/%m/%Y"), _CONTROLE.sub('', evolucao)])
+    wb.save(destino)
+
+
+def _paragrafo(texto):
+    """XML de um parágrafo simples, como o gerado por Document.add_paragraph."""
+    linhas = [escape(linha) for linha in _CONTROLE.sub('', texto).split('\n')]
+    corpo = '</w:t><w:br/><w:t xml:space="preserve">'.join(linhas)
+    return f'<w:p><w:r><w:t xml:space="preserve">{corpo}</w:t></w:r></w:p>'
+
+
+def escrever_docx(destino, nome_paciente, registros):
+    """Documento Word escrito em fluxo.
+
+    O python-docx monta o documento inteiro na memória, então ele gera só o
+    esqueleto (estilos e título). O word/document.xml é então regravado no ZIP
+    de saída com os parágrafos das evoluções, um a um, no fim do <w:body>:
+    antes do <w:sectPr> do corpo, que precisa ser o último elemento.
+    """
+    from docx import Document
+
+    esqueleto = Document()
+    esqueleto.add_heading(f'Prontuário de {nome_paciente}', 0)
+    buffer = BytesIO()
+    esqueleto.save(buffer)
+
+    with zipfile.ZipFile(buffer) as origem, \
+            zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as saida:
+        for item in origem.infolist():
+            if item.filename != 'word/document.xml':
+                saida.writestr(item, origem.read(item))
+                continue
+            xml = origem.read(item).decode('utf-8')
+            # O sectPr do corpo é filho direto de <w:body>, depois de todos os parágrafos
+            fim_corpo = xml.rindex('</w:body>')
+            secao = xml.rfind('<w:sectPr', 0, fim_corpo)
+            pos = secao if secao != -1 else fim_corpo
+            inicio, fim = xml[:pos], xml[pos:]
+            with saida.open('word/document.xml', 'w') as documento:
+                documento.write(inicio.encode('utf-8'))
+                for data_sessao, evolucao in registros:
+                    documento.write((
+                        _paragrafo(f'Data: {data_sessao.strftime("%d/%m/%Y")}')
+                        + _paragrafo(f'Evolução: {evolucao}')
+                        + _paragrafo('---')
+                    ).encode('utf-8'))
+                documento.write(fim.encode('utf-8'))
+
+
+ESCRITORES = {'docx': escrever_docx, 'xlsx': escrever_xlsx}
+
+
+def gerar_arquivo(escrever, nome_paciente, registros):
+    """Executa `escrever` em um arquivo temporário e o devolve aberto no início."""
+    arquivo = tempfile.TemporaryFile()
+    try:
+        escrever(arquivo, nome_paciente, registros)
+    except Exception:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return arquivo
+
+
+def enviar_arquivo(arquivo, download_name, mimetype):
+    """Envia o arquivo temporário em blocos (wsgi.file_wrapper) e o fecha no final."""
+    tamanho = os.fstat(arquivo.fileno()).st_size
+    resposta = send_file(arquivo, as_attachment=True, download_name=download_name, mimetype=mimetype)
+    resposta.content_length = tamanho
+    return resposta
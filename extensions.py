@@ -0,0 +1,12 @@
+"""Extensões do Flask, criadas sem app e ligadas em create_app()."""
+from flask_login import LoginManager
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+migrate = Migrate()
+
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+login_manager.login_message = 'Por favor, faça login para acessar esta página.'
+login_manager.login_message_category = 'warning'
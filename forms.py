@@ -1,8 +1,10 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import (
     StringField, PasswordField, SubmitField, TextAreaField, SelectField,
-    DateField, DateTimeLocalField, IntegerField, RadioField
+    DateField, DateTimeLocalField, IntegerField, RadioField, BooleanField
 )
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange
 
 
@@ -12,6 +14,27 @@ class LoginForm(FlaskForm):
     password = PasswordField('Senha', validators=[DataRequired()])
     submit = SubmitField('Entrar')
 
+# Escolhas do cadastro de paciente, também usadas na exportação em lote e nos dados sintéticos
+ESCOLARIDADES = [
+    ('fundamental', 'Fundamental'),
+    ('medio', 'Médio'),
+    ('superior', 'Superior'),
+    ('pos', 'Pós-Graduação'),
+    ('outro', 'Outro')
+]
+ESTADOS_CIVIS = [
+    ('solteiro', 'Solteiro(a)'),
+    ('casado', 'Casado(a)'),
+    ('divorciado', 'Divorciado(a)'),
+    ('viuvo', 'Viúvo(a)')
+]
+SERVICOS_BUSCADOS = [
+    ('consulta', 'Consulta'),
+    ('terapia', 'Terapia'),
+    ('exame', 'Exame'),
+    ('outro', 'Outro')
+]
+
 # Formulário de Cadastro de Paciente
 class NovoPacienteForm(FlaskForm):
     nome_completo = StringField("Nome Completo", validators=[DataRequired()])
@@ -25,26 +48,10 @@ class NovoPacienteForm(FlaskForm):
     endereco = TextAreaField("Endereço", validators=[DataRequired()])
     email = StringField("Email", validators=[DataRequired(), Email()])
     telefone = StringField("Telefone", validators=[DataRequired()])
-    escolaridade = SelectField("Escolaridade", choices=[
-        ('fundamental', 'Fundamental'),
-        ('medio', 'Médio'),
-        ('superior', 'Superior'),
-        ('pos', 'Pós-Graduação'),
-        ('outro', 'Outro')
-    ], validators=[DataRequired()])
+    escolaridade = SelectField("Escolaridade", choices=ESCOLARIDADES, validators=[DataRequired()])
     religiao = StringField("Religião", validators=[Optional()])
-    estado_civil = SelectField("Estado Civil", choices=[
-        ('solteiro', 'Solteiro(a)'),
-        ('casado', 'Casado(a)'),
-        ('divorciado', 'Divorciado(a)'),
-        ('viuvo', 'Viúvo(a)')
-    ], validators=[DataRequired()])
-    servico_buscado = SelectField("Serviço Buscado", choices=[
-        ('consulta', 'Consulta'),
-        ('terapia', 'Terapia'),
-        ('exame', 'Exame'),
-        ('outro', 'Outro')
-    ], validators=[DataRequired()])
+    estado_civil = SelectField("Estado Civil", choices=ESTADOS_CIVIS, validators=[DataRequired()])
+    servico_buscado = SelectField("Serviço Buscado", choices=SERVICOS_BUSCADOS, validators=[DataRequired()])
     servico_buscado_outro = StringField("Outro Serviço", validators=[Optional()])
 
     submit = SubmitField("Salvar")
@@ -58,7 +65,8 @@ class MedicalRecordForm(FlaskForm):
 
 # Formulário de Agendamento
 class AppointmentForm(FlaskForm):
-    paciente_id = SelectField('Paciente', coerce=int, validators=[DataRequired()])
+    # Preenchido pela busca de pacientes (/api/pacientes/busca); a rota confere se o id existe
+    paciente_id = IntegerField('Paciente', widget=HiddenInput(), validators=[DataRequired()])
     sala = SelectField('Sala', choices=[
         ('Sala 1', 'Sala 1'),
         ('Sala 2', 'Sala 2'),
@@ -72,6 +80,14 @@ class AppointmentForm(FlaskForm):
         ('60', '1 hora'),
     ], validators=[DataRequired()])
     observacoes = TextAreaField('Observações', validators=[Optional()])
+    # Série recorrente: as mesmas sala, duração e horário repetidos (agenda.RECORRENCIAS)
+    recorrencia = SelectField('Repetir', choices=[
+        ('', 'Não repetir'),
+        ('semanal', 'Toda semana'),
+        ('quinzenal', 'A cada duas semanas'),
+    ], validators=[Optional()])
+    ocorrencias = IntegerField('Número de sessões', default=1, validators=[Optional(), NumberRange(min=1, max=52)])
+    pular_conflitos = BooleanField('Agendar as sessões livres e pular as que conflitarem')
     submit = SubmitField('Agendar')
 
 # Formulário de Usuário
@@ -90,3 +106,24 @@ class UserForm(FlaskForm):
         validators=[DataRequired()]
     )
     submit = SubmitField('Criar Usuário')
+
+# Formulário de Exportação em Lote
+class ExportacaoLoteForm(FlaskForm):
+    formato = SelectField('Formato', choices=[('docx', 'Word (DOCX)'), ('xlsx', 'Excel (XLSX)')],
+                          validators=[DataRequired()])
+    servico_buscado = SelectField('Serviço Buscado', choices=[('', 'Todos'), *SERVICOS_BUSCADOS],
+                                  validators=[Optional()])
+    medico_id = SelectField('Médico', coerce=int, validators=[Optional()])
+    submit = SubmitField('Exportar')
+
+# Troca do link do feed .ics (lista de agendamentos)
+class NovoLinkAgendaForm(FlaskForm):
+    submit = SubmitField('Gerar novo link')
+
+# Formulário de Importação de Pacientes
+class ImportacaoPacientesForm(FlaskForm):
+    arquivo = FileField('Arquivo (CSV ou XLSX)', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx'], 'Envie um arquivo CSV ou XLSX.'),
+    ])
+    submit = SubmitField('Importar')
@@ -0,0 +1,220 @@
+"""Cache de fragmentos de template já renderizados.
+
+Blocos caros dos templates (as tabelas de pacientes e de agendamentos) são
+envolvidos com `{% call fragmento('nome') %}...{% endcall %}`. O HTML gerado
+fica num LRU em memória, limitado em número de itens e em bytes, e
+opcionalmente em FRAGMENTOS_DIR, uma pasta compartilhada entre os workers.
+
+A chave junta o nome do fragmento, as versões dos recursos de que ele depende
+(`versao_recurso`, ver conditional.py; `{usuario}` no nome do recurso vira o id
+do usuário logado, como em agenda:{usuario}), a função do usuário, o usuário quando
+o conteúdo é pessoal e a query string. Como as versões vêm do banco, um
+worker nunca serve o fragmento de dados que outro worker já alterou. Os
+eventos after_insert/after_update/after_delete de Patient e Appointment
+descartam, após o commit, as entradas que ficaram obsoletas, liberando o
+espaço na hora em vez de esperar o LRU.
+
+Os dados do bloco devem ser carregados dentro dele (por uma função passada ao
+template), para que um acerto não execute as consultas.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import g, request
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from conditional import ler_versoes
+from extensions import db
+from models import Appointment, Patient
+
+Fragmento = namedtuple('Fragmento', 'recursos por_usuario')
+
+# Fragmentos conhecidos: recursos de que dependem e se o conteúdo muda por usuário
+FRAGMENTOS = {
+    'tabela_pacientes': Fragmento(('pacientes',), False),
+    'tabela_agendamentos': Fragmento(('agenda:{usuario}', 'pacientes'), True),
+}
+
+# Modelo -> recurso alterado por ele (só os recursos de algum fragmento de FRAGMENTOS)
+RECURSO_DO_MODELO = {Patient: 'pacientes', Appointment: 'agenda:{usuario}'}
+
+
+class CacheFragmentos:
+    """LRU de HTML por chave, limitado por itens e bytes, com armazenamento em arquivo opcional."""
+
+    def __init__(self, maximo_itens=256, maximo_bytes=8 * 1024 * 1024, pasta=None):
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.configurar(maximo_itens, maximo_bytes, pasta)
+
+    def configurar(self, maximo_itens, maximo_bytes, pasta=None):
+        with self._lock:
+            self.maximo_itens = maximo_itens
+            self.maximo_bytes = maximo_bytes
+            self.pasta = pasta or None
+            self._itens.clear()
+            self.bytes = 0
+        if self.pasta:
+            os.makedirs(self.pasta, exist_ok=True)
+
+    @property
+    def ativo(self):
+        return self.maximo_itens > 0 and self.maximo_bytes > 0
+
+    def _arquivo(self, nome, chave):
+        return os.path.join(self.pasta, f'{nome}-{chave}.html')
+
+    def obter(self, nome, chave):
+        with self._lock:
+            html = self._itens.get((nome, chave))
+            if html is not None:
+                self._itens.move_to_end((nome, chave))
+                self.acertos += 1
+                return html
+        if self.pasta:
+            try:
+                with open(self._arquivo(nome, chave), encoding='utf-8') as arquivo:
+                    html = arquivo.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self._guardar_local(nome, chave, html)
+                with self._lock:
+                    self.acertos += 1
+                return html
+        with self._lock:
+            self.falhas += 1
+        return None
+
+    def guardar(self, nome, chave, html):
+        self._guardar_local(nome, chave, html)
+        if self.pasta:
+            # Escrita atômica: outro worker nunca lê um arquivo pela metade
+            descritor, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+            with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+                arquivo.write(html)
+            os.replace(temporario, self._arquivo(nome, chave))
+
+    def _guardar_local(self, nome, chave, html):
+        tamanho = len(html)
+        if tamanho > self.maximo_bytes:
+            return
+        with self._lock:
+            anterior = self._itens.pop((nome, chave), None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self._itens[(nome, chave)] = html
+            self.bytes += tamanho
+            while len(self._itens) > self.maximo_itens or self.bytes > self.maximo_bytes:
+                _, descartado = self._itens.popitem(last=False)
+                self.bytes -= len(descartado)
+                self.descartes += 1
+
+    def invalidar(self, nomes):
+        """Remove todas as entradas dos fragmentos `nomes`, na memória e na pasta."""
+        nomes = set(nomes)
+        with self._lock:
+            for item in [item for item in self._itens if item[0] in nomes]:
+                self.bytes -= len(self._itens.pop(item))
+        if self.pasta:
+            with os.scandir(self.pasta) as entradas:
+                for entrada in entradas:
+                    if entrada.name.rsplit('-', 1)[0] in nomes:
+                        try:
+                            os.remove(entrada.path)
+                        except FileNotFoundError:
+                            pass
+
+    def limpar(self):
+        self.invalidar(list(FRAGMENTOS))
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / total, 4) if total else 0.0,
+                'descartes': self.descartes,
+                'itens': len(self._itens),
+                'bytes': self.bytes,
+                'maximo_itens': self.maximo_itens,
+                'maximo_bytes': self.maximo_bytes,
+                'pasta': self.pasta,
+            }
+
+
+cache_fragmentos = CacheFragmentos()
+
+
+# --- Chaves ---
+
+def chave_fragmento(nome):
+    """Chave do fragmento para a requisição atual."""
+    fragmento = FRAGMENTOS[nome]
+    recursos = [recurso.format(usuario=current_user.get_id()) for recurso in fragmento.recursos]
+    # As versões já lidas pelo @get_condicional da rota são reaproveitadas
+    versoes = dict(g.get('versoes_recurso') or {})
+    faltantes = [recurso for recurso in recursos if recurso not in versoes]
+    if faltantes:
+        versoes.update(ler_versoes(faltantes)[0])
+    partes = [
+        *(f'{recurso}={versoes[recurso]}' for recurso in recursos),
+        getattr(current_user, 'funcao', ''),
+        str(current_user.get_id()) if fragmento.por_usuario else '',
+        request.full_path,
+    ]
+    return hashlib.blake2b('\x1f'.join(partes).encode(), digest_size=16).hexdigest()
+
+
+def fragmento(nome, caller):
+    """Global do Jinja: `{% call fragmento('nome') %}` renderiza o bloco só na falta."""
+    if not cache_fragmentos.ativo:
+        return caller()
+    chave = chave_fragmento(nome)
+    html = cache_fragmentos.obter(nome, chave)
+    if html is None:
+        html = str(caller())
+        cache_fragmentos.guardar(nome, chave, html)
+    return Markup(html)
+
+
+# --- Invalidação: fragmentos afetados são descartados após o commit ---
+
+def _marcar(mapper, connection, target):
+    recurso = RECURSO_DO_MODELO[mapper.class_]
+    nomes = object_session(target).info.setdefault('fragmentos_alterados', set())
+    nomes.update(nome for nome, fragmento in FRAGMENTOS.items() if recurso in fragmento.recursos)
+
+
+for _modelo in RECURSO_DO_MODELO:
+    for _evento in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_modelo, _evento, _marcar)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_fragmentos(session):
+    nomes = session.info.pop('fragmentos_alterados', None)
+    if nomes:
+        cache_fragmentos.invalidar(nomes)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_marcas(session):
+    session.info.pop('fragmentos_alterados', None)
+
+
+def configurar_fragmentos(app):
+    cache_fragmentos.configurar(app.config['FRAGMENTOS_MAX_ITENS'], app.config['FRAGMENTOS_MAX_BYTES'],
+                                app.config['FRAGMENTOS_DIR'])
+    app.jinja_env.globals['fragmento'] = fragmento
@@ -0,0 +1,17 @@
+"""Configuração do gunicorn, lida automaticamente do diretório em que ele é iniciado.
+
+O gancho on_starting roda uma vez no processo mestre, antes de qualquer
+worker existir (nem os reinícios de workers nem o HUP o repetem): é o único
+momento seguro para marcar como erro as exportações em lote que ficaram em
+andamento quando o servidor parou (ver jobs.py).
+"""
+
+
+def on_starting(server):
+    from app import create_app
+    from jobs import interromper_jobs_orfaos
+
+    app = create_app()
+    with app.app_context():
+        if interromper_jobs_orfaos():
+            server.log.warning('Exportações em lote interrompidas pelo reinício do servidor marcadas como erro.')
@@ -0,0 +1,129 @@
+"""Cache de identidade para o user_loader do Flask-Login.
+
+Evita um SELECT em `user` a cada requisição autenticada. Guarda só os campos
+que a aplicação usa em `current_user`, com expiração (TTL) e descarte do menos
+usado (LRU). Alterações em `User` confirmadas pela sessão invalidam a entrada
+na hora; o TTL limita a defasagem entre processos diferentes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from extensions import db
+from models import User
+
+
+class UsuarioCache(UserMixin):
+    """Versão leve e somente leitura de User, usada como current_user."""
+
+    __slots__ = ('id', 'username', 'nome_completo', 'funcao')
+
+    def __init__(self, id, username, nome_completo, funcao):
+        self.id = id
+        self.username = username
+        self.nome_completo = nome_completo
+        self.funcao = funcao
+
+    def __repr__(self):
+        return f'<UsuarioCache {self.id} {self.username}>'
+
+
+class CacheIdentidade:
+    """Mapa id -> UsuarioCache com TTL e LRU, seguro entre threads."""
+
+    def __init__(self, ttl=300, maximo=1024):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def configurar(self, ttl, maximo):
+        with self._lock:
+            self.ttl = ttl
+            self.maximo = maximo
+            self._itens.clear()
+
+    @property
+    def ativo(self):
+        return self.ttl > 0 and self.maximo > 0
+
+    def obter(self, user_id, carregar):
+        """Retorna o usuário em cache ou chama `carregar(user_id)` e guarda o resultado."""
+        if not self.ativo:
+            return carregar(user_id)
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(user_id)
+            if item is not None and item[0] > agora:
+                self._itens.move_to_end(user_id)
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+
+        usuario = carregar(user_id)
+        if usuario is not None:
+            with self._lock:
+                self._itens[user_id] = (agora + self.ttl, usuario)
+                self._itens.move_to_end(user_id)
+                while len(self._itens) > self.maximo:
+                    self._itens.popitem(last=False)
+                    self.descartes += 1
+        return usuario
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._itens.pop(user_id, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / total, 4) if total else 0.0,
+                'descartes': self.descartes,
+                'tamanho': len(self._itens),
+                'maximo': self.maximo,
+                'ttl': self.ttl,
+            }
+
+
+cache_usuarios = CacheIdentidade()
+
+
+def carregar_usuario(user_id):
+    """Busca só as colunas usadas em current_user."""
+    linha = db.session.query(User.id, User.username, User.nome_completo, User.funcao)\
+                      .filter(User.id == user_id).first()
+    return UsuarioCache(*linha) if linha else None
+
+
+# --- Invalidação: usuários alterados/removidos são descartados após o commit ---
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_usuarios_alterados(session, flush_context):
+    ids = session.info.setdefault('usuarios_alterados', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            ids.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_usuarios_alterados(session):
+    for user_id in session.info.pop('usuarios_alterados', ()):
+        cache_usuarios.invalidar(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_marcas(session):
+    session.info.pop('usuarios_alterados', None)
@@ -0,0 +1,195 @@
+"""Exportação em lote de prontuários em segundo plano.
+
+Cada job fica registrado na tabela `export_job`. Uma thread coordenadora
+distribui os pacientes para um ProcessPoolExecutor local: cada processo gera o
+DOCX/XLSX de um paciente com as mesmas funções de exporters.py, e a thread
+junta os arquivos em um ZIP, atualizando o progresso no banco.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, select, update
+
+from extensions import db
+from models import ExportJob, Patient, MedicalRecord
+from archive import anexar, uniao
+from database import pragmas_sqlite, registrar_pragmas
+from exporters import ESCRITORES, LOTE, consulta_registros
+
+# Intervalo mínimo entre gravações de progresso no banco (segundos)
+INTERVALO_PROGRESSO = 0.5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pasta_exportacoes(app):
+    pasta = app.config.get('EXPORT_DIR') or os.path.join(app.instance_path, 'exportacoes')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _obter_pool(app):
+    """Pool de processos compartilhado, criado no primeiro job.
+
+    Usa 'spawn' para não herdar conexões nem locks do servidor web.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=app.config.get('EXPORT_WORKERS') or os.cpu_count(),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def pacientes_filtrados(servico_buscado=None, medico_id=None):
+    """Ids dos pacientes que entram na exportação."""
+    query = db.session.query(Patient.id)
+    if servico_buscado:
+        query = query.filter(Patient.servico_buscado == servico_buscado)
+    if medico_id:
+        registros = uniao(MedicalRecord.__table__, lambda c: c.medico_id == medico_id).subquery()
+        atendidos = select(registros.c.paciente_id)
+        query = query.filter(Patient.id.in_(atendidos))
+    return [paciente_id for (paciente_id,) in query.order_by(Patient.id)]
+
+
+# --- Execução nos processos do pool ---
+
+_engine_processo = None
+
+
+def _exportar_paciente(database_uri, pragmas, arquivo, paciente_id, formato, diretorio):
+    """Gera o arquivo de um paciente; devolve (caminho, nome dentro do ZIP)."""
+    global _engine_processo
+    if _engine_processo is None:
+        _engine_processo = create_engine(database_uri)
+        registrar_pragmas(_engine_processo, pragmas)
+        if arquivo:
+            anexar(_engine_processo, arquivo, dict(pragmas)['journal_mode'])
+
+    with _engine_processo.connect() as conn:
+        nome = conn.execute(select(Patient.nome_completo).where(Patient.id == paciente_id)).scalar_one()
+        registros = conn.execution_options(yield_per=LOTE).execute(consulta_registros(paciente_id))
+        caminho = os.path.join(diretorio, f'{paciente_id}.{formato}')
+        with open(caminho, 'wb') as destino:
+            ESCRITORES[formato](destino, nome, registros)
+    return caminho, f'{paciente_id}_prontuario_{nome.replace(" ", "_")}.{formato}'
+
+
+# --- Coordenação ---
+
+def _executar(app, job_id, paciente_ids):
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        job.status = 'executando'
+        db.session.commit()
+
+        pasta = pasta_exportacoes(app)
+        temporaria = tempfile.mkdtemp(dir=pasta)
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+        pragmas = pragmas_sqlite(app.config)
+        arquivo = app.config['ARQUIVO_DATABASE']
+        caminho_zip = os.path.join(pasta, f'exportacao_{job_id}.zip')
+        futuros = []
+        try:
+            pool = _obter_pool(app)
+            futuros = [pool.submit(_exportar_paciente, database_uri, pragmas, arquivo, paciente_id, job.formato,
+                                   temporaria)
+                       for paciente_id in paciente_ids]
+            ultima_gravacao = 0.0
+            # DOCX e XLSX já são ZIPs comprimidos; recomprimir só gastaria CPU
+            with zipfile.ZipFile(caminho_zip, 'w', zipfile.ZIP_STORED) as pacote:
+                for concluidos, futuro in enumerate(as_completed(futuros), 1):
+                    caminho, nome = futuro.result()
+                    pacote.write(caminho, nome)
+                    os.remove(caminho)
+                    agora = time.monotonic()
+                    if agora - ultima_gravacao >= INTERVALO_PROGRESSO:
+                        job.concluidos = concluidos
+                        db.session.commit()
+                        ultima_gravacao = agora
+
+            job.concluidos = len(paciente_ids)
+            job.arquivo = os.path.basename(caminho_zip)
+            job.status = 'concluido'
+        except Exception as exc:
+            for futuro in futuros:
+                futuro.cancel()
+            if os.path.exists(caminho_zip):
+                os.remove(caminho_zip)
+            job.status = 'erro'
+            job.erro = str(exc)
+            app.logger.exception('Falha na exportação em lote %s', job_id)
+        finally:
+            # Tarefas já em execução não são canceladas: a pasta só é apagada depois que elas terminam
+            wait(futuros)
+            shutil.rmtree(temporaria, ignore_errors=True)
+        job.concluido_em = datetime.utcnow()
+        db.session.commit()
+
+
+def criar_job(app, formato, usuario_id, servico_buscado=None, medico_id=None):
+    """Registra o job, dispara a thread coordenadora e devolve o ExportJob."""
+    paciente_ids = pacientes_filtrados(servico_buscado, medico_id)
+    job = ExportJob(
+        formato=formato,
+        filtro=json.dumps({'servico_buscado': servico_buscado, 'medico_id': medico_id}),
+        total=len(paciente_ids),
+        criado_por_id=usuario_id,
+    )
+    db.session.add(job)
+    db.session.commit()
+    threading.Thread(target=_executar, args=(app, job.id, paciente_ids),
+                     name=f'exportacao-{job.id}', daemon=True).start()
+    return job
+
+
+def interromper_jobs_orfaos():
+    """Marca como erro os jobs pendentes ou em execução de uma execução anterior do servidor.
+
+    A thread e o pool de um job morrem com o processo; sem isto o job ficaria
+    'executando' para sempre. Só pode rodar quando nenhum worker está no ar:
+    um worker vivo teria os seus jobs marcados como erro no meio da exportação.
+    Por isso não roda na importação de wsgi.py (cada worker sem --preload, e
+    cada worker reiniciado, a repetiria), e sim uma vez no mestre do gunicorn
+    (gunicorn.conf.py) ou pelo comando abaixo, com o servidor parado.
+    """
+    resultado = db.session.execute(
+        update(ExportJob)
+        .where(ExportJob.status.in_(('pendente', 'executando')))
+        .values(status='erro', erro='Interrompido: o servidor reiniciou durante a exportação.',
+                concluido_em=datetime.utcnow()))
+    db.session.commit()
+    return resultado.rowcount
+
+
+@click.command('interromper-exportacoes')
+@with_appcontext
+def interromper_exportacoes():
+    """Marca como erro as exportações em lote que ficaram em andamento (rodar com o servidor parado)."""
+    print(f'{interromper_jobs_orfaos()} exportações em lote marcadas como erro.')
+
+
+def progresso(job):
+    return {
+        'id': job.id,
+        'formato': job.formato,
+        'status': job.status,
+        'total': job.total,
+        'concluidos': job.concluidos,
+        'percentual': round(100 * job.concluidos / job.total, 1) if job.total else 100.0,
+        'erro': job.erro,
+        'criado_em': job.criado_em.isoformat() if job.criado_em else None,
+        'concluido_em': job.concluido_em.isoformat() if job.concluido_em else None,
+    }
@@ -0,0 +1,72 @@
+"""Consultas do prontuário que não carregam o texto das evoluções.
+
+O gráfico da página usa só o tamanho de cada evolução, calculado no banco com
+length() e agrupado por dia (ou por mês, em prontuários longos). A lista de
+evoluções é paginada por cursor, das mais recentes para as mais antigas, com
+`evolucao` adiada: cada item traz apenas uma prévia (substr) e o tamanho; o
+texto completo é buscado quando o usuário pede.
+
+Todas leem o histórico inteiro: as tabelas principais e o banco de arquivo
+(archive.py), juntos em um UNION ALL filtrado pelo paciente dos dois lados.
+"""
+from sqlalchemy import func
+from sqlalchemy.orm import aliased, defer, with_expression
+
+from archive import uniao
+from extensions import db
+from models import MedicalRecord
+from pagination import paginar_requisicao
+
+POR_PAGINA = 20
+TAMANHO_PREVIA = 300
+# Acima disso o gráfico passa a ter um ponto por mês
+PONTOS_MAXIMOS = 366
+
+
+def historico(paciente_id):
+    """Registros do paciente nos bancos principal e de arquivo, como entidade MedicalRecord (só leitura)."""
+    return aliased(MedicalRecord, uniao(MedicalRecord.__table__, lambda c: c.paciente_id == paciente_id)
+                   .subquery('historico'))
+
+
+def serie_evolucao(paciente_id):
+    """(rótulos, valores) do gráfico: tamanho médio das evoluções por dia ou mês."""
+    registros = historico(paciente_id)
+    dias = db.session.query(func.count(func.distinct(func.date(registros.data_sessao)))).scalar()
+    if dias > PONTOS_MAXIMOS:
+        periodo, formato = func.strftime('%Y-%m', registros.data_sessao), '{1}/{0}'
+    else:
+        periodo, formato = func.date(registros.data_sessao), '{2}/{1}/{0}'
+    linhas = db.session.query(periodo, func.avg(func.length(registros.evolucao)))\
+                       .group_by(periodo).order_by(periodo).all()
+    labels = [formato.format(*rotulo.split('-')) for rotulo, _ in linhas]
+    valores = [round(media) for _, media in linhas]
+    return labels, valores
+
+
+def pagina_evolucoes(paciente_id):
+    """Página de evoluções (mais recentes primeiro) lida de request.args, sem o texto completo."""
+    registros = historico(paciente_id)
+    query = db.session.query(registros).options(
+        defer(registros.evolucao),
+        with_expression(registros.previa, func.substr(registros.evolucao, 1, TAMANHO_PREVIA)),
+        with_expression(registros.tamanho, func.length(registros.evolucao)),
+    )
+    return paginar_requisicao(query, [registros.data_sessao, registros.id],
+                              limite_padrao=POR_PAGINA, decrescente=True)
+
+
+def evolucao_completa(paciente_id, registro_id):
+    """O registro com o texto completo, esteja ele no banco principal ou no arquivo; None se não existir."""
+    registros = historico(paciente_id)
+    return db.session.query(registros).filter(registros.id == registro_id).first()
+
+
+def resumo_evolucao(registro):
+    return {
+        'id': registro.id,
+        'data': registro.data_sessao.strftime('%d/%m/%Y'),
+        'previa': registro.previa,
+        'tamanho': registro.tamanho,
+        'completa': registro.tamanho <= TAMANHO_PREVIA,
+    }
@@ -0,0 +1,190 @@
+"""Métricas de requisições no formato texto do Prometheus.
+
+Por endpoint: histograma de latência, contagem por status, número e tempo dos
+comandos SQL (eventos do engine) e tempo de renderização de templates (sinais
+do Flask). Cada thread escreve só no seu próprio `_Fragmento`, sem locks; a
+rota /metrics soma os fragmentos de todas as threads na hora da coleta. Por
+requisição não há alocação além da primeira vez que a thread vê um endpoint
+ou um status.
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from flask import before_render_template, request, template_rendered
+from sqlalchemy import event
+
+# Limites (segundos) dos buckets do histograma de latência
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SEM_ENDPOINT = 'sem_endpoint'
+
+_POS_SOMA = len(BUCKETS) + 1
+_POS_SQL_N = _POS_SOMA + 1
+_POS_SQL_T = _POS_SOMA + 2
+_POS_TEMPLATE_T = _POS_SOMA + 3
+
+
+class _Fragmento:
+    """Contadores de uma thread. Só a própria thread escreve aqui."""
+
+    __slots__ = ('endpoints', 'status', 'inicio', 'sql_n', 'sql_t', 'sql_inicio',
+                 'template_t', 'template_inicio')
+
+    def __init__(self):
+        # endpoint -> [buckets..., +Inf, soma, sql_n, sql_t, template_t]
+        self.endpoints = {}
+        # (endpoint, status) -> contagem
+        self.status = {}
+        self.inicio = None
+        self.sql_n = 0
+        self.sql_t = 0.0
+        self.sql_inicio = 0.0
+        self.template_t = 0.0
+        self.template_inicio = 0.0
+
+
+_local = threading.local()
+_fragmentos = []
+_fragmentos_lock = threading.Lock()
+
+
+def _fragmento():
+    try:
+        return _local.fragmento
+    except AttributeError:
+        fragmento = _local.fragmento = _Fragmento()
+        with _fragmentos_lock:
+            _fragmentos.append(fragmento)
+        return fragmento
+
+
+# --- Coleta ---
+
+def _inicio_requisicao():
+    f = _fragmento()
+    f.sql_n = 0
+    f.sql_t = 0.0
+    f.template_t = 0.0
+    f.inicio = perf_counter()
+
+
+def _registrar(status):
+    f = _fragmento()
+    if f.inicio is None:
+        return
+    duracao = perf_counter() - f.inicio
+    f.inicio = None
+    endpoint = request.endpoint or SEM_ENDPOINT
+    linha = f.endpoints.get(endpoint)
+    if linha is None:
+        linha = f.endpoints[endpoint] = [0] * (_POS_SOMA + 1) + [0, 0.0, 0.0]
+    linha[bisect_left(BUCKETS, duracao)] += 1
+    linha[_POS_SOMA] += duracao
+    linha[_POS_SQL_N] += f.sql_n
+    linha[_POS_SQL_T] += f.sql_t
+    linha[_POS_TEMPLATE_T] += f.template_t
+    chave = (endpoint, status)
+    f.status[chave] = f.status.get(chave, 0) + 1
+
+
+def _fim_requisicao(resposta):
+    _registrar(resposta.status_code)
+    return resposta
+
+
+def _erro_requisicao(exc):
+    # Só chega aqui sem ter passado por after_request quando a view levantou exceção
+    if exc is not None:
+        _registrar(500)
+
+
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    _fragmento().sql_inicio = perf_counter()
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    f = _fragmento()
+    f.sql_n += 1
+    f.sql_t += perf_counter() - f.sql_inicio
+
+
+def _antes_template(sender, template, context, **extra):
+    _fragmento().template_inicio = perf_counter()
+
+
+def _depois_template(sender, template, context, **extra):
+    f = _fragmento()
+    f.template_t += perf_counter() - f.template_inicio
+
+
+def configurar_metricas(app, db):
+    if not app.config.get('METRICAS_ATIVAS', True):
+        return
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes_sql)
+        event.listen(db.engine, 'after_cursor_execute', _depois_sql)
+    before_render_template.connect(_antes_template, app)
+    template_rendered.connect(_depois_template, app)
+    app.before_request(_inicio_requisicao)
+    app.after_request(_fim_requisicao)
+    app.teardown_request(_erro_requisicao)
+
+
+# --- Exposição ---
+
+def _somar():
+    endpoints, status = {}, {}
+    with _fragmentos_lock:
+        fragmentos = list(_fragmentos)
+    for f in fragmentos:
+        # dict.copy() é atômico no CPython: a thread dona pode continuar escrevendo
+        for endpoint, linha in f.endpoints.copy().items():
+            total = endpoints.setdefault(endpoint, [0] * len(linha))
+            for i, valor in enumerate(list(linha)):
+                total[i] += valor
+        for chave, contagem in f.status.copy().items():
+            status[chave] = status.get(chave, 0) + contagem
+    return endpoints, status
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def texto_prometheus(extras=()):
+    """Todas as métricas no formato de exposição texto 0.0.4.
+
+    `extras` são tuplas (nome, tipo, ajuda, valor) acrescentadas ao final.
+    """
+    endpoints, status = _somar()
+    linhas = [
+        '# HELP clinica_requisicao_duracao_segundos Latência das requisições por endpoint.',
+        '# TYPE clinica_requisicao_duracao_segundos histogram',
+    ]
+    for endpoint, linha in sorted(endpoints.items()):
+        rotulo = f'endpoint="{_rotulo(endpoint)}"'
+        acumulado = 0
+        for limite, contagem in zip((*BUCKETS, '+Inf'), linha):
+            acumulado += contagem
+            linhas.append(f'clinica_requisicao_duracao_segundos_bucket{{{rotulo},le="{limite}"}} {acumulado}')
+        linhas.append(f'clinica_requisicao_duracao_segundos_sum{{{rotulo}}} {linha[_POS_SOMA]:.6f}')
+        linhas.append(f'clinica_requisicao_duracao_segundos_count{{{rotulo}}} {acumulado}')
+
+    linhas += ['# HELP clinica_requisicoes_total Requisições por endpoint e status HTTP.',
+               '# TYPE clinica_requisicoes_total counter']
+    for (endpoint, codigo), contagem in sorted(status.items()):
+        linhas.append(f'clinica_requisicoes_total{{endpoint="{_rotulo(endpoint)}",status="{codigo}"}} {contagem}')
+
+    for nome, posicao, ajuda, formato in (
+        ('clinica_sql_comandos_total', _POS_SQL_N, 'Comandos SQL executados por endpoint.', '{}'),
+        ('clinica_sql_duracao_segundos_total', _POS_SQL_T, 'Tempo gasto em comandos SQL por endpoint.', '{:.6f}'),
+        ('clinica_template_duracao_segundos_total', _POS_TEMPLATE_T,
+         'Tempo de renderização de templates por endpoint.', '{:.6f}'),
+    ):
+        linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} counter']
+        for endpoint, linha in sorted(endpoints.items()):
+            linhas.append(f'{nome}{{endpoint="{_rotulo(endpoint)}"}} {formato.format(linha[posicao])}')
+
+    for nome, tipo, ajuda, valor in extras:
+        linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}', f'{nome} {valor}']
+    return '\n'.join(linhas) + '\n'
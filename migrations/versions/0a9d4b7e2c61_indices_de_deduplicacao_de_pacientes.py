@@ -0,0 +1,34 @@
+"""Indices de deduplicacao de pacientes
+
+Revision ID: 0a9d4b7e2c61
+Revises: f3c8a1d5e6b7
+Create Date: 2025-09-29 16:05:47.902318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a9d4b7e2c61'
+down_revision = 'f3c8a1d5e6b7'
+branch_labels = None
+depends_on = None
+
+
+def _digitos(coluna):
+    expr = coluna
+    for caractere in (' ', '(', ')', '-', '.', '+', '/'):
+        expr = f"replace({expr}, '{caractere}', '')"
+    return expr
+
+
+def upgrade():
+    # Mesmas expressões de patient_import.py, para que as consultas de duplicados usem os índices
+    op.execute('CREATE INDEX ix_patient_email_normalizado ON patient (lower(trim(email)))')
+    op.execute(f"CREATE INDEX ix_patient_telefone_normalizado ON patient ({_digitos('telefone')})")
+
+
+def downgrade():
+    op.execute('DROP INDEX ix_patient_telefone_normalizado')
+    op.execute('DROP INDEX ix_patient_email_normalizado')
@@ -0,0 +1,66 @@
+"""Tabela versao_recurso e triggers de versao
+
+Revision ID: 1b6e8f2a9d34
+Revises: 0a9d4b7e2c61
+Create Date: 2025-10-02 10:47:13.551062
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b6e8f2a9d34'
+down_revision = '0a9d4b7e2c61'
+branch_labels = None
+depends_on = None
+
+
+def _incrementar(chave, condicao='1'):
+    # O WHERE evita a ambiguidade entre o SELECT e o ON CONFLICT do upsert
+    return (f'INSERT INTO versao_recurso (chave, versao, alterado_em) SELECT {chave}, 1, CURRENT_TIMESTAMP '
+            f'WHERE {condicao} ON CONFLICT (chave) DO UPDATE SET versao = versao + 1, alterado_em = excluded.alterado_em;')
+
+
+# Mesmo SQL gerado por conditional.py
+RECURSOS = {
+    'patient': lambda p: ["'pacientes'", f"'prontuario:' || {p}.id"],
+    'appointment': lambda p: ["'agendamentos'"],
+    'medical_record': lambda p: [f"'prontuario:' || {p}.paciente_id"],
+}
+
+
+def _triggers(tabela):
+    chaves = RECURSOS[tabela]
+    corpo = {
+        'ai': [_incrementar(chave) for chave in chaves('NEW')],
+        'ad': [_incrementar(chave) for chave in chaves('OLD')],
+        'au': [_incrementar(nova) for nova in chaves('NEW')]
+              + [_incrementar(antiga, f'{antiga} <> {nova}')
+                 for antiga, nova in zip(chaves('OLD'), chaves('NEW')) if antiga != nova],
+    }
+    evento = {'ai': 'AFTER INSERT', 'ad': 'AFTER DELETE', 'au': 'AFTER UPDATE'}
+    return [
+        f'CREATE TRIGGER {tabela}_versao_{sufixo} {evento[sufixo]} ON {tabela} BEGIN\n    '
+        + '\n    '.join(comandos) + '\nEND'
+        for sufixo, comandos in corpo.items()
+    ]
+
+
+def upgrade():
+    op.create_table('versao_recurso',
+    sa.Column('chave', sa.String(length=40), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.Column('alterado_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('chave')
+    )
+    for tabela in RECURSOS:
+        for trigger in _triggers(tabela):
+            op.execute(trigger)
+
+
+def downgrade():
+    for tabela in RECURSOS:
+        for sufixo in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {tabela}_versao_{sufixo}')
+    op.drop_table('versao_recurso')
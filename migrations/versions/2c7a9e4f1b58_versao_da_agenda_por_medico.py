@@ -0,0 +1,63 @@
+"""Versao da agenda por medico nos triggers de appointment
+
+Revision ID: 2c7a9e4f1b58
+Revises: 1b6e8f2a9d34
+Create Date: 2025-10-06 09:12:40.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c7a9e4f1b58'
+down_revision = '1b6e8f2a9d34'
+branch_labels = None
+depends_on = None
+
+
+def _incrementar(chave, condicao='1'):
+    # O WHERE evita a ambiguidade entre o SELECT e o ON CONFLICT do upsert
+    return (f'INSERT INTO versao_recurso (chave, versao, alterado_em) SELECT {chave}, 1, CURRENT_TIMESTAMP '
+            f'WHERE {condicao} ON CONFLICT (chave) DO UPDATE SET versao = versao + 1, alterado_em = excluded.alterado_em;')
+
+
+# Mesmo SQL gerado por conditional.py, antes e depois da chave agenda:<medico_id>
+def _chaves_antigas(p):
+    return ["'agendamentos'"]
+
+
+def _chaves_novas(p):
+    return ["'agendamentos'", f"'agenda:' || {p}.medico_id"]
+
+
+def _triggers(chaves):
+    corpo = {
+        'ai': [_incrementar(chave) for chave in chaves('NEW')],
+        'ad': [_incrementar(chave) for chave in chaves('OLD')],
+        'au': [_incrementar(nova) for nova in chaves('NEW')]
+              + [_incrementar(antiga, f'{antiga} <> {nova}')
+                 for antiga, nova in zip(chaves('OLD'), chaves('NEW')) if antiga != nova],
+    }
+    evento = {'ai': 'AFTER INSERT', 'ad': 'AFTER DELETE', 'au': 'AFTER UPDATE'}
+    return [
+        f'CREATE TRIGGER appointment_versao_{sufixo} {evento[sufixo]} ON appointment BEGIN\n    '
+        + '\n    '.join(comandos) + '\nEND'
+        for sufixo, comandos in corpo.items()
+    ]
+
+
+def _recriar(chaves):
+    for sufixo in ('ai', 'ad', 'au'):
+        op.execute(f'DROP TRIGGER IF EXISTS appointment_versao_{sufixo}')
+    for trigger in _triggers(chaves):
+        op.execute(trigger)
+
+
+def upgrade():
+    _recriar(_chaves_novas)
+
+
+def downgrade():
+    _recriar(_chaves_antigas)
+    op.execute("DELETE FROM versao_recurso WHERE chave LIKE 'agenda:%'")
@@ -0,0 +1,60 @@
+"""Indice de busca das evolucoes (FTS5, conteudo externo)
+
+Revision ID: 3d5f0a8c2e71
+Revises: 2c7a9e4f1b58
+Create Date: 2025-10-09 15:03:27.914052
+
+O índice é preenchido aqui ('rebuild'), antes dos triggers: os triggers de
+UPDATE e DELETE mandam o comando 'delete' do FTS5, que com uma linha ainda
+não indexada corrompe o índice ("database disk image is malformed").
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d5f0a8c2e71'
+down_revision = '2c7a9e4f1b58'
+branch_labels = None
+depends_on = None
+
+
+COLUNAS = 'rowid, evolucao, paciente_id, medico_id'
+
+
+def upgrade():
+    op.execute("""
+        CREATE VIRTUAL TABLE evolucao_busca USING fts5(
+            evolucao, paciente_id, medico_id,
+            content = 'medical_record', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("INSERT INTO evolucao_busca (evolucao_busca, rank) VALUES ('rank', 'bm25(1.0, 0.0, 0.0)')")
+    op.execute("INSERT INTO evolucao_busca (evolucao_busca) VALUES ('rebuild')")
+    op.execute(f"""
+        CREATE TRIGGER evolucao_busca_ai AFTER INSERT ON medical_record BEGIN
+            INSERT INTO evolucao_busca ({COLUNAS}) VALUES (NEW.id, NEW.evolucao, NEW.paciente_id, NEW.medico_id);
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER evolucao_busca_au AFTER UPDATE OF evolucao, paciente_id, medico_id
+        ON medical_record BEGIN
+            INSERT INTO evolucao_busca (evolucao_busca, {COLUNAS})
+            VALUES ('delete', OLD.id, OLD.evolucao, OLD.paciente_id, OLD.medico_id);
+            INSERT INTO evolucao_busca ({COLUNAS}) VALUES (NEW.id, NEW.evolucao, NEW.paciente_id, NEW.medico_id);
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER evolucao_busca_ad AFTER DELETE ON medical_record BEGIN
+            INSERT INTO evolucao_busca (evolucao_busca, {COLUNAS})
+            VALUES ('delete', OLD.id, OLD.evolucao, OLD.paciente_id, OLD.medico_id);
+        END
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS evolucao_busca_ad')
+    op.execute('DROP TRIGGER IF EXISTS evolucao_busca_au')
+    op.execute('DROP TRIGGER IF EXISTS evolucao_busca_ai')
+    op.execute('DROP TABLE IF EXISTS evolucao_busca')
@@ -0,0 +1,27 @@
+"""Reconstroi o indice de busca das evolucoes
+
+Revision ID: 7c2e9b4d1a06
+Revises: b6d1f4a8c923
+Create Date: 2025-10-16 10:21:07.342519
+
+Bancos que passaram pela 3d5f0a8c2e71 antes de ela preencher o índice podem
+estar com ele vazio ou pela metade (`flask reindexar-evolucoes` em lotes).
+O 'rebuild' relê medical_record inteira; num índice já completo não muda nada.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9b4d1a06'
+down_revision = 'b6d1f4a8c923'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("INSERT INTO evolucao_busca (evolucao_busca) VALUES ('rebuild')")
+
+
+def downgrade():
+    pass
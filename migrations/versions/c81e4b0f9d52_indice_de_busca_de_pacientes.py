@@ -0,0 +1,65 @@
+"""Indice de busca de pacientes (FTS5)
+
+Revision ID: c81e4b0f9d52
+Revises: a3f18c6d27e4
+Create Date: 2025-09-09 11:22:36.804417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81e4b0f9d52'
+down_revision = 'a3f18c6d27e4'
+branch_labels = None
+depends_on = None
+
+
+def _digitos(coluna):
+    expr = coluna
+    for caractere in (' ', '(', ')', '-', '.', '+', '/'):
+        expr = f"replace({expr}, '{caractere}', '')"
+    return expr
+
+
+def _valores(prefixo):
+    digitos = _digitos(f'{prefixo}.telefone')
+    return (f"{prefixo}.id, {prefixo}.nome_completo || ' ' || coalesce({prefixo}.nome_social, ''), "
+            f"{prefixo}.email, {digitos} || ' ' || substr({digitos}, -9) || ' ' || substr({digitos}, -8)")
+
+
+def upgrade():
+    op.execute("""
+        CREATE VIRTUAL TABLE paciente_busca USING fts5(
+            nome, email, telefone,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute(f"""
+        CREATE TRIGGER paciente_busca_ai AFTER INSERT ON patient BEGIN
+            INSERT INTO paciente_busca (rowid, nome, email, telefone) VALUES ({_valores('NEW')});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER paciente_busca_au AFTER UPDATE ON patient BEGIN
+            DELETE FROM paciente_busca WHERE rowid = OLD.id;
+            INSERT INTO paciente_busca (rowid, nome, email, telefone) VALUES ({_valores('NEW')});
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER paciente_busca_ad AFTER DELETE ON patient BEGIN
+            DELETE FROM paciente_busca WHERE rowid = OLD.id;
+        END
+    """)
+    op.execute(f"""
+        INSERT INTO paciente_busca (rowid, nome, email, telefone)
+        SELECT {_valores('patient')} FROM patient
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS paciente_busca_ad')
+    op.execute('DROP TRIGGER IF EXISTS paciente_busca_au')
+    op.execute('DROP TRIGGER IF EXISTS paciente_busca_ai')
+    op.execute('DROP TABLE IF EXISTS paciente_busca')
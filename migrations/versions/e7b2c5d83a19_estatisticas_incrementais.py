@@ -0,0 +1,151 @@
+"""Estatisticas incrementais (tabelas de resumo e triggers)
+
+Revision ID: e7b2c5d83a19
+Revises: d4a9e7c3b160
+Create Date: 2025-09-18 10:41:52.117603
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c5d83a19'
+down_revision = 'd4a9e7c3b160'
+branch_labels = None
+depends_on = None
+
+
+def _upsert(tabela, chaves, valores, condicao='1'):
+    colunas = ', '.join([*chaves, *valores])
+    expressoes = ', '.join([*chaves.values(), *valores.values()])
+    somas = ', '.join(f'{coluna} = {coluna} + excluded.{coluna}' for coluna in valores)
+    return (f'INSERT INTO {tabela} ({colunas}) SELECT {expressoes} WHERE {condicao} '
+            f'ON CONFLICT ({", ".join(chaves)}) DO UPDATE SET {somas};')
+
+
+def _remover_zerados(tabela, chaves, contadores):
+    filtro = ' AND '.join(f'{coluna} = {expr}' for coluna, expr in chaves.items())
+    zerados = ' AND '.join(f'{coluna} <= 0' for coluna in contadores)
+    return f'DELETE FROM {tabela} WHERE {filtro} AND {zerados};'
+
+
+def _ajustes(tabela, p, sinal):
+    if tabela == 'appointment':
+        alvos = [
+            ('estatistica_sala_dia',
+             {'sala': f"coalesce({p}.sala, '')", 'dia': f'date({p}.data_hora)'},
+             {'consultas': f'{sinal}', 'minutos': f'{sinal} * coalesce({p}.duracao, 0)'}, '1'),
+            ('estatistica_medico_semana',
+             {'medico_id': f'{p}.medico_id', 'semana': f"date({p}.data_hora, 'weekday 0', '-6 days')"},
+             {'consultas': f'{sinal}'}, '1'),
+        ]
+    elif tabela == 'patient':
+        alvos = [('estatistica_mes', {'mes': f"strftime('%Y-%m', {p}.criado_em)"},
+                  {'novos_pacientes': f'{sinal}', 'sessoes': '0'}, f'{p}.criado_em IS NOT NULL')]
+    else:
+        alvos = [('estatistica_mes', {'mes': f"strftime('%Y-%m', {p}.data_sessao)"},
+                  {'novos_pacientes': '0', 'sessoes': f'{sinal}'}, '1')]
+    comandos = []
+    for destino, chaves, valores, condicao in alvos:
+        comandos.append(_upsert(destino, chaves, valores, condicao))
+        if sinal < 0:
+            comandos.append(_remover_zerados(destino, chaves, valores))
+    return comandos
+
+
+FONTES = {
+    'appointment': ('agendamentos', 'sala, data_hora, duracao, medico_id'),
+    'patient': ('pacientes', 'criado_em'),
+    'medical_record': ('prontuarios', 'data_sessao'),
+}
+
+
+def _triggers(tabela):
+    chave, colunas = FONTES[tabela]
+    total = lambda sinal: _upsert('estatistica_total', {'chave': f"'{chave}'"}, {'valor': f'{sinal}'})
+    corpo = {
+        'ai': [*_ajustes(tabela, 'NEW', 1), total(1)],
+        'ad': [*_ajustes(tabela, 'OLD', -1), total(-1)],
+        'au': [*_ajustes(tabela, 'OLD', -1), *_ajustes(tabela, 'NEW', 1)],
+    }
+    evento = {'ai': 'AFTER INSERT', 'ad': 'AFTER DELETE', 'au': f'AFTER UPDATE OF {colunas}'}
+    return [f"CREATE TRIGGER {tabela}_estatisticas_{sufixo} {evento[sufixo]} ON {tabela} BEGIN\n"
+            + '\n'.join(comandos) + '\nEND'
+            for sufixo, comandos in corpo.items()]
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('estatistica_medico_semana',
+    sa.Column('medico_id', sa.Integer(), nullable=False),
+    sa.Column('semana', sa.Date(), nullable=False),
+    sa.Column('consultas', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('medico_id', 'semana')
+    )
+    op.create_index('ix_estatistica_medico_semana_semana', 'estatistica_medico_semana', ['semana'], unique=False)
+    op.create_table('estatistica_mes',
+    sa.Column('mes', sa.String(length=7), nullable=False),
+    sa.Column('novos_pacientes', sa.Integer(), nullable=False),
+    sa.Column('sessoes', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('mes')
+    )
+    op.create_table('estatistica_sala_dia',
+    sa.Column('sala', sa.String(length=20), nullable=False),
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('consultas', sa.Integer(), nullable=False),
+    sa.Column('minutos', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('sala', 'dia')
+    )
+    op.create_index('ix_estatistica_sala_dia_dia', 'estatistica_sala_dia', ['dia'], unique=False)
+    op.create_table('estatistica_total',
+    sa.Column('chave', sa.String(length=30), nullable=False),
+    sa.Column('valor', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('chave')
+    )
+    op.add_column('patient', sa.Column('criado_em', sa.DateTime(), nullable=True))
+    # ### end Alembic commands ###
+
+    for tabela in FONTES:
+        for trigger in _triggers(tabela):
+            op.execute(trigger)
+
+    # Pacientes já cadastrados não têm data de criação: entram nos totais, não no resumo mensal
+    op.execute("""
+        INSERT INTO estatistica_sala_dia (sala, dia, consultas, minutos)
+        SELECT coalesce(sala, ''), date(data_hora), count(*), sum(coalesce(duracao, 0))
+        FROM appointment GROUP BY 1, 2
+    """)
+    op.execute("""
+        INSERT INTO estatistica_medico_semana (medico_id, semana, consultas)
+        SELECT medico_id, date(data_hora, 'weekday 0', '-6 days'), count(*)
+        FROM appointment GROUP BY 1, 2
+    """)
+    op.execute("""
+        INSERT INTO estatistica_mes (mes, novos_pacientes, sessoes)
+        SELECT strftime('%Y-%m', data_sessao), 0, count(*)
+        FROM medical_record GROUP BY 1
+    """)
+    op.execute("""
+        INSERT INTO estatistica_total (chave, valor)
+        SELECT 'agendamentos', count(*) FROM appointment
+        UNION ALL SELECT 'pacientes', count(*) FROM patient
+        UNION ALL SELECT 'prontuarios', count(*) FROM medical_record
+    """)
+
+
+def downgrade():
+    for tabela in FONTES:
+        for sufixo in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {tabela}_estatisticas_{sufixo}')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    # DROP COLUMN direto (SQLite >= 3.35): recriar a tabela em batch apagaria os triggers de patient
+    op.execute('ALTER TABLE patient DROP COLUMN criado_em')
+    op.drop_table('estatistica_total')
+    op.drop_index('ix_estatistica_sala_dia_dia', table_name='estatistica_sala_dia')
+    op.drop_table('estatistica_sala_dia')
+    op.drop_table('estatistica_mes')
+    op.drop_index('ix_estatistica_medico_semana_semana', table_name='estatistica_medico_semana')
+    op.drop_table('estatistica_medico_semana')
+    # ### end Alembic commands ###
@@ -0,0 +1,27 @@
+"""Serie de agendamentos
+
+Revision ID: f3c8a1d5e6b7
+Revises: e7b2c5d83a19
+Create Date: 2025-09-24 09:31:05.418927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d5e6b7'
+down_revision = 'e7b2c5d83a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('appointment', sa.Column('serie_id', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_appointment_serie_id'), 'appointment', ['serie_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_appointment_serie_id'), table_name='appointment')
+    # DROP COLUMN direto (SQLite >= 3.35): recriar a tabela em batch apagaria os triggers de appointment
+    op.execute('ALTER TABLE appointment DROP COLUMN serie_id')
@@ -1,10 +1,10 @@
 from datetime import datetime
-from app import db
+from extensions import db
 from flask_login import UserMixin
 from enum import Enum
 from datetime import date
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from app import db
+from sqlalchemy.orm import query_expression
 
 
 class User(db.Model, UserMixin):
@@ -22,7 +22,7 @@ class UserRole(Enum):
 
 class Patient(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nome_completo = db.Column(db.String(150), nullable=False)
+    nome_completo = db.Column(db.String(150), nullable=False, index=True)
     nome_social = db.Column(db.String(150))
     idade = db.Column(db.Integer)
     data_nascimento = db.Column(db.Date, nullable=False)
@@ -43,6 +43,8 @@ class Patient(db.Model):
     servico_buscado = db.Column(db.String(50), nullable=False)
     servico_buscado_outro = db.Column(db.String(150))
 
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
     @property
     def nome(self):
         return self.nome_completo
@@ -58,14 +60,22 @@ class Appointment(db.Model):
     paciente_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
     medico_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     sala = db.Column(db.String(20))
-    data_hora = db.Column(db.DateTime, nullable=False)
+    data_hora = db.Column(db.DateTime, nullable=False, index=True)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
     duracao = db.Column(db.Integer, nullable=False)  # duração em minutos
     observacoes = db.Column(db.Text)
+    # Agendamentos criados juntos por uma regra de recorrência (agenda.criar_serie)
+    serie_id = db.Column(db.String(32), index=True)
 
     paciente = db.relationship('Patient', backref='appointments')
     doctor = db.relationship('User', backref=db.backref('appointments', lazy=True))
 
+    # Usados pela verificação de conflitos (agenda.py): intervalo em data_hora por sala e por médico
+    __table_args__ = (
+        db.Index('ix_appointment_sala_data_hora', 'sala', 'data_hora'),
+        db.Index('ix_appointment_medico_id_data_hora', 'medico_id', 'data_hora'),
+    )
+
 class MedicalRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     paciente_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -74,3 +84,93 @@ class MedicalRecord(db.Model):
     evolucao = db.Column(db.Text, nullable=False)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
     author = db.relationship('User', backref='medical_records')
+
+    # Preenchidos sob demanda com with_expression (ver medical_records.py)
+    previa = query_expression()
+    tamanho = query_expression()
+
+    __table_args__ = (
+        db.Index('ix_medical_record_paciente_id_data_sessao', 'paciente_id', 'data_sessao'),
+    )
+
+class ExportJob(db.Model):
+    """Exportação em lote de prontuários (ver jobs.py)."""
+    __tablename__ = 'export_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    formato = db.Column(db.String(10), nullable=False)  # 'docx' ou 'xlsx'
+    filtro = db.Column(db.Text)  # JSON com os filtros usados para escolher os pacientes
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, executando, concluido, erro
+    total = db.Column(db.Integer, nullable=False, default=0)
+    concluidos = db.Column(db.Integer, nullable=False, default=0)
+    arquivo = db.Column(db.String(255))
+    erro = db.Column(db.Text)
+    criado_por_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    concluido_em = db.Column(db.DateTime)
+
+    criado_por = db.relationship('User')
+
+
+class LembreteEnviado(db.Model):
+    """Lembrete gravado na caixa de saída para o agendamento, no horário `data_hora` (ver reminders.py)."""
+    __tablename__ = 'lembrete_enviado'
+
+    appointment_id = db.Column(db.Integer, primary_key=True)
+    data_hora = db.Column(db.DateTime, nullable=False, index=True)
+    enviado_em = db.Column(db.DateTime, nullable=False)
+
+
+# --- Estatísticas (mantidas por triggers, ver stats.py) ---
+
+class EstatisticaSalaDia(db.Model):
+    """Consultas e minutos reservados por sala em cada dia."""
+    __tablename__ = 'estatistica_sala_dia'
+
+    sala = db.Column(db.String(20), primary_key=True)
+    dia = db.Column(db.Date, primary_key=True)
+    consultas = db.Column(db.Integer, nullable=False, default=0)
+    minutos = db.Column(db.Integer, nullable=False, default=0)
+
+    # A leitura é sempre por período, para todas as salas
+    __table_args__ = (db.Index('ix_estatistica_sala_dia_dia', 'dia'),)
+
+
+class EstatisticaMedicoSemana(db.Model):
+    """Consultas por médico em cada semana (a semana é identificada pela segunda-feira)."""
+    __tablename__ = 'estatistica_medico_semana'
+
+    medico_id = db.Column(db.Integer, primary_key=True)
+    semana = db.Column(db.Date, primary_key=True)
+    consultas = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_estatistica_medico_semana_semana', 'semana'),)
+
+
+class EstatisticaMes(db.Model):
+    """Pacientes novos e sessões registradas em prontuário por mês ('AAAA-MM')."""
+    __tablename__ = 'estatistica_mes'
+
+    mes = db.Column(db.String(7), primary_key=True)
+    novos_pacientes = db.Column(db.Integer, nullable=False, default=0)
+    sessoes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class EstatisticaTotal(db.Model):
+    """Contadores gerais (pacientes, agendamentos, prontuarios)."""
+    __tablename__ = 'estatistica_total'
+
+    chave = db.Column(db.String(30), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+
+class VersaoRecurso(db.Model):
+    """Contador de alterações por recurso ('pacientes', 'agendamentos', 'prontuario:<id>').
+
+    Mantido por triggers (conditional.py) e usado para ETag/Last-Modified.
+    """
+    __tablename__ = 'versao_recurso'
+
+    chave = db.Column(db.String(40), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    alterado_em = db.Column(db.DateTime, nullable=False)
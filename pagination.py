@@ -0,0 +1,110 @@
+"""Paginação por cursor (keyset) para listagens ordenadas.
+
+Em vez de OFFSET, cada página continua a partir dos valores da chave de
+ordenação da última linha vista, ex. (nome_completo, id) ou (data_hora, id).
+Assim o custo de qualquer página é o de uma busca no índice, não importa o
+tamanho da tabela.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from flask import request
+from sqlalchemy import tuple_
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+Pagina = namedtuple('Pagina', 'itens anterior proxima limite')
+Pagina.__doc__ = """Uma página de resultados.
+
+`anterior` e `proxima` são cursores opacos (ou None quando não há página
+naquela direção) para os parâmetros `antes` e `depois` da URL.
+"""
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _desserializar(valor, coluna):
+    tipo = coluna.type.python_type
+    if valor is not None and tipo in (datetime, date):
+        return tipo.fromisoformat(valor)
+    return valor
+
+
+def codificar_cursor(valores):
+    dados = json.dumps([_serializar(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, colunas):
+    """Converte o cursor da URL de volta nos valores das colunas; None se inválido."""
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(dados)
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            return None
+        return [_desserializar(v, c) for v, c in zip(valores, colunas)]
+    except (ValueError, TypeError):
+        return None
+
+
+def _chave(item, colunas):
+    if hasattr(item, '_mapping'):
+        return [item._mapping[c.key] for c in colunas]
+    return [getattr(item, c.key) for c in colunas]
+
+
+def paginar(query, colunas, depois=None, antes=None, limite=LIMITE_PADRAO, decrescente=False):
+    """Pagina `query` em ordem crescente pelas `colunas` (a última deve ser única, ex. id).
+
+    `depois` continua após o cursor; `antes` volta para a página anterior a ele.
+    Com `decrescente=True` a ordem é invertida (ex. mais recentes primeiro).
+    """
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    chave = tuple_(*colunas)
+
+    def adiante(valores):
+        return chave < tuple_(*valores) if decrescente else chave > tuple_(*valores)
+
+    def atras(valores):
+        return chave > tuple_(*valores) if decrescente else chave < tuple_(*valores)
+
+    ordem = [c.desc() for c in colunas] if decrescente else list(colunas)
+    ordem_inversa = list(colunas) if decrescente else [c.desc() for c in colunas]
+
+    valores_antes = decodificar_cursor(antes, colunas) if antes else None
+    valores_depois = decodificar_cursor(depois, colunas) if depois else None
+
+    if valores_antes is not None:
+        query = query.filter(atras(valores_antes))
+        linhas = query.order_by(*ordem_inversa).limit(limite + 1).all()
+        tem_mais = len(linhas) > limite
+        itens = list(reversed(linhas[:limite]))
+        anterior = codificar_cursor(_chave(itens[0], colunas)) if tem_mais and itens else None
+        proxima = codificar_cursor(valores_antes)
+        return Pagina(itens, anterior, proxima, limite)
+
+    if valores_depois is not None:
+        query = query.filter(adiante(valores_depois))
+    linhas = query.order_by(*ordem).limit(limite + 1).all()
+    itens = linhas[:limite]
+    proxima = codificar_cursor(_chave(itens[-1], colunas)) if len(linhas) > limite else None
+    anterior = codificar_cursor(_chave(itens[0], colunas)) if valores_depois is not None and itens else None
+    return Pagina(itens, anterior, proxima, limite)
+
+
+def paginar_requisicao(query, colunas, limite_padrao=LIMITE_PADRAO, decrescente=False):
+    """Atalho para rotas: lê `depois`, `antes` e `por_pagina` de request.args."""
+    return paginar(
+        query, colunas,
+        depois=request.args.get('depois'),
+        antes=request.args.get('antes'),
+        limite=request.args.get('por_pagina', limite_padrao, type=int),
+        decrescente=decrescente,
+    )
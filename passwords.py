@@ -0,0 +1,112 @@
+"""Hash e verificação de senhas fora da thread da requisição.
+
+O pbkdf2/scrypt do hashlib libera o GIL, então um pool de threads limitado já
+roda os hashes em paralelo. O pool tem um número fixo de workers e uma fila
+curta: quando todos os lugares estão ocupados (ex. troca de turno), a
+requisição espera no máximo PASSWORD_HASH_TIMEOUT segundos e recebe
+`ServicoSobrecarregado`, em vez de empilhar trabalho até derrubar os workers
+do servidor.
+
+Hashes gravados com parâmetros diferentes de PASSWORD_HASH_METHOD são
+regravados no próximo login bem-sucedido.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METODO_PADRAO = 'pbkdf2:sha256:600000'
+
+
+class ServicoSobrecarregado(Exception):
+    """Não há lugar no pool de hash dentro do tempo de espera configurado."""
+
+
+class PoolHash:
+    """ThreadPoolExecutor com limite de trabalhos em andamento + fila."""
+
+    def __init__(self, workers, fila, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash-senha') if workers else None
+        self._vagas = threading.BoundedSemaphore(workers + fila) if workers else None
+
+    def executar(self, funcao, *args):
+        if self._executor is None:
+            return funcao(*args)
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise ServicoSobrecarregado()
+        try:
+            futuro = self._executor.submit(funcao, *args)
+        except BaseException:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return futuro.result()
+
+    def encerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+_pool = None
+_metodo_efetivo = None
+_lock = threading.Lock()
+
+
+def _obter_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            config = current_app.config
+            _pool = PoolHash(config.get('PASSWORD_HASH_WORKERS', 4),
+                             config.get('PASSWORD_HASH_FILA', 32),
+                             config.get('PASSWORD_HASH_TIMEOUT', 5))
+        return _pool
+
+
+def reconfigurar():
+    """Descarta o pool e o método em cache (após mudar a configuração)."""
+    global _pool, _metodo_efetivo
+    with _lock:
+        if _pool is not None:
+            _pool.encerrar()
+        _pool = None
+        _metodo_efetivo = None
+
+
+def metodo():
+    return current_app.config.get('PASSWORD_HASH_METHOD', METODO_PADRAO)
+
+
+def metodo_efetivo():
+    """Método com todos os parâmetros, como aparece no hash ('scrypt' -> 'scrypt:32768:8:1')."""
+    global _metodo_efetivo
+    if _metodo_efetivo is None:
+        _metodo_efetivo = generate_password_hash('', method=metodo()).split('$', 1)[0]
+    return _metodo_efetivo
+
+
+def gerar_hash(senha):
+    return _obter_pool().executar(generate_password_hash, senha, metodo())
+
+
+def verificar_senha(senha_hash, senha):
+    return _obter_pool().executar(check_password_hash, senha_hash, senha)
+
+
+def precisa_rehash(senha_hash):
+    return senha_hash.split('$', 1)[0] != metodo_efetivo()
+
+
+def autenticar(usuario, senha, sessao):
+    """Confere a senha e, se o hash estiver desatualizado, grava um novo.
+
+    Pode levantar ServicoSobrecarregado.
+    """
+    if usuario is None or not verificar_senha(usuario.senha, senha):
+        return False
+    if precisa_rehash(usuario.senha):
+        usuario.senha = gerar_hash(senha)
+        sessao.commit()
+    return True
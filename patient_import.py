@@ -0,0 +1,276 @@
+"""Importação em lote de pacientes a partir de CSV ou XLSX.
+
+As linhas são lidas uma a uma (csv.reader ou openpyxl em modo read-only),
+validadas com as mesmas regras do NovoPacienteForm e gravadas em lotes com um
+INSERT por lote. Pacientes já cadastrados, ou repetidos no próprio arquivo,
+são reconhecidos pelo e-mail (minúsculo, sem espaços nas pontas) ou pelo
+telefone (só dígitos), consultados por índices de expressão em `patient`.
+
+Linhas inválidas ou duplicadas vão para um relatório CSV com o número da
+linha, o motivo e os valores originais. Nem o arquivo nem os ids já vistos
+ficam na memória: o consumo não depende do número de linhas.
+"""
+import codecs
+import csv
+import os
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import chain, islice
+from operator import itemgetter
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, bindparam, event, text
+from werkzeug.datastructures import MultiDict
+from wtforms.validators import DataRequired
+
+from extensions import db
+from forms import NovoPacienteForm
+from models import Patient
+from patient_search import PONTUACAO_TELEFONE, expressao_digitos, normalizar
+
+FORMATOS = ('csv', 'xlsx')
+# Tentadas em ordem; cp1252 é o padrão do Excel no Windows em português
+CODIFICACOES_CSV = ('utf-8-sig', 'cp1252')
+
+EMAIL_NORMALIZADO = 'lower(trim(email))'
+TELEFONE_NORMALIZADO = expressao_digitos('telefone')
+
+CRIAR_INDICES = [
+    f'CREATE INDEX IF NOT EXISTS ix_patient_email_normalizado ON patient ({EMAIL_NORMALIZADO})',
+    f'CREATE INDEX IF NOT EXISTS ix_patient_telefone_normalizado ON patient ({TELEFONE_NORMALIZADO})',
+]
+
+# Com db.create_all() os índices nascem junto da tabela; em bancos existentes
+# eles são criados pela migração correspondente.
+for _indice in CRIAR_INDICES:
+    event.listen(Patient.__table__, 'after_create', DDL(_indice).execute_if(dialect='sqlite'))
+
+_EMAILS_CADASTRADOS = text(f'SELECT {EMAIL_NORMALIZADO} FROM patient WHERE {EMAIL_NORMALIZADO} IN :chaves')\
+    .bindparams(bindparam('chaves', expanding=True))
+_TELEFONES_CADASTRADOS = text(f'SELECT {TELEFONE_NORMALIZADO} FROM patient WHERE {TELEFONE_NORMALIZADO} IN :chaves')\
+    .bindparams(bindparam('chaves', expanding=True))
+
+Resultado = namedtuple('Resultado', 'lidas importadas invalidas duplicadas')
+
+
+class ArquivoInvalido(Exception):
+    """O arquivo não pode ser importado (formato, codificação ou colunas obrigatórias)."""
+
+
+def pasta_importacoes(app):
+    pasta = app.config.get('IMPORT_DIR') or os.path.join(app.instance_path, 'importacoes')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def normalizar_email(email):
+    return email.strip(' ').lower()
+
+
+def normalizar_telefone(telefone):
+    return ''.join(c for c in telefone if c not in PONTUACAO_TELEFONE)
+
+
+# --- Leitura ---
+
+def formato_do_arquivo(nome):
+    formato = os.path.splitext(nome)[1].lower().lstrip('.')
+    if formato not in FORMATOS:
+        raise ArquivoInvalido(f'Formato não suportado: use {", ".join(FORMATOS)}.')
+    return formato
+
+
+def _codificacao_csv(caminho):
+    """utf-8 (com ou sem BOM) ou, se o arquivo não for utf-8 válido, cp1252 (CSV salvo pelo Excel no Windows).
+
+    O arquivo é decodificado inteiro antes da importação, em blocos: um byte
+    inválido no fim não deixa metade dos pacientes gravada.
+    """
+    for codificacao in CODIFICACOES_CSV:
+        decodificador = codecs.getincrementaldecoder(codificacao)()
+        try:
+            with open(caminho, 'rb') as arquivo:
+                for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+                    decodificador.decode(bloco)
+            decodificador.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        return codificacao
+    raise ArquivoInvalido(f'Codificação não reconhecida: salve o CSV em {" ou ".join(CODIFICACOES_CSV)}.')
+
+
+def _linhas_csv(caminho):
+    with open(caminho, newline='', encoding=_codificacao_csv(caminho)) as arquivo:
+        amostra = arquivo.read(8192)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.reader(arquivo, dialeto)
+
+
+def _linhas_xlsx(caminho):
+    from openpyxl import load_workbook
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        yield from livro.active.iter_rows(values_only=True)
+    finally:
+        livro.close()
+
+
+def _texto(valor):
+    """Valor da célula como o navegador enviaria no formulário."""
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    valor = str(valor).strip()
+    # Datas no formato brasileiro (dd/mm/aaaa) viram o formato do DateField
+    if len(valor) == 10 and valor[2] == valor[5] == '/' and valor.replace('/', '').isdigit():
+        return f'{valor[6:]}-{valor[3:5]}-{valor[:2]}'
+    return valor
+
+
+def ler_planilha(caminho, formato, campos):
+    """Gera (número da linha, {campo: texto}) a partir da segunda linha do arquivo."""
+    linhas = _linhas_csv(caminho) if formato == 'csv' else _linhas_xlsx(caminho)
+    cabecalho = [normalizar(_texto(coluna)).replace(' ', '_') for coluna in next(linhas, ())]
+    posicoes = {campo: cabecalho.index(campo) for campo in campos if campo in cabecalho}
+    for numero, linha in enumerate(linhas, start=2):
+        if not any(valor not in (None, '') for valor in linha):
+            continue
+        yield numero, {campo: _texto(linha[pos]) if pos < len(linha) else ''
+                       for campo, pos in posicoes.items()}
+
+
+# --- Validação ---
+
+class _Validador:
+    """Aplica as regras do NovoPacienteForm a uma linha, reaproveitando a mesma instância."""
+
+    def __init__(self):
+        self.form = NovoPacienteForm(formdata=None, meta={'csrf': False})
+        campos = [campo for campo in self.form if campo.type not in ('SubmitField', 'CSRFTokenField')]
+        self.campos = [campo.name for campo in campos]
+        self.obrigatorios = [campo.name for campo in campos
+                             if any(isinstance(v, DataRequired) for v in campo.validators)]
+        # Campos de escolha aceitam o valor ou o rótulo, sem diferenciar acentos ("Médio", "Não")
+        self.escolhas = {
+            campo.name: {normalizar(str(chave)): valor
+                         for valor, rotulo in campo.choices for chave in (valor, rotulo)}
+            for campo in campos if getattr(campo, 'choices', None)
+        }
+
+    def validar(self, valores):
+        """Retorna (colunas do Patient, None) ou (None, mensagem de erro)."""
+        dados = MultiDict()
+        for campo, valor in valores.items():
+            if valor and campo in self.escolhas:
+                valor = self.escolhas[campo].get(normalizar(valor), valor)
+            if valor:
+                dados[campo] = valor
+        self.form.process(dados)
+        if not self.form.validate():
+            return None, '; '.join(f'{campo}: {" ".join(erros)}' for campo, erros in self.form.errors.items())
+        return {campo: self.form[campo].data for campo in self.campos}, None
+
+
+# --- Importação ---
+
+def _cadastrados(consulta, chaves):
+    if not chaves:
+        return set()
+    return {chave for (chave,) in db.session.execute(consulta, {'chaves': list(chaves)})}
+
+
+def _gravar_lote(candidatos):
+    """Insere os candidatos que não são duplicados (no banco ou no próprio lote).
+
+    Retorna o número de inseridos e as linhas recusadas como (número, motivo, valores).
+    """
+    emails = _cadastrados(_EMAILS_CADASTRADOS, {normalizar_email(c['email']) for _, c, _ in candidatos})
+    telefones = _cadastrados(_TELEFONES_CADASTRADOS,
+                             {normalizar_telefone(c['telefone']) for _, c, _ in candidatos})
+    novos, duplicadas = [], []
+    for numero, colunas, valores in candidatos:
+        email, telefone = normalizar_email(colunas['email']), normalizar_telefone(colunas['telefone'])
+        if email in emails or telefone in telefones:
+            motivo = 'e-mail já cadastrado' if email in emails else 'telefone já cadastrado'
+            duplicadas.append((numero, f'duplicado: {motivo}', valores))
+            continue
+        emails.add(email)
+        telefones.add(telefone)
+        novos.append(colunas)
+    if novos:
+        db.session.execute(Patient.__table__.insert(), novos)
+    db.session.commit()
+    return len(novos), duplicadas
+
+
+def importar_pacientes(caminho, relatorio, formato=None, lote=None):
+    """Importa o arquivo e grava em `relatorio` (CSV) as linhas recusadas."""
+    formato = formato or formato_do_arquivo(caminho)
+    lote = lote or current_app.config['IMPORTACAO_LOTE']
+    validador = _Validador()
+    linhas = ler_planilha(caminho, formato, validador.campos)
+    lidas = importadas = invalidas = duplicadas = 0
+
+    with open(relatorio, 'w', newline='', encoding='utf-8') as saida:
+        escritor = csv.writer(saida)
+        escritor.writerow(['linha', 'motivo', *validador.campos])
+
+        primeira = next(linhas, None)
+        if primeira is not None:
+            ausentes = [campo for campo in validador.obrigatorios if campo not in primeira[1]]
+            if ausentes:
+                raise ArquivoInvalido(f'Colunas obrigatórias ausentes: {", ".join(ausentes)}.')
+            linhas = chain([primeira], linhas)
+
+        while True:
+            bloco = list(islice(linhas, lote))
+            if not bloco:
+                break
+            lidas += len(bloco)
+            candidatos, recusadas = [], []
+            for numero, valores in bloco:
+                colunas, erro = validador.validar(valores)
+                if erro:
+                    recusadas.append((numero, erro, valores))
+                    invalidas += 1
+                else:
+                    candidatos.append((numero, colunas, valores))
+            novos, repetidas = _gravar_lote(candidatos)
+            importadas += novos
+            duplicadas += len(repetidas)
+            # Relatório na ordem do arquivo
+            for numero, motivo, valores in sorted(recusadas + repetidas, key=itemgetter(0)):
+                escritor.writerow([numero, motivo, *(valores.get(campo, '') for campo in validador.campos)])
+
+    return Resultado(lidas, importadas, invalidas, duplicadas)
+
+
+@click.command('importar-pacientes')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(FORMATOS), help='Padrão: pela extensão do arquivo.')
+@click.option('--lote', type=int, help='Linhas por INSERT (padrão: IMPORTACAO_LOTE).')
+@click.option('--relatorio', type=click.Path(dir_okay=False),
+              help='CSV com as linhas recusadas (padrão: <arquivo>.erros.csv).')
+@with_appcontext
+def importar_pacientes_comando(arquivo, formato, lote, relatorio):
+    """Importa pacientes de um arquivo CSV ou XLSX."""
+    relatorio = relatorio or os.path.splitext(arquivo)[0] + '.erros.csv'
+    try:
+        resultado = importar_pacientes(arquivo, relatorio, formato, lote)
+    except ArquivoInvalido as erro:
+        raise click.ClickException(str(erro))
+    print(f'{resultado.lidas} linhas lidas: {resultado.importadas} importadas, '
+          f'{resultado.invalidas} inválidas, {resultado.duplicadas} duplicadas.')
+    if resultado.invalidas or resultado.duplicadas:
+        print(f'Linhas recusadas em {relatorio}')
@@ -0,0 +1,117 @@
+"""Índice de busca de pacientes (SQLite FTS5).
+
+A tabela virtual `paciente_busca` tem o mesmo rowid do paciente e é mantida
+por triggers em `patient`, então inserções pelo ORM, em lote ou por SQL puro
+ficam sincronizadas. O tokenizador `unicode61 remove_diacritics 2` ignora
+acentos e cedilha ("Conceição" casa com "conceicao"); o telefone é indexado só
+com dígitos, inteiro e sem o DDD.
+"""
+import re
+import unicodedata
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, text
+
+from extensions import db
+from models import Patient
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+
+
+# Pontuação usual de telefones, ignorada no índice e na deduplicação (patient_import.py)
+PONTUACAO_TELEFONE = (' ', '(', ')', '-', '.', '+', '/')
+
+
+def expressao_digitos(coluna):
+    """Expressão SQL que remove a pontuação usual de um telefone."""
+    expr = coluna
+    for caractere in PONTUACAO_TELEFONE:
+        expr = f"replace({expr}, '{caractere}', '')"
+    return expr
+
+
+def _valores(prefixo):
+    digitos = expressao_digitos(f'{prefixo}.telefone')
+    return (f"{prefixo}.id, {prefixo}.nome_completo || ' ' || coalesce({prefixo}.nome_social, ''), "
+            f"{prefixo}.email, {digitos} || ' ' || substr({digitos}, -9) || ' ' || substr({digitos}, -8)")
+
+
+CRIAR_TABELA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS paciente_busca USING fts5(
+    nome, email, telefone,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+CRIAR_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS paciente_busca_ai AFTER INSERT ON patient BEGIN
+        INSERT INTO paciente_busca (rowid, nome, email, telefone) VALUES ({_valores('NEW')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS paciente_busca_au AFTER UPDATE ON patient BEGIN
+        DELETE FROM paciente_busca WHERE rowid = OLD.id;
+        INSERT INTO paciente_busca (rowid, nome, email, telefone) VALUES ({_valores('NEW')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS paciente_busca_ad AFTER DELETE ON patient BEGIN
+        DELETE FROM paciente_busca WHERE rowid = OLD.id;
+    END
+    """,
+]
+
+REINDEXAR = f"""
+INSERT INTO paciente_busca (rowid, nome, email, telefone)
+SELECT {_valores('patient')} FROM patient
+"""
+
+# Com db.create_all() (bancos novos, benchmarks) o índice nasce junto da tabela;
+# em bancos existentes ele é criado pela migração correspondente.
+event.listen(Patient.__table__, 'after_create', DDL(CRIAR_TABELA).execute_if(dialect='sqlite'))
+for _trigger in CRIAR_TRIGGERS:
+    event.listen(Patient.__table__, 'after_create', DDL(_trigger).execute_if(dialect='sqlite'))
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, como o tokenizador do índice."""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def montar_consulta(termo):
+    """Converte o texto digitado em uma consulta FTS5 por prefixo (todos os termos)."""
+    # "(11) 98765-4321" vira um único número, como o telefone está no índice
+    termo = re.sub(r'(?<=\d)[\s().+/-]+(?=\d)', '', termo)
+    tokens = re.findall(r'\w+', normalizar(termo))
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def buscar_pacientes(termo, limite=LIMITE_PADRAO):
+    """Pacientes mais relevantes para `termo`, como dicionários prontos para JSON."""
+    consulta = montar_consulta(termo)
+    if not consulta:
+        return []
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    linhas = db.session.execute(text("""
+        SELECT p.id, p.nome_completo, p.nome_social, p.data_nascimento, p.telefone, p.email
+        FROM paciente_busca
+        JOIN patient AS p ON p.id = paciente_busca.rowid
+        WHERE paciente_busca MATCH :consulta
+        ORDER BY bm25(paciente_busca, 10.0, 2.0, 1.0)
+        LIMIT :limite
+    """), {'consulta': consulta, 'limite': limite})
+    return [dict(linha._mapping) for linha in linhas]
+
+
+@click.command('reindexar-pacientes')
+@with_appcontext
+def reindexar_pacientes():
+    """Reconstrói o índice de busca de pacientes a partir da tabela patient."""
+    db.session.execute(text('DELETE FROM paciente_busca'))
+    db.session.execute(text(REINDEXAR))
+    db.session.commit()
+    print('Índice de busca de pacientes reconstruído.')
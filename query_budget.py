@@ -0,0 +1,77 @@
+"""Contagem de comandos SQL por requisição e orçamento por rota.
+
+Cada comando executado durante uma requisição é contado em `g`. Rotas podem
+declarar quantos comandos esperam com `@orcamento_consultas(n)`; ao final da
+requisição, se a contagem passar do orçamento, a aplicação registra um aviso
+ou, com SQL_ORCAMENTO_ESTRITO (ligado no perfil de testes), levanta
+`OrcamentoExcedido`. Em respostas em fluxo (stream_with_context) o corpo roda
+depois do after_request, então a conferência acontece quando a resposta é
+fechada. Assim um N+1 introduzido num template quebra os testes e
+o `flask verificar-planos` em vez de passar despercebido.
+"""
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+CABECALHO = 'X-Consultas-SQL'
+
+
+class OrcamentoExcedido(Exception):
+    """A rota executou mais comandos SQL do que o declarado."""
+
+
+def orcamento_consultas(maximo):
+    """Declara o número máximo de comandos SQL da rota (use logo abaixo de @bp.route)."""
+    def decorator(f):
+        f.orcamento_sql = maximo
+        return f
+    return decorator
+
+
+def consultas_da_requisicao():
+    return g.get('consultas_sql', 0)
+
+
+def orcamento_da_rota(app, endpoint):
+    view = app.view_functions.get(endpoint)
+    return getattr(view, 'orcamento_sql', None)
+
+
+def _zerar():
+    g.consultas_sql = 0
+
+
+def _contar(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.consultas_sql = g.get('consultas_sql', 0) + 1
+
+
+def _conferir(app, endpoint, total):
+    maximo = orcamento_da_rota(app, endpoint)
+    if maximo is not None and total > maximo:
+        mensagem = f'{endpoint}: {total} comandos SQL, orçamento {maximo}'
+        if app.config.get('SQL_ORCAMENTO_ESTRITO'):
+            raise OrcamentoExcedido(mensagem)
+        app.logger.warning('Orçamento de consultas excedido - %s', mensagem)
+
+
+def _verificar(resposta):
+    app = current_app._get_current_object()
+    total = consultas_da_requisicao()
+    if app.debug or app.testing:
+        # Numa resposta em fluxo, só as consultas feitas até aqui
+        resposta.headers[CABECALHO] = str(total)
+    if resposta.is_streamed:
+        # O gerador (stream_with_context) ainda roda consultas depois daqui:
+        # o orçamento é conferido quando o servidor fecha a resposta.
+        contagem, endpoint = g._get_current_object(), request.endpoint
+        resposta.call_on_close(lambda: _conferir(app, endpoint, contagem.get('consultas_sql', 0)))
+    else:
+        _conferir(app, request.endpoint, total)
+    return resposta
+
+
+def configurar_orcamento(app, db):
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _contar)
+    app.before_request(_zerar)
+    app.after_request(_verificar)
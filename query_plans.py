@@ -0,0 +1,214 @@
+"""Verificação dos planos de consulta das rotas (EXPLAIN QUERY PLAN).
+
+`flask verificar-planos` cria um banco SQLite temporário com db.create_all()
+(modelos, índices e os triggers e tabelas FTS registrados em after_create),
+grava nele um médico, pacientes e agendamentos de verificação, percorre as
+rotas principais com o cliente de teste do Flask, captura cada SELECT emitido
+e roda EXPLAIN QUERY PLAN com os mesmos parâmetros. Termina com código 1 se
+alguma consulta cair em varredura completa de tabela. Também falha se uma rota
+passar do orçamento declarado com `@orcamento_consultas` (ver
+query_budget.py), o que denuncia consultas N+1. O banco configurado não é
+lido nem alterado; tests/test_planos.py roda a mesma verificação.
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from config import TestingConfig
+from extensions import db
+from models import User, Patient, Appointment
+from agenda import verificar_conflito
+from calendar_feed import token_agenda
+from query_budget import orcamento_da_rota
+
+# "SCAN tabela" sem "USING ... INDEX" é leitura da tabela inteira.
+VARREDURA_COMPLETA = re.compile(r'^SCAN (\w+)$')
+# ...a não ser que o nome seja de uma subconsulta (ex. o UNION ALL com o arquivo, archive.py)
+SUBCONSULTA = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)$')
+
+USUARIO_VERIFICACAO = 'verificacao'
+AGENDAMENTOS_VERIFICACAO = 3
+SENHA_VERIFICACAO = 'verificar-planos'
+
+
+# Lidas sem sessão, como faz o aplicativo de calendário
+ROTAS_ANONIMAS = {'agenda_ics'}
+
+
+def _rotas(paciente_id, medico_id):
+    """Rotas GET verificadas, na forma (nome, url)."""
+    return [
+        ('dashboard', '/dashboard'),
+        ('lista_pacientes', '/lista_pacientes'),
+        ('lista_agendamentos', '/lista_agendamentos'),
+        ('agendamento', '/agendamento'),
+        ('api_agenda', f'/api/agenda?medico={medico_id}'),
+        ('agenda_ics', f'/agenda/{token_agenda(medico_id)}.ics'),
+        ('prontuario', f'/prontuario/{paciente_id}'),
+        ('exportar_docx', f'/exportar_docx/{paciente_id}'),
+        ('exportar_xlsx', f'/exportar_xlsx/{paciente_id}'),
+    ]
+
+
+@contextmanager
+def capturar_consultas(engine):
+    """Acumula (sql, parâmetros) de cada SELECT executado no engine."""
+    capturadas = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            capturadas.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', _antes)
+    try:
+        yield capturadas
+    finally:
+        event.remove(engine, 'before_cursor_execute', _antes)
+
+
+def explicar(engine, statement, parameters):
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN da consulta."""
+    with engine.connect() as conn:
+        linhas = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return [linha[-1] for linha in linhas]
+
+
+def varreduras_completas(plano):
+    subconsultas = {m.group(1) for m in map(SUBCONSULTA.match, plano) if m}
+    return [m.group(1) for m in map(VARREDURA_COMPLETA.match, plano) if m and m.group(1) not in subconsultas]
+
+
+# --- Banco de verificação ---
+
+@contextmanager
+def banco_de_verificacao(estrito=False):
+    """Aplicação do perfil de testes sobre um SQLite temporário com o esquema dos modelos, apagado na saída.
+
+    O banco de arquivo (archive.py) também é temporário e o cache de
+    fragmentos fica só em memória. Com `estrito`, uma rota que passa do
+    orçamento levanta OrcamentoExcedido, como no perfil de testes; sem ele o
+    orçamento é conferido por `falhas`, com a lista das consultas da rota.
+    """
+    from app import create_app
+
+    pasta = tempfile.mkdtemp(prefix='verificar_planos_')
+    config = type('ConfigVerificacao', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(pasta, 'verificacao.db'),
+        'ARQUIVO_DATABASE': os.path.join(pasta, 'verificacao_arquivo.db'),
+        'FRAGMENTOS_DIR': None,
+        'SQL_ORCAMENTO_ESTRITO': int(estrito),
+    })
+    app = create_app(config)
+    try:
+        with app.app_context():
+            db.create_all()
+        yield app
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def _criar_dados_de_verificacao():
+    """Um médico com senha conhecida e agendamentos futuros com pacientes distintos.
+
+    Pacientes distintos fazem um carregamento preguiçoso por linha aparecer na
+    contagem de consultas das listagens.
+    """
+    medico = User(username=USUARIO_VERIFICACAO, senha=generate_password_hash(SENHA_VERIFICACAO),
+                  nome_completo='Verificação de planos', funcao='médico')
+    db.session.add(medico)
+    pacientes = [Patient(nome_completo=f'Paciente de verificação {i}', data_nascimento=date(2000, 1, 1),
+                         endereco='-', email='verificacao@example.com', telefone='0',
+                         escolaridade='outro', estado_civil='solteiro', servico_buscado='outro')
+                 for i in range(AGENDAMENTOS_VERIFICACAO)]
+    db.session.add_all(pacientes)
+    db.session.flush()
+    amanha = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    db.session.add_all(Appointment(paciente_id=paciente.id, medico_id=medico.id, sala='Sala 1',
+                                   data_hora=amanha + timedelta(hours=i), duracao=30)
+                       for i, paciente in enumerate(pacientes))
+    db.session.commit()
+    return medico.id, pacientes[0].id
+
+
+def coletar_consultas(app, respostas=None):
+    """Grava os dados de verificação e executa as rotas e a verificação de conflitos.
+
+    Retorna {rota: [(sql, parâmetros)]} com os SELECTs de cada uma; `respostas`,
+    se dado, recebe {rota: status HTTP}.
+    """
+    with app.app_context():
+        engine = db.engine
+        medico_id, paciente_id = _criar_dados_de_verificacao()
+        rotas = _rotas(paciente_id, medico_id)
+    por_rota = {}
+    cliente, anonimo = app.test_client(), app.test_client()
+    with capturar_consultas(engine) as capturadas:
+        cliente.post('/login', data={'username': USUARIO_VERIFICACAO, 'password': SENHA_VERIFICACAO})
+    por_rota['login'] = capturadas
+
+    for nome, url in rotas:
+        with capturar_consultas(engine) as capturadas:
+            resposta = (anonimo if nome in ROTAS_ANONIMAS else cliente).get(url)
+            resposta.get_data()  # rotas em streaming consultam enquanto geram o corpo
+        if resposta.status_code >= 400:
+            print(f'Aviso: {url} respondeu {resposta.status_code}')
+        if respostas is not None:
+            respostas[nome] = resposta.status_code
+        por_rota[nome] = capturadas
+
+    with app.app_context(), capturar_consultas(engine) as capturadas:
+        verificar_conflito(datetime.now().replace(hour=10, minute=0), 60, sala='Sala 1', medico_id=medico_id)
+    por_rota['agendamento (conflitos)'] = capturadas
+    return por_rota
+
+
+def falhas(app, por_rota, verbose=False):
+    """Lista (tipo, rota, mensagem) das rotas acima do orçamento ('orcamento') e das varreduras ('plano')."""
+    with app.app_context():
+        engine = db.engine
+    encontradas = []
+    for rota, consultas in por_rota.items():
+        if verbose:
+            print(f'== {rota} ({len(consultas)} consultas)')
+        orcamento = orcamento_da_rota(app, f'main.{rota}')
+        if orcamento is not None and len(consultas) > orcamento:
+            encontradas.append(('orcamento', rota, f'{len(consultas)} consultas, orçamento {orcamento}'))
+        vistos = set()
+        for statement, parameters in consultas:
+            if statement in vistos:
+                continue
+            vistos.add(statement)
+            plano = explicar(engine, statement, parameters)
+            tabelas = varreduras_completas(plano)
+            if tabelas:
+                encontradas.append(('plano', rota, f'varredura completa em {", ".join(tabelas)}: '
+                                                   + ' '.join(statement.split())))
+            if verbose:
+                print('    ' + ' '.join(statement.split()))
+                for detalhe in plano:
+                    print(f'      {detalhe}')
+    return encontradas
+
+
+@click.command('verificar-planos')
+@click.option('--verbose', '-v', is_flag=True, help='Mostra o plano de todas as consultas.')
+def verificar_planos(verbose):
+    """Falha se alguma consulta das rotas fizer varredura completa de tabela (em um banco temporário)."""
+    with banco_de_verificacao() as app:
+        encontradas = falhas(app, coletar_consultas(app), verbose)
+    for _, rota, mensagem in encontradas:
+        print(f'[FALHA] {rota}: {mensagem}')
+    if encontradas:
+        print(f'{len(encontradas)} falha(s): consultas sem índice ou rotas acima do orçamento.')
+        sys.exit(1)
+    print('Todas as consultas das rotas usam índices e cabem no orçamento.')
@@ -0,0 +1,217 @@
+"""Busca textual nas evoluções do prontuário (SQLite FTS5).
+
+A tabela virtual `evolucao_busca` é de conteúdo externo: guarda só o índice
+invertido e lê o texto de `medical_record.evolucao` pelo rowid (= id do
+registro) quando precisa montar um trecho. Os triggers em `medical_record`
+mantêm o índice em dia; o tokenizador `unicode61 remove_diacritics 2` ignora
+acentos e cedilha ("ansiedade" casa com "Ansiedade", "insonia" com "insônia").
+
+paciente_id e medico_id também são colunas do índice: os filtros por paciente
+e por médico entram no próprio MATCH (`paciente_id : "12"`), como interseção
+de listas do índice, sem ler medical_record para cada resultado. A ordem é a
+relevância (bm25, com peso só para o texto) resolvida dentro do FTS5, e cada
+resultado traz apenas um trecho com os termos destacados (`snippet`), nunca o
+texto completo.
+
+A migração preenche o índice ('rebuild') antes de criar os triggers: o
+comando 'delete' que eles mandam em UPDATE/DELETE exige que a linha já esteja
+indexada. `flask reindexar-evolucoes` reconstrói o índice inteiro da mesma
+forma.
+
+As evoluções arquivadas (archive.py) têm um índice igual no banco de arquivo;
+a busca consulta os dois e junta os resultados pela relevância. O bm25 de cada
+índice usa as estatísticas do próprio banco, então a ordem entre uma evolução
+recente e uma arquivada é aproximada.
+"""
+import re
+
+import click
+from flask.cli import with_appcontext
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, DateTime, event, text
+
+from archive import ESQUEMA
+from extensions import db
+from models import MedicalRecord
+from patient_search import normalizar
+
+POR_PAGINA = 20
+PALAVRAS_TRECHO = 16
+
+# Marcadores do snippet(), trocados por <mark> depois de escapar o texto
+INICIO_DESTAQUE, FIM_DESTAQUE = '\x02', '\x03'
+
+# {esquema}: 'main' ou o banco de arquivo anexado (archive.py), que tem o próprio índice
+_CRIAR_TABELA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {esquema}.evolucao_busca USING fts5(
+    evolucao, paciente_id, medico_id,
+    content = 'medical_record', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+# `ORDER BY rank` passa a usar bm25 só da coluna evolucao
+_CONFIGURAR_RANK = "INSERT INTO {esquema}.evolucao_busca (evolucao_busca, rank) VALUES ('rank', 'bm25(1.0, 0.0, 0.0)')"
+# Reindexa tudo a partir de medical_record, numa só instrução
+_RECONSTRUIR = "INSERT INTO {esquema}.evolucao_busca (evolucao_busca) VALUES ('rebuild')"
+
+CRIAR_TABELA = _CRIAR_TABELA.format(esquema='main')
+CONFIGURAR_RANK = _CONFIGURAR_RANK.format(esquema='main')
+RECONSTRUIR = _RECONSTRUIR.format(esquema='main')
+
+_COLUNAS = 'rowid, evolucao, paciente_id, medico_id'
+
+CRIAR_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS evolucao_busca_ai AFTER INSERT ON medical_record BEGIN
+        INSERT INTO evolucao_busca ({_COLUNAS}) VALUES (NEW.id, NEW.evolucao, NEW.paciente_id, NEW.medico_id);
+    END
+    """,
+    # Tabelas de conteúdo externo removem pelo comando 'delete', com os valores antigos
+    f"""
+    CREATE TRIGGER IF NOT EXISTS evolucao_busca_au AFTER UPDATE OF evolucao, paciente_id, medico_id
+    ON medical_record BEGIN
+        INSERT INTO evolucao_busca (evolucao_busca, {_COLUNAS})
+        VALUES ('delete', OLD.id, OLD.evolucao, OLD.paciente_id, OLD.medico_id);
+        INSERT INTO evolucao_busca ({_COLUNAS}) VALUES (NEW.id, NEW.evolucao, NEW.paciente_id, NEW.medico_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS evolucao_busca_ad AFTER DELETE ON medical_record BEGIN
+        INSERT INTO evolucao_busca (evolucao_busca, {_COLUNAS})
+        VALUES ('delete', OLD.id, OLD.evolucao, OLD.paciente_id, OLD.medico_id);
+    END
+    """,
+]
+
+# Com db.create_all() (bancos novos, benchmarks) o índice nasce junto da tabela;
+# em bancos existentes ele é criado pela migração correspondente.
+event.listen(MedicalRecord.__table__, 'after_create', DDL(CRIAR_TABELA).execute_if(dialect='sqlite'))
+event.listen(MedicalRecord.__table__, 'after_create', DDL(CONFIGURAR_RANK).execute_if(dialect='sqlite'))
+for _trigger in CRIAR_TRIGGERS:
+    event.listen(MedicalRecord.__table__, 'after_create', DDL(_trigger).execute_if(dialect='sqlite'))
+
+
+# --- Evoluções arquivadas ---
+# O banco de arquivo (archive.py) tem o seu evolucao_busca sobre a cópia de
+# medical_record, mantido por `_mover_lote` com os comandos abaixo (as linhas
+# arquivadas não são editadas, então não há triggers lá).
+
+def criar_indice(esquema):
+    """Comandos que criam e preenchem o índice de `esquema` (rode só se a tabela ainda não existir)."""
+    return [_CRIAR_TABELA.format(esquema=esquema), _CONFIGURAR_RANK.format(esquema=esquema),
+            _RECONSTRUIR.format(esquema=esquema)]
+
+
+def indexar(esquema, onde):
+    """Indexa as linhas de `esquema`.medical_record que atendem a `onde` (SQL)."""
+    return (f'INSERT INTO {esquema}.evolucao_busca ({_COLUNAS}) '
+            f'SELECT id, evolucao, paciente_id, medico_id FROM {esquema}.medical_record WHERE {onde}')
+
+
+def desindexar(esquema, onde):
+    """Tira do índice as linhas de `esquema`.medical_record que atendem a `onde`, com os valores indexados."""
+    return (f"INSERT INTO {esquema}.evolucao_busca (evolucao_busca, {_COLUNAS}) "
+            f"SELECT 'delete', id, evolucao, paciente_id, medico_id FROM {esquema}.medical_record WHERE {onde}")
+
+
+# --- Busca ---
+
+def montar_consulta(termo):
+    """Converte o texto digitado em uma consulta FTS5: todos os termos, por prefixo.
+
+    Trechos entre aspas viram frases exatas ("dor de cabeça").
+    """
+    partes = []
+    for frase, palavra in re.findall(r'"([^"]*)"|(\S+)', normalizar(termo)):
+        tokens = re.findall(r'\w+', frase or palavra)
+        if not tokens:
+            continue
+        if frase:
+            partes.append('"' + ' '.join(tokens) + '"')
+        else:
+            partes.extend(f'"{token}"*' for token in tokens)
+    return ' '.join(partes)
+
+
+def consulta_filtrada(consulta, paciente_id=None, medico_id=None):
+    """Restringe a consulta à coluna do texto e acrescenta os filtros como termos das colunas de id."""
+    partes = [f'evolucao : ({consulta})']
+    if paciente_id is not None:
+        partes.append(f'paciente_id : "{int(paciente_id)}"')
+    if medico_id is not None:
+        partes.append(f'medico_id : "{int(medico_id)}"')
+    return ' AND '.join(partes)
+
+
+# A página é escolhida e recortada só nos índices (principal e arquivo, um UNION ALL ordenado
+# por rank); os JOINs trazem nomes e data das linhas da página, cada uma pela chave primária
+_TRECHO = f"char(2), char(3), '…', {PALAVRAS_TRECHO}"
+_BUSCA = text(f"""
+    SELECT b.id, coalesce(m.paciente_id, a.paciente_id) AS paciente_id,
+           coalesce(m.data_sessao, a.data_sessao) AS data_sessao,
+           p.nome_completo AS paciente, u.nome_completo AS medico, b.trecho, m.id IS NULL AS arquivada
+    FROM (
+        SELECT rowid AS id, rank, snippet(evolucao_busca, 0, {_TRECHO}) AS trecho
+        FROM main.evolucao_busca
+        WHERE evolucao_busca MATCH :consulta
+        UNION ALL
+        SELECT i.rowid, i.rank, snippet(i.evolucao_busca, 0, {_TRECHO})
+        FROM {ESQUEMA}.evolucao_busca AS i
+        -- Uma linha no meio do arquivamento está nos dois bancos: vale a do principal
+        WHERE i.evolucao_busca MATCH :consulta AND NOT EXISTS (SELECT 1 FROM main.medical_record WHERE id = i.rowid)
+        ORDER BY rank
+        LIMIT :limite OFFSET :deslocamento
+    ) AS b
+    LEFT JOIN main.medical_record AS m ON m.id = b.id
+    LEFT JOIN {ESQUEMA}.medical_record AS a ON a.id = b.id AND m.id IS NULL
+    JOIN patient AS p ON p.id = coalesce(m.paciente_id, a.paciente_id)
+    JOIN "user" AS u ON u.id = coalesce(m.medico_id, a.medico_id)
+    ORDER BY b.rank
+""").columns(data_sessao=DateTime)
+
+
+def destacar(trecho):
+    """Escapa o trecho e marca os termos encontrados com <mark>."""
+    return Markup(str(escape(trecho)).replace(INICIO_DESTAQUE, '<mark>').replace(FIM_DESTAQUE, '</mark>'))
+
+
+def buscar_evolucoes(termo, paciente_id=None, medico_id=None, pagina=1, por_pagina=POR_PAGINA):
+    """Uma página de evoluções que casam com `termo`, da mais relevante para a menos.
+
+    Retorna (resultados, há próxima página); cada resultado é um dicionário
+    com id, paciente_id, data_sessao, paciente, medico e o trecho destacado.
+    """
+    consulta = montar_consulta(termo)
+    if not consulta:
+        return [], False
+    linhas = db.session.execute(_BUSCA, {
+        'consulta': consulta_filtrada(consulta, paciente_id, medico_id),
+        'limite': por_pagina + 1,
+        'deslocamento': (pagina - 1) * por_pagina,
+    }).all()
+    resultados = [dict(linha._mapping, trecho=destacar(linha.trecho)) for linha in linhas[:por_pagina]]
+    return resultados, len(linhas) > por_pagina
+
+
+def reindexar():
+    """Reconstrói os índices (principal e arquivo) a partir de medical_record; retorna o número de evoluções.
+
+    O 'rebuild' do FTS5 roda em uma só transação: o índice nunca fica sem
+    uma linha que os triggers de UPDATE/DELETE esperam encontrar. Enquanto ele
+    roda, as escritas em medical_record esperam (busy_timeout).
+    """
+    indexados = 0
+    for esquema in ('main', ESQUEMA):
+        db.session.execute(text(_RECONSTRUIR.format(esquema=esquema)))
+        db.session.execute(text(f"INSERT INTO {esquema}.evolucao_busca (evolucao_busca) VALUES ('optimize')"))
+        indexados += db.session.scalar(text(f'SELECT count(*) FROM {esquema}.medical_record'))
+    db.session.commit()
+    return indexados
+
+
+@click.command('reindexar-evolucoes')
+@with_appcontext
+def reindexar_evolucoes():
+    """Reconstrói o índice de busca das evoluções a partir de medical_record."""
+    indexados = reindexar()
+    print(f'Índice de busca de evoluções reconstruído: {indexados} evoluções.')
@@ -0,0 +1,72 @@
+"""Mensagens dos lembretes de consulta (ver reminders.py): renderização e gravação no Maildir.
+
+Roda nos processos do pool de reminders.py. Fica em um módulo à parte, sem
+Flask nem SQLAlchemy, para que cada processo novo ('spawn') importe só o
+Jinja e a biblioteca padrão.
+"""
+import binascii
+import mailbox
+from email.header import Header
+from email.utils import formataddr, formatdate, parseaddr
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+TEMPLATE = 'lembrete_consulta.txt'
+
+_ambiente = None
+
+
+def _template(pasta_templates):
+    global _ambiente
+    if _ambiente is None:
+        _ambiente = Environment(loader=FileSystemLoader(pasta_templates), undefined=StrictUndefined,
+                                keep_trailing_newline=True)
+    return _ambiente.get_template(TEMPLATE)
+
+
+def _cabecalho(valor):
+    """Valor de cabeçalho em uma linha (quebras viram espaço) e em ASCII, como encoded-word se preciso."""
+    valor = ' '.join(valor.split())
+    return valor if valor.isascii() else Header(valor, 'utf-8').encode()
+
+
+def montar_mensagem(template, lembrete, fixos, dominio):
+    """Bytes da mensagem do lembrete (text/plain em UTF-8, quoted-printable).
+
+    Os cabeçalhos são montados direto, sem email.message: o pacote `email`
+    analisa e redobra cada cabeçalho, e isso custava mais que renderizar e
+    gravar a mensagem.
+    """
+    data_hora = lembrete['data_hora']
+    cabecalhos = [fixos]
+    if lembrete['email'].strip():
+        cabecalhos.append(f'To: {_cabecalho(lembrete["email"])}')
+    cabecalhos.append(f'Subject: {_cabecalho(f"Lembrete: consulta em {data_hora:%d/%m/%Y} às {data_hora:%H:%M}")}')
+    # Fixo por agendamento e horário: uma mensagem repetida tem o mesmo Message-ID
+    cabecalhos.append(f'Message-ID: <lembrete-{lembrete["id"]}-{data_hora:%Y%m%d%H%M}@{dominio}>')
+    if lembrete['telefone'].strip():
+        cabecalhos.append(f'X-Telefone: {_cabecalho(lembrete["telefone"])}')
+    corpo = template.render(nome=lembrete['nome_social'] or lembrete['nome_completo'], data_hora=data_hora,
+                            duracao=lembrete['duracao'], sala=lembrete['sala'], medico=lembrete['medico'])
+    return '\n'.join(cabecalhos).encode('ascii') + b'\n\n' + binascii.b2a_qp(corpo.encode('utf-8'))
+
+
+def gravar_lote(pasta_templates, pasta, remetente, lembretes):
+    """Renderiza e grava no Maildir; devolve [(appointment_id, data_hora)] dos gravados."""
+    template = _template(pasta_templates)
+    caixa = mailbox.Maildir(pasta, create=False)
+    nome, endereco = parseaddr(remetente)
+    dominio = endereco.rpartition('@')[2] or 'localhost'
+    # Iguais em todas as mensagens do lote
+    fixos = '\n'.join([
+        f'From: {formataddr((nome, endereco), "utf-8")}',
+        f'Date: {formatdate(localtime=True)}',
+        'MIME-Version: 1.0',
+        'Content-Type: text/plain; charset="utf-8"',
+        'Content-Transfer-Encoding: quoted-printable',
+    ])
+    gravados = []
+    for lembrete in lembretes:
+        caixa.add(montar_mensagem(template, lembrete, fixos, dominio))
+        gravados.append((lembrete['id'], lembrete['data_hora']))
+    return gravados
@@ -0,0 +1,123 @@
+"""Lembretes de consulta gravados em uma caixa de saída Maildir.
+
+`flask enviar-lembretes` (agendado para o fim da tarde, ver README) lê em uma
+só consulta os agendamentos do dia seguinte com nome, e-mail e telefone do
+paciente e o nome do médico, renderiza o template lembrete_consulta.txt e
+grava cada mensagem em LEMBRETES_DIR (Maildir, padrão instance/lembretes), de
+onde o relay de e-mail as retira. O telefone vai no cabeçalho X-Telefone, para
+o relay mandar SMS a quem não tem e-mail.
+
+A renderização e a gravação (reminder_messages.py) são divididas em lotes entre
+processos (LEMBRETES_WORKERS); poucas mensagens são geradas no próprio processo,
+sem o custo de iniciar o pool.
+
+A tabela `lembrete_enviado` marca o agendamento e o horário avisado: rodar de
+novo não repete lembretes, e um agendamento remarcado para o mesmo dia recebe
+um novo. A marca é gravada depois de o lote estar na caixa de saída; se o
+comando for interrompido entre as duas coisas, o lote sai de novo na execução
+seguinte, com o mesmo Message-ID, que o relay pode usar para descartar a
+duplicata.
+"""
+import mailbox
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, exists, select, text
+
+from extensions import db
+from models import Appointment, LembreteEnviado, Patient, User
+from reminder_messages import gravar_lote
+
+LOTE_PADRAO = 500
+# Abaixo disso (em lotes) não compensa iniciar processos
+LOTES_MINIMOS_POOL = 2
+
+
+def pasta_lembretes(app):
+    return app.config.get('LEMBRETES_DIR') or os.path.join(app.instance_path, 'lembretes')
+
+
+def consulta_lembretes(dia):
+    """Agendamentos de `dia` ainda sem lembrete para o horário atual, com os contatos do paciente."""
+    inicio = datetime.combine(dia, datetime.min.time())
+    avisado = exists().where(LembreteEnviado.appointment_id == Appointment.id,
+                             LembreteEnviado.data_hora == Appointment.data_hora)
+    return (
+        select(Appointment.id, Appointment.data_hora, Appointment.duracao, Appointment.sala,
+               Patient.nome_completo, Patient.nome_social, Patient.email, Patient.telefone,
+               User.nome_completo.label('medico'))
+        .join(Patient, Patient.id == Appointment.paciente_id)
+        .join(User, User.id == Appointment.medico_id)
+        .where(Appointment.data_hora >= inicio, Appointment.data_hora < inicio + timedelta(days=1), ~avisado)
+        .order_by(Appointment.data_hora)
+    )
+
+
+_MARCAR = text("""
+    INSERT INTO lembrete_enviado (appointment_id, data_hora, enviado_em)
+    VALUES (:appointment_id, :data_hora, :enviado_em)
+    ON CONFLICT (appointment_id) DO UPDATE SET data_hora = excluded.data_hora, enviado_em = excluded.enviado_em
+""").bindparams(bindparam('data_hora', type_=db.DateTime), bindparam('enviado_em', type_=db.DateTime))
+
+
+def _marcar(gravados):
+    agora = datetime.now()
+    db.session.execute(_MARCAR, [{'appointment_id': appointment_id, 'data_hora': data_hora, 'enviado_em': agora}
+                                 for appointment_id, data_hora in gravados])
+    db.session.commit()
+
+
+def enviar_lembretes(app, dia, lote=LOTE_PADRAO, workers=None, eco=None):
+    """Grava os lembretes de `dia` que faltam; retorna {'gravados', 'sem_contato'}."""
+    eco = eco or (lambda mensagem: None)
+    pendentes = [dict(linha._mapping) for linha in db.session.execute(consulta_lembretes(dia))]
+    lembretes = [lembrete for lembrete in pendentes if lembrete['email'].strip() or lembrete['telefone'].strip()]
+    lotes = [lembretes[i:i + lote] for i in range(0, len(lembretes), lote)]
+    argumentos = (os.path.join(app.root_path, app.template_folder), pasta_lembretes(app),
+                  app.config['LEMBRETES_REMETENTE'])
+    workers = min(workers or os.cpu_count(), len(lotes))
+    # Criada aqui, antes de os processos a abrirem ao mesmo tempo
+    os.makedirs(os.path.dirname(argumentos[1]), exist_ok=True)
+    mailbox.Maildir(argumentos[1], create=True)
+
+    gravados = 0
+    if len(lotes) < LOTES_MINIMOS_POOL or workers < 2:
+        for parte in lotes:
+            _marcar(gravar_lote(*argumentos, parte))
+            gravados += len(parte)
+            eco(f'{gravados} de {len(lembretes)} lembretes gravados.')
+    else:
+        # 'spawn', como em jobs.py: os processos não herdam conexões do banco
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futuros = [pool.submit(gravar_lote, *argumentos, parte) for parte in lotes]
+            for futuro in as_completed(futuros):
+                feitos = futuro.result()
+                _marcar(feitos)
+                gravados += len(feitos)
+                eco(f'{gravados} de {len(lembretes)} lembretes gravados.')
+
+    # Marcas de consultas que já passaram não evitam mais nada
+    db.session.execute(delete(LembreteEnviado).where(LembreteEnviado.data_hora < datetime.combine(
+        date.today(), datetime.min.time())))
+    db.session.commit()
+    return {'gravados': gravados, 'sem_contato': len(pendentes) - len(lembretes)}
+
+
+@click.command('enviar-lembretes')
+@click.option('--dia', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='Dia das consultas (AAAA-MM-DD; padrão: amanhã).')
+@click.option('--lote', type=int, default=None, help='Lembretes por tarefa do pool (padrão: LEMBRETES_LOTE).')
+@with_appcontext
+def enviar_lembretes_comando(dia, lote):
+    """Grava na caixa de saída os lembretes das consultas do dia seguinte."""
+    dia = dia.date() if dia else date.today() + timedelta(days=1)
+    app = current_app._get_current_object()
+    resultado = enviar_lembretes(app, dia, lote or app.config['LEMBRETES_LOTE'], app.config['LEMBRETES_WORKERS'],
+                                 eco=print)
+    print(f'Lembretes de {dia:%d/%m/%Y}: {resultado["gravados"]} gravados em {pasta_lembretes(app)}, '
+          f'{resultado["sem_contato"]} pacientes sem e-mail nem telefone.')
@@ -1,51 +1,85 @@
-from flask import render_template, redirect, url_for, flash, send_file, request
+import os
+
+from flask import Blueprint, Response, current_app, render_template, redirect, url_for, flash, request, jsonify, send_from_directory, abort, stream_with_context
 from flask_login import login_user, login_required, logout_user, current_user
 from datetime import datetime, date, timedelta
-from werkzeug.security import check_password_hash, generate_password_hash
-from io import BytesIO
-from docx import Document
-from openpyxl import Workbook
-
-from app import app, db
-from models import User, Patient, Appointment, MedicalRecord
-from forms import LoginForm, NovoPacienteForm, MedicalRecordForm, AppointmentForm, UserForm
+from sqlalchemy.orm import joinedload, selectinload
+
+from extensions import db
+from models import User, Patient, Appointment, MedicalRecord, ExportJob
+from forms import (
+    LoginForm, NovoPacienteForm, MedicalRecordForm, AppointmentForm, UserForm, ExportacaoLoteForm,
+    ImportacaoPacientesForm, NovoLinkAgendaForm,
+)
 from decorators import role_required, roles_required
-
+from query_budget import orcamento_consultas
+from conditional import get_condicional, chave_prontuario
+from agenda import (
+    verificar_conflito, horarios_livres, gerar_ocorrencias, verificar_serie, criar_serie,
+    HORA_ABERTURA, HORA_FECHAMENTO, SALAS,
+)
+from calendar_feed import (
+    agenda_colunar, gerar_ics, token_agenda, medico_do_token, chave_agenda_do_token, chave_link_do_token,
+    chave_agenda_do_usuario, chave_agenda_da_consulta, chave_link_do_usuario, trocar_link_agenda,
+    DIAS_MAXIMOS_AGENDA,
+)
+from pagination import paginar_requisicao
+from medical_records import serie_evolucao, pagina_evolucoes, resumo_evolucao, evolucao_completa
+from patient_search import buscar_pacientes
+from record_search import buscar_evolucoes
+from patient_import import importar_pacientes, pasta_importacoes, formato_do_arquivo, ArquivoInvalido
+from exporters import (
+    registros_do_paciente, gerar_arquivo, enviar_arquivo, escrever_docx, escrever_xlsx,
+    nome_arquivo, MIMETYPE_DOCX, MIMETYPE_XLSX
+)
+import jobs
+from fragment_cache import cache_fragmentos
+from identity_cache import cache_usuarios
+from metrics import texto_prometheus
+import stats
+from assets import enviar_compilado
+from passwords import autenticar, gerar_hash, ServicoSobrecarregado
+
+bp = Blueprint('main', __name__)
 
 # --- Rotas de Autenticação e Páginas Principais ---
 
-@app.route('/')
+@bp.route('/')
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        # Corrigido nome do campo senha do form (ex: form.password ou form.senha)
-        if user and check_password_hash(user.senha, form.password.data):  
+        try:
+            autenticado = autenticar(user, form.password.data, db.session)
+        except ServicoSobrecarregado:
+            flash('Muitos acessos simultâneos. Aguarde alguns segundos e tente novamente.', 'warning')
+            return render_template('login.html', form=form), 503
+        if autenticado:
             login_user(user)
             flash(f'Bem-vindo(a) de volta, {user.nome_completo}!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash('Usuário ou senha incorretos. Tente novamente.', 'danger')
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Você saiu do sistema.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # --- Usuários ---
 
-@app.route('/novo_usuario', methods=['GET', 'POST'])
+@bp.route('/novo_usuario', methods=['GET', 'POST'])
 @login_required
 @roles_required('administrador', 'gerencia')
 def novo_usuario():
@@ -54,40 +88,66 @@ def novo_usuario():
         if User.query.filter_by(username=form.username.data).first():
             flash('Usuário já existe com esse nome de usuário.', 'warning')
             return render_template('novo_usuario.html', form=form)
+        try:
+            senha_hash = gerar_hash(form.senha.data)
+        except ServicoSobrecarregado:
+            flash('Sistema ocupado. Tente novamente em alguns segundos.', 'warning')
+            return render_template('novo_usuario.html', form=form), 503
         novo_user = User(
             username=form.username.data,
-            senha=generate_password_hash(form.senha.data),
+            senha=senha_hash,
             nome_completo=form.nome_completo.data,
             funcao=form.funcao.data
         )
         db.session.add(novo_user)
         db.session.commit()
         flash('Usuário criado com sucesso!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('novo_usuario.html', form=form)
 
 
 # --- Dashboard ---
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
+@orcamento_consultas(3)
 @login_required
 def dashboard():
-    proximos_agendamentos = Appointment.query.filter(Appointment.data_hora >= datetime.utcnow())\
+    proximos_agendamentos = Appointment.query.options(joinedload(Appointment.paciente))\
+                                             .filter(Appointment.data_hora >= datetime.utcnow())\
                                              .order_by(Appointment.data_hora.asc())\
                                              .limit(5).all()
-    total_pacientes = Patient.query.count()
-    pacientes = Patient.query.order_by(Patient.nome_completo).all()
+    total_pacientes = stats.total('pacientes')
     return render_template('dashboard.html', appointments=proximos_agendamentos,
-                           total_pacientes=total_pacientes, pacientes=pacientes, show_flash=True)
+                           total_pacientes=total_pacientes, show_flash=True)
 
-@app.route('/dashboard_detalhado')
+@bp.route('/dashboard_detalhado')
+@orcamento_consultas(5)
 @login_required
+@roles_required('administrador', 'gerencia')
 def dashboard_detalhado():
-    return render_template('dashboard_detalhado.html')
+    desde, ate = periodo_estatisticas()
+    return render_template('dashboard_detalhado.html', estatisticas=stats.estatisticas(desde, ate))
+
+def periodo_estatisticas():
+    """Período pedido em ?desde=&ate= (AAAA-MM-DD), limitado a stats.PERIODO_MAXIMO dias."""
+    padrao_desde, padrao_ate = stats.periodo_padrao()
+    desde = request.args.get('desde', padrao_desde, type=date.fromisoformat)
+    ate = request.args.get('ate', padrao_ate, type=date.fromisoformat)
+    if ate < desde:
+        desde, ate = ate, desde
+    return desde, min(ate, desde + timedelta(days=stats.PERIODO_MAXIMO))
+
+@bp.route('/api/estatisticas')
+@orcamento_consultas(5)
+@login_required
+@roles_required('administrador', 'gerencia')
+def api_estatisticas():
+    desde, ate = periodo_estatisticas()
+    return jsonify(stats.estatisticas(desde, ate))
 
 # --- Pacientes ---
 
-@app.route('/novo_paciente', methods=['GET', 'POST'])
+@bp.route('/novo_paciente', methods=['GET', 'POST'])
 @login_required
 def novo_paciente():
     form = NovoPacienteForm()
@@ -115,7 +175,7 @@ def novo_paciente():
         db.session.commit()
 
         flash(f"Paciente {paciente.nome_completo} cadastrado com sucesso!", "success")
-        return redirect(url_for('lista_pacientes'))
+        return redirect(url_for('main.lista_pacientes'))
 
     # Calcula idade no GET se data de nascimento já preenchida
     if request.method == "GET" and form.data_nascimento.data:
@@ -127,18 +187,70 @@ def novo_paciente():
     return render_template('novo_paciente.html', form=form)
 
 
-@app.route('/lista_pacientes')
+@bp.route('/lista_pacientes')
+@orcamento_consultas(3)
 @login_required
+@get_condicional('pacientes')
 def lista_pacientes():
-    pacientes = Patient.query.order_by(Patient.nome_completo).all()
-    return render_template('lista_pacientes.html', pacientes=pacientes)
+    # A página só é consultada se a tabela não estiver no cache de fragmentos
+    return render_template('lista_pacientes.html', carregar_pagina=lambda: paginar_requisicao(
+        Patient.query, [Patient.nome_completo, Patient.id]))
+
+
+@bp.route('/api/pacientes/busca')
+@orcamento_consultas(2)
+@login_required
+def api_busca_pacientes():
+    termo = request.args.get('q', '').strip()
+    limite = request.args.get('limite', 10, type=int)
+    return jsonify(buscar_pacientes(termo, limite))
+
+
+@bp.route('/importar_pacientes', methods=['GET', 'POST'])
+@login_required
+@roles_required('administrador', 'gerencia')
+def importacao_pacientes():
+    form = ImportacaoPacientesForm()
+    resultado = relatorio = None
+    if form.validate_on_submit():
+        pasta = pasta_importacoes(current_app)
+        carimbo = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        formato = formato_do_arquivo(form.arquivo.data.filename)
+        # O upload vai para o disco e é lido em streaming; só o relatório de recusas fica
+        caminho = os.path.join(pasta, f'importacao_{carimbo}.{formato}')
+        form.arquivo.data.save(caminho)
+        relatorio = f'erros_{carimbo}.csv'
+        try:
+            resultado = importar_pacientes(caminho, os.path.join(pasta, relatorio), formato)
+        except ArquivoInvalido as erro:
+            flash(str(erro), 'danger')
+        finally:
+            os.remove(caminho)
+            # Sem recusas, ou a importação parou no meio (por qualquer exceção): o relatório não serve
+            if resultado is None or not (resultado.invalidas or resultado.duplicadas):
+                if os.path.exists(os.path.join(pasta, relatorio)):
+                    os.remove(os.path.join(pasta, relatorio))
+                relatorio = None
+        if resultado is not None:
+            flash(f'{resultado.importadas} de {resultado.lidas} pacientes importados.', 'success')
+    return render_template('importar_pacientes.html', form=form, resultado=resultado, relatorio=relatorio,
+                           show_flash=True)
+
+
+@bp.route('/importar_pacientes/relatorios/<nome>')
+@login_required
+@roles_required('administrador', 'gerencia')
+def relatorio_importacao(nome):
+    return send_from_directory(pasta_importacoes(current_app), nome, as_attachment=True)
 
 
 # --- Prontuário ---
 
-@app.route('/prontuario/<int:paciente_id>', methods=['GET', 'POST'])
+@bp.route('/prontuario/<int:paciente_id>', methods=['GET', 'POST'])
+@orcamento_consultas(6)
 @login_required
 @roles_required('médico')
+@get_condicional(chave_prontuario)
 def prontuario(paciente_id):
     paciente = Patient.query.get_or_404(paciente_id)
     form = MedicalRecordForm()
@@ -152,62 +264,104 @@ def prontuario(paciente_id):
         db.session.add(registro)
         db.session.commit()
         flash('Evolução adicionada com sucesso!', 'success')
-        return redirect(url_for('prontuario', paciente_id=paciente_id))
+        return redirect(url_for('main.prontuario', paciente_id=paciente_id))
 
-    evolucoes = MedicalRecord.query.filter_by(paciente_id=paciente_id).order_by(MedicalRecord.data_sessao.asc()).all()
-    labels = [e.data_sessao.strftime('%d/%m/%Y') for e in evolucoes]
-    valores = [len(e.evolucao) for e in evolucoes]
+    labels, valores = serie_evolucao(paciente_id)
+    pagina = pagina_evolucoes(paciente_id)
 
-    return render_template('prontuario.html', paciente=paciente, evolucoes=evolucoes, form=form,
-                           labels=labels, valores=valores)
+    return render_template('prontuario.html', paciente=paciente, evolucoes=pagina.itens, pagina=pagina,
+                           form=form, labels=labels, valores=valores)
 
-# --- Agendamento ---
+@bp.route('/prontuario/<int:paciente_id>/evolucoes')
+@orcamento_consultas(2)
+@login_required
+@roles_required('médico')
+def prontuario_evolucoes(paciente_id):
+    """Próximas evoluções (prévias) para o botão "Carregar mais"."""
+    pagina = pagina_evolucoes(paciente_id)
+    return jsonify({'itens': [resumo_evolucao(registro) for registro in pagina.itens],
+                    'proxima': pagina.proxima})
+
+@bp.route('/prontuario/<int:paciente_id>/evolucoes/<int:registro_id>')
+@orcamento_consultas(2)
+@login_required
+@roles_required('médico')
+def prontuario_evolucao(paciente_id, registro_id):
+    registro = evolucao_completa(paciente_id, registro_id)
+    if registro is None:
+        abort(404)
+    return jsonify({'id': registro.id, 'data': registro.data_sessao.strftime('%d/%m/%Y'),
+                    'evolucao': registro.evolucao})
+
+@bp.route('/busca_evolucoes')
+@orcamento_consultas(3)
+@login_required
+@roles_required('médico')
+def busca_evolucoes():
+    """Evoluções que mencionam o termo, com trechos destacados (ver record_search.py)."""
+    termo = request.args.get('q', '').strip()
+    paciente_id = request.args.get('paciente_id', type=int)
+    medico_id = request.args.get('medico_id', type=int)
+    pagina = max(1, request.args.get('pagina', 1, type=int))
+    paciente = db.session.get(Patient, paciente_id) if paciente_id else None
+    resultados, proxima = buscar_evolucoes(termo, paciente_id, medico_id, pagina) if termo else ([], False)
+    return render_template('busca_evolucoes.html', termo=termo, paciente=paciente, medico_id=medico_id,
+                           pagina=pagina, resultados=resultados, proxima=proxima)
 
-from sqlalchemy import and_
+# --- Agendamento ---
 
-@app.route('/agendamento', methods=['GET', 'POST'])
+@bp.route('/agendamento', methods=['GET', 'POST'])
+@orcamento_consultas(5)
 @login_required
 def agendamento():
     form = AppointmentForm()
-    form.paciente_id.choices = [(p.id, p.nome_completo) for p in Patient.query.order_by(Patient.nome_completo).all()]
+    paciente = db.session.get(Patient, form.paciente_id.data) if form.paciente_id.data else None
 
-    salas = ['Sala 1', 'Sala 2', 'Sala 3', 'Sala 4']
-    ultimos_agendamentos = Appointment.query.order_by(Appointment.data_hora.desc()).limit(5).all()
+    salas = list(SALAS)
+    ultimos_agendamentos = Appointment.query.options(joinedload(Appointment.paciente), joinedload(Appointment.doctor))\
+                                            .order_by(Appointment.data_hora.desc()).limit(5).all()
 
     if form.validate_on_submit():
         novo_inicio = form.data_hora.data
         duracao_min = int(form.duracao.data)
-        novo_fim = novo_inicio + timedelta(minutes=duracao_min)
         sala_escolhida = form.sala.data
 
+        if paciente is None:
+            flash('Selecione um paciente válido na busca.', 'danger')
+            return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas, paciente=paciente)
+
         # Validação do horário permitido (09:00 - 17:00)
-        if not (9 <= novo_inicio.hour < 17 or (novo_inicio.hour == 17 and novo_inicio.minute == 0)):
+        if not (HORA_ABERTURA <= novo_inicio.hour < HORA_FECHAMENTO
+                or (novo_inicio.hour == HORA_FECHAMENTO and novo_inicio.minute == 0)):
             flash('O horário deve ser entre 09:00 e 17:00.', 'danger')
-            return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas)
-
-        # Buscar agendamentos da sala no mesmo dia para verificar conflito
-        inicio_dia = novo_inicio.replace(hour=0, minute=0, second=0, microsecond=0)
-        fim_dia = novo_inicio.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        agendamentos_no_dia = Appointment.query.filter(
-            Appointment.sala == sala_escolhida,
-            Appointment.data_hora >= inicio_dia,
-            Appointment.data_hora <= fim_dia
-        ).all()
-
-        # Verifica se há conflito de horário
-        conflito = False
-        for ag in agendamentos_no_dia:
-            ag_inicio = ag.data_hora
-            ag_fim = ag_inicio + timedelta(minutes=ag.duracao)
-            # Checa se os períodos se sobrepõem
-            if novo_inicio < ag_fim and novo_fim > ag_inicio:
-                conflito = True
-                break
-
+            return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas, paciente=paciente)
+
+        # Série recorrente: todas as sessões verificadas com uma consulta e gravadas num INSERT em lote
+        if form.recorrencia.data:
+            ocorrencias = verificar_serie(gerar_ocorrencias(novo_inicio, form.recorrencia.data, form.ocorrencias.data or 1),
+                                          duracao_min, sala_escolhida, current_user.id)
+            conflitos = [ocorrencia for ocorrencia in ocorrencias if ocorrencia.conflito is not None]
+            if conflitos and (not form.pular_conflitos.data or len(conflitos) == len(ocorrencias)):
+                flash(f'{len(conflitos)} de {len(ocorrencias)} sessões conflitam com agendamentos existentes. '
+                      'Nenhuma sessão foi agendada.', 'danger')
+                return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas,
+                                       paciente=paciente, conflitos=conflitos)
+            criar_serie(ocorrencias, paciente.id, current_user.id, sala_escolhida, duracao_min, form.observacoes.data)
+            db.session.commit()
+            mensagem = f'{len(ocorrencias) - len(conflitos)} sessões agendadas.'
+            if conflitos:
+                mensagem += ' Puladas por conflito: ' + ', '.join(o.inicio.strftime('%d/%m/%Y') for o in conflitos) + '.'
+            flash(mensagem, 'success')
+            return redirect(url_for('main.agendamento'))
+
+        # Verifica conflito de sala ou de médico com uma única consulta por intervalo
+        conflito = verificar_conflito(novo_inicio, duracao_min, sala=sala_escolhida, medico_id=current_user.id)
         if conflito:
-            flash('A sala selecionada está ocupada nesse horário. Por favor, escolha outro horário ou sala.', 'danger')
-            return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas)
+            if conflito.sala == sala_escolhida:
+                flash('A sala selecionada está ocupada nesse horário. Por favor, escolha outro horário ou sala.', 'danger')
+            else:
+                flash('Você já possui um agendamento nesse horário em outra sala.', 'danger')
+            return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas, paciente=paciente)
 
         # Se passou nas validações, cria o agendamento
         agendamento = Appointment(
@@ -221,68 +375,203 @@ def agendamento():
         db.session.add(agendamento)
         db.session.commit()
         flash('Agendamento realizado com sucesso!', 'success')
-        return redirect(url_for('agendamento'))
+        return redirect(url_for('main.agendamento'))
+
+    return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas, paciente=paciente)
 
-    return render_template('agendamento.html', form=form, ultimos_agendamentos=ultimos_agendamentos, salas=salas)
+# Período máximo aceito por /api/horarios_livres
+DIAS_MAXIMOS_HORARIOS = 31
 
-@app.route('/lista_agendamentos')
+@bp.route('/api/horarios_livres')
+@orcamento_consultas(2)
 @login_required
+def api_horarios_livres():
+    """Intervalos livres por sala em que cabe uma consulta da duração pedida.
+
+    Parâmetros: desde, ate (AAAA-MM-DD; padrão hoje e os 6 dias seguintes),
+    duracao (30, 40 ou 60), sala e medico_id opcionais.
+    """
+    hoje = date.today()
+    desde = request.args.get('desde', hoje, type=date.fromisoformat)
+    ate = request.args.get('ate', desde + timedelta(days=6), type=date.fromisoformat)
+    duracao = request.args.get('duracao', 30, type=int)
+    sala = request.args.get('sala') or None
+    medico_id = request.args.get('medico_id', type=int)
+
+    duracoes = [int(valor) for valor, _ in AppointmentForm.duracao.kwargs['choices']]
+    if duracao not in duracoes:
+        return jsonify({'erro': f'duracao deve ser uma de {duracoes}'}), 400
+    if sala is not None and sala not in SALAS:
+        return jsonify({'erro': f'sala deve ser uma de {list(SALAS)}'}), 400
+    if ate < desde or (ate - desde).days >= DIAS_MAXIMOS_HORARIOS:
+        return jsonify({'erro': f'período inválido (máximo de {DIAS_MAXIMOS_HORARIOS} dias)'}), 400
+
+    # Próximo minuto cheio: nenhum intervalo sugerido começa no passado
+    agora = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    livres = horarios_livres(desde, ate, duracao, sala=sala, medico_id=medico_id, agora=agora)
+    return jsonify({
+        'desde': desde.isoformat(),
+        'ate': ate.isoformat(),
+        'duracao': duracao,
+        'horarios': [{
+            'sala': livre.sala,
+            'inicio': livre.inicio.isoformat(timespec='minutes'),
+            'fim': livre.fim.isoformat(timespec='minutes'),
+            'ultimo_inicio': (livre.fim - timedelta(minutes=duracao)).isoformat(timespec='minutes'),
+        } for livre in livres],
+    })
+
+@bp.route('/lista_agendamentos')
+@orcamento_consultas(4)
+@login_required
+@get_condicional(chave_agenda_do_usuario, 'pacientes', chave_link_do_usuario)
 def lista_agendamentos():
-    agendamentos = Appointment.query.filter_by(medico_id=current_user.id).order_by(Appointment.data_hora).all()
-    return render_template('lista_agendamentos.html', agendamentos=agendamentos, show_flash=False)
+    # selectinload: a página continua sendo lida só pelo índice de appointment; os pacientes vêm num IN
+    def carregar_pagina():
+        return paginar_requisicao(Appointment.query.options(selectinload(Appointment.paciente))
+                                             .filter_by(medico_id=current_user.id),
+                                  [Appointment.data_hora, Appointment.id])
+    return render_template('lista_agendamentos.html', carregar_pagina=carregar_pagina, show_flash=False,
+                           link_ics=url_for('main.agenda_ics', token=token_agenda(current_user.id), _external=True),
+                           form_link=NovoLinkAgendaForm())
+
+@bp.route('/lista_agendamentos/novo_link', methods=['POST'])
+@login_required
+def novo_link_agenda():
+    """Troca o link do feed .ics do usuário: o anterior passa a dar 404."""
+    if NovoLinkAgendaForm().validate_on_submit():
+        trocar_link_agenda(current_user.id)
+    return redirect(url_for('main.lista_agendamentos'))
+
+@bp.route('/api/agenda')
+@orcamento_consultas(3)
+@login_required
+@get_condicional(chave_agenda_da_consulta, 'pacientes')
+def api_agenda():
+    """Agendamentos que ocupam o período, em colunas (ver calendar_feed.py).
+
+    Parâmetros: inicio, fim (AAAA-MM-DD ou AAAA-MM-DDTHH:MM; padrão hoje e os
+    7 dias seguintes, fim exclusivo), sala e medico opcionais.
+    """
+    hoje = datetime.combine(date.today(), datetime.min.time())
+    inicio = request.args.get('inicio', hoje, type=datetime.fromisoformat)
+    fim = request.args.get('fim', inicio + timedelta(days=7), type=datetime.fromisoformat)
+    sala = request.args.get('sala') or None
+    medico_id = request.args.get('medico', type=int)
+    if fim <= inicio or fim - inicio > timedelta(days=DIAS_MAXIMOS_AGENDA):
+        return jsonify({'erro': f'período inválido (máximo de {DIAS_MAXIMOS_AGENDA} dias)'}), 400
+    return jsonify(agenda_colunar(inicio, fim, sala=sala, medico_id=medico_id))
+
+@bp.route('/agenda/<token>.ics')
+@orcamento_consultas(2)
+@get_condicional(chave_agenda_do_token, chave_link_do_token, 'pacientes')
+def agenda_ics(token):
+    """Feed iCalendar do médico; o token assinado substitui o login."""
+    resposta = Response(stream_with_context(gerar_ics(medico_do_token(token))),
+                        content_type='text/calendar; charset=utf-8')
+    resposta.headers['Content-Disposition'] = 'inline; filename="agenda.ics"'
+    return resposta
 
 # --- Exportação de Documentos ---
 
-@app.route('/exportar_docx/<int:paciente_id>')
+@bp.route('/exportar_docx/<int:paciente_id>')
+@orcamento_consultas(3)
 @login_required
 @role_required('médico')
 def exportar_docx(paciente_id):
     paciente = Patient.query.get_or_404(paciente_id)
-    evolucoes = MedicalRecord.query.filter_by(paciente_id=paciente_id).order_by(MedicalRecord.data_sessao).all()
-
-    doc = Document()
-    doc.add_heading(f'Prontuário de {paciente.nome_completo}', 0)
-    for evo in evolucoes:
-        doc.add_paragraph(f'Data: {evo.data_sessao.strftime("%d/%m/%Y")}')
-        doc.add_paragraph(f'Evolução: {evo.evolucao}')
-        doc.add_paragraph('---')
+    arquivo = gerar_arquivo(escrever_docx, paciente.nome_completo, registros_do_paciente(paciente_id))
+    return enviar_arquivo(arquivo, nome_arquivo(paciente, 'docx'), MIMETYPE_DOCX)
 
-    file_stream = BytesIO()
-    doc.save(file_stream)
-    file_stream.seek(0)
-    filename = f'prontuario_{paciente.nome_completo.replace(" ", "_")}.docx'
-    return send_file(file_stream, as_attachment=True, download_name=filename,
-                     mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
 
-
-@app.route('/exportar_xlsx/<int:paciente_id>')
+@bp.route('/exportar_xlsx/<int:paciente_id>')
+@orcamento_consultas(3)
 @login_required
 @role_required('médico')
 def exportar_xlsx(paciente_id):
     paciente = Patient.query.get_or_404(paciente_id)
-    evolucoes = MedicalRecord.query.filter_by(paciente_id=paciente_id).order_by(MedicalRecord.data_sessao).all()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Prontuário"
-    ws.append(["Data", "Evolução"])
-    for evo in evolucoes:
-        ws.append([evo.data_sessao.strftime("%d/%m/%Y"), evo.evolucao])
-
-    file_stream = BytesIO()
-    wb.save(file_stream)
-    file_stream.seek(0)
-    filename = f'prontuario_{paciente.nome_completo.replace(" ", "_")}.xlsx'
-    return send_file(file_stream, as_attachment=True, download_name=filename,
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    arquivo = gerar_arquivo(escrever_xlsx, paciente.nome_completo, registros_do_paciente(paciente_id))
+    return enviar_arquivo(arquivo, nome_arquivo(paciente, 'xlsx'), MIMETYPE_XLSX)
+
+# --- Arquivos estáticos ---
+
+@bp.route('/static/dist/<path:nome>')
+def estatico_compilado(nome):
+    return enviar_compilado(nome)
+
+# --- Métricas ---
+
+@bp.route('/api/metricas/cache_usuarios')
+@login_required
+@roles_required('administrador', 'gerencia')
+def metricas_cache_usuarios():
+    return jsonify(cache_usuarios.estatisticas())
+
+@bp.route('/metrics')
+@login_required
+@roles_required('administrador', 'gerencia')
+def metricas():
+    cache = cache_usuarios.estatisticas()
+    fragmentos = cache_fragmentos.estatisticas()
+    extras = [
+        ('clinica_cache_usuarios_acertos_total', 'counter', 'Acertos do cache do user_loader.', cache['acertos']),
+        ('clinica_cache_usuarios_falhas_total', 'counter', 'Falhas do cache do user_loader.', cache['falhas']),
+        ('clinica_cache_usuarios_itens', 'gauge', 'Usuários no cache do user_loader.', cache['tamanho']),
+        ('clinica_cache_fragmentos_acertos_total', 'counter', 'Acertos do cache de fragmentos.', fragmentos['acertos']),
+        ('clinica_cache_fragmentos_falhas_total', 'counter', 'Falhas do cache de fragmentos.', fragmentos['falhas']),
+        ('clinica_cache_fragmentos_descartes_total', 'counter', 'Fragmentos descartados pelo LRU.',
+         fragmentos['descartes']),
+        ('clinica_cache_fragmentos_itens', 'gauge', 'Fragmentos no cache em memória.', fragmentos['itens']),
+        ('clinica_cache_fragmentos_bytes', 'gauge', 'Tamanho dos fragmentos em memória.', fragmentos['bytes']),
+    ]
+    return Response(texto_prometheus(extras), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- Exportação em lote ---
+
+@bp.route('/jobs', methods=['GET', 'POST'])
+@orcamento_consultas(5)
+@login_required
+@roles_required('administrador', 'gerencia')
+def exportacoes():
+    form = ExportacaoLoteForm()
+    form.medico_id.choices = [(0, 'Todos')] + [
+        (u.id, u.nome_completo) for u in User.query.filter_by(funcao='médico').order_by(User.nome_completo)
+    ]
+    if form.validate_on_submit():
+        job = jobs.criar_job(current_app._get_current_object(), form.formato.data, current_user.id,
+                             servico_buscado=form.servico_buscado.data or None,
+                             medico_id=form.medico_id.data or None)
+        flash(f'Exportação #{job.id} iniciada com {job.total} paciente(s).', 'success')
+        return redirect(url_for('main.exportacoes'))
+    recentes = ExportJob.query.order_by(ExportJob.id.desc()).limit(20).all()
+    return render_template('exportacoes.html', form=form, jobs=recentes, show_flash=True)
+
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+@roles_required('administrador', 'gerencia')
+def job_progresso(job_id):
+    job = ExportJob.query.get_or_404(job_id)
+    return jsonify(jobs.progresso(job))
+
+
+@bp.route('/jobs/<int:job_id>/download')
+@login_required
+@roles_required('administrador', 'gerencia')
+def job_download(job_id):
+    job = ExportJob.query.get_or_404(job_id)
+    if job.status != 'concluido' or not job.arquivo:
+        abort(404)
+    return send_from_directory(jobs.pasta_exportacoes(current_app), job.arquivo, as_attachment=True,
+                               download_name=f'prontuarios_{job.id}.zip')
 
 # --- Tratamento de erros ---
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
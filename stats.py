@@ -0,0 +1,219 @@
+"""Estatísticas da clínica mantidas de forma incremental.
+
+As tabelas `estatistica_*` (models.py) guardam os agregados já prontos:
+ocupação por sala e dia, consultas por médico e semana, pacientes novos e
+sessões por mês, e os totais gerais. Triggers em `appointment`, `patient` e
+`medical_record` ajustam só as linhas afetadas a cada INSERT/UPDATE/DELETE, de
+modo que a leitura não depende do tamanho das tabelas de origem e inserções
+em lote ou por SQL puro também ficam contabilizadas.
+
+`flask reconstruir-estatisticas` recalcula tudo a partir das tabelas de origem.
+Linhas movidas para o banco de arquivo (archive.py) continuam contando: o
+arquivamento soma de volta o que os triggers de DELETE subtraíram, e a
+reconstrução lê as duas cópias.
+"""
+from datetime import date, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, text
+
+from extensions import db
+from models import (
+    User, Patient, Appointment, MedicalRecord,
+    EstatisticaSalaDia, EstatisticaMedicoSemana, EstatisticaMes, EstatisticaTotal,
+)
+from agenda import HORA_ABERTURA, HORA_FECHAMENTO
+
+MINUTOS_EXPEDIENTE = (HORA_FECHAMENTO - HORA_ABERTURA) * 60
+PERIODO_MAXIMO = 366  # dias aceitos por consulta à API
+
+
+# --- SQL dos ajustes ---
+
+def _upsert(tabela, chaves, valores, condicao='1'):
+    """Soma `valores` na linha identificada por `chaves`, criando-a se preciso."""
+    colunas = ', '.join([*chaves, *valores])
+    expressoes = ', '.join([*chaves.values(), *valores.values()])
+    somas = ', '.join(f'{coluna} = {coluna} + excluded.{coluna}' for coluna in valores)
+    # O WHERE evita a ambiguidade entre o SELECT e o ON CONFLICT do upsert
+    return (f'INSERT INTO {tabela} ({colunas}) SELECT {expressoes} WHERE {condicao} '
+            f'ON CONFLICT ({", ".join(chaves)}) DO UPDATE SET {somas};')
+
+
+def _remover_zerados(tabela, chaves, contadores):
+    filtro = ' AND '.join(f'{coluna} = {expr}' for coluna, expr in chaves.items())
+    zerados = ' AND '.join(f'{coluna} <= 0' for coluna in contadores)
+    return f'DELETE FROM {tabela} WHERE {filtro} AND {zerados};'
+
+
+def _alvos(tabela, p, sinal):
+    """(agregado, chaves, valores, condição) afetados por uma linha `p` de `tabela`."""
+    if tabela == 'appointment':
+        return [
+            ('estatistica_sala_dia',
+             {'sala': f"coalesce({p}.sala, '')", 'dia': f'date({p}.data_hora)'},
+             {'consultas': f'{sinal}', 'minutos': f'{sinal} * coalesce({p}.duracao, 0)'}, '1'),
+            ('estatistica_medico_semana',
+             {'medico_id': f'{p}.medico_id', 'semana': f"date({p}.data_hora, 'weekday 0', '-6 days')"},
+             {'consultas': f'{sinal}'}, '1'),
+        ]
+    if tabela == 'patient':
+        return [('estatistica_mes', {'mes': f"strftime('%Y-%m', {p}.criado_em)"},
+                 {'novos_pacientes': f'{sinal}', 'sessoes': '0'}, f'{p}.criado_em IS NOT NULL')]
+    return [('estatistica_mes', {'mes': f"strftime('%Y-%m', {p}.data_sessao)"},
+             {'novos_pacientes': '0', 'sessoes': f'{sinal}'}, '1')]
+
+
+def _ajustes(tabela, prefixo, sinal):
+    """Comandos que somam (sinal=1) ou subtraem (sinal=-1) a linha `prefixo` dos agregados."""
+    comandos = []
+    for destino, chaves, valores, condicao in _alvos(tabela, prefixo, sinal):
+        comandos.append(_upsert(destino, chaves, valores, condicao))
+        if sinal < 0:
+            comandos.append(_remover_zerados(destino, chaves, valores))
+    return comandos
+
+
+def _total(chave, sinal):
+    return _upsert('estatistica_total', {'chave': f"'{chave}'"}, {'valor': f'{sinal}'})
+
+
+# Tabela de origem -> (chave em estatistica_total, colunas que mudam os agregados)
+FONTES = {
+    'appointment': ('agendamentos', 'sala, data_hora, duracao, medico_id'),
+    'patient': ('pacientes', 'criado_em'),
+    'medical_record': ('prontuarios', 'data_sessao'),
+}
+
+
+def _triggers(tabela):
+    chave, colunas = FONTES[tabela]
+    corpo = {
+        'ai': [*_ajustes(tabela, 'NEW', 1), _total(chave, 1)],
+        'ad': [*_ajustes(tabela, 'OLD', -1), _total(chave, -1)],
+        'au': [*_ajustes(tabela, 'OLD', -1), *_ajustes(tabela, 'NEW', 1)],
+    }
+    evento = {'ai': 'AFTER INSERT', 'ad': 'AFTER DELETE', 'au': f'AFTER UPDATE OF {colunas}'}
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {tabela}_estatisticas_{sufixo} {evento[sufixo]} ON {tabela} BEGIN\n    "
+        + '\n    '.join(comandos) + '\nEND'
+        for sufixo, comandos in corpo.items()
+    ]
+
+
+def somas(tabela, origem, filtro='1'):
+    """Comandos que somam aos agregados todas as linhas de `origem` que atendem a `filtro`.
+
+    `origem` é `tabela` ou outra fonte com as mesmas colunas (ex. a cópia
+    arquivada, ver archive.py); é a versão em lote dos triggers de INSERT.
+    """
+    comandos = []
+    for destino, chaves, valores, condicao in _alvos(tabela, 'o', 1):
+        colunas = ', '.join([*chaves, *valores])
+        expressoes = ', '.join([*chaves.values(), *(f'sum({valor})' for valor in valores.values())])
+        grupos = ', '.join(str(i) for i in range(1, len(chaves) + 1))
+        atualizacoes = ', '.join(f'{coluna} = {coluna} + excluded.{coluna}' for coluna in valores)
+        comandos.append(f'INSERT INTO {destino} ({colunas}) SELECT {expressoes} FROM {origem} AS o '
+                        f'WHERE ({condicao}) AND ({filtro}) GROUP BY {grupos} '
+                        f'ON CONFLICT ({", ".join(chaves)}) DO UPDATE SET {atualizacoes}')
+    chave = FONTES[tabela][0]
+    comandos.append(f"INSERT INTO estatistica_total (chave, valor) SELECT '{chave}', count(*) FROM {origem} AS o "
+                    f'WHERE {filtro} ON CONFLICT (chave) DO UPDATE SET valor = valor + excluded.valor')
+    return comandos
+
+
+LIMPAR = [
+    'DELETE FROM estatistica_sala_dia',
+    'DELETE FROM estatistica_medico_semana',
+    'DELETE FROM estatistica_mes',
+    'DELETE FROM estatistica_total',
+]
+
+# Com db.create_all() os triggers nascem junto das tabelas de origem; em bancos
+# existentes eles são criados pela migração correspondente.
+for _modelo in (Appointment, Patient, MedicalRecord):
+    for _trigger in _triggers(_modelo.__tablename__):
+        # DDL() aplica formatação com '%', então o strftime precisa de '%%'
+        event.listen(_modelo.__table__, 'after_create',
+                     DDL(_trigger.replace('%', '%%')).execute_if(dialect='sqlite'))
+
+
+def reconstruir():
+    """Recalcula os agregados, contando também as linhas já arquivadas."""
+    from archive import origem_completa
+
+    comandos = list(LIMPAR)
+    for tabela, (_, colunas) in FONTES.items():
+        comandos += somas(tabela, origem_completa(tabela, colunas))
+    for comando in comandos:
+        db.session.execute(text(comando))
+    db.session.commit()
+
+
+@click.command('reconstruir-estatisticas')
+@with_appcontext
+def reconstruir_estatisticas():
+    """Recalcula as tabelas de estatísticas a partir dos dados da clínica."""
+    reconstruir()
+    print('Estatísticas reconstruídas.')
+
+
+# --- Leitura ---
+
+def total(chave):
+    return db.session.query(EstatisticaTotal.valor).filter_by(chave=chave).scalar() or 0
+
+
+def totais():
+    return dict(db.session.query(EstatisticaTotal.chave, EstatisticaTotal.valor))
+
+
+def periodo_padrao(hoje=None):
+    """Últimos 30 dias e próximos 30 dias (agendamentos futuros também ocupam sala)."""
+    hoje = hoje or date.today()
+    return hoje - timedelta(days=30), hoje + timedelta(days=30)
+
+
+def ocupacao_salas(desde, ate):
+    linhas = EstatisticaSalaDia.query.filter(EstatisticaSalaDia.dia.between(desde, ate))\
+        .order_by(EstatisticaSalaDia.dia, EstatisticaSalaDia.sala)
+    return [{
+        'sala': linha.sala,
+        'dia': linha.dia.isoformat(),
+        'consultas': linha.consultas,
+        'minutos': linha.minutos,
+        'taxa_ocupacao': round(linha.minutos / MINUTOS_EXPEDIENTE, 4),
+    } for linha in linhas]
+
+
+def consultas_por_medico(desde, ate):
+    inicio_semana = desde - timedelta(days=desde.weekday())
+    linhas = db.session.query(EstatisticaMedicoSemana, User.nome_completo)\
+        .outerjoin(User, User.id == EstatisticaMedicoSemana.medico_id)\
+        .filter(EstatisticaMedicoSemana.semana.between(inicio_semana, ate))\
+        .order_by(EstatisticaMedicoSemana.semana, EstatisticaMedicoSemana.medico_id)
+    return [{
+        'medico_id': linha.medico_id,
+        'medico': nome,
+        'semana': linha.semana.isoformat(),
+        'consultas': linha.consultas,
+    } for linha, nome in linhas]
+
+
+def resumo_mensal(desde, ate):
+    linhas = EstatisticaMes.query.filter(EstatisticaMes.mes.between(desde.strftime('%Y-%m'),
+                                                                    ate.strftime('%Y-%m')))\
+        .order_by(EstatisticaMes.mes)
+    return [{'mes': linha.mes, 'novos_pacientes': linha.novos_pacientes, 'sessoes': linha.sessoes}
+            for linha in linhas]
+
+
+def estatisticas(desde, ate):
+    return {
+        'periodo': {'desde': desde.isoformat(), 'ate': ate.isoformat()},
+        'totais': totais(),
+        'ocupacao_salas': ocupacao_salas(desde, ate),
+        'consultas_por_medico': consultas_por_medico(desde, ate),
+        'resumo_mensal': resumo_mensal(desde, ate),
+    }
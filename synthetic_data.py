@@ -0,0 +1,241 @@
+"""Geração de dados sintéticos para medir as rotas em escala.
+
+`flask gerar-dados --pacientes 100000 --agendamentos 1000000 --registros 500000`
+insere, em lotes de um INSERT cada, médicos, pacientes, agendamentos e
+evoluções com valores plausíveis. A mesma semente gera sempre os mesmos dados,
+para que medições de commits diferentes sejam comparáveis (ver
+benchmarks/bench_rotas.py).
+
+Os agendamentos ocupam horários cheios do expediente, de `--anos` para trás
+até 60 dias à frente, sem conflito de sala nem de médico. Quando as salas da
+clínica (agenda.SALAS) não comportam o volume pedido no período, são criadas
+salas extras ("Sala 5", "Sala 6"...), com ocupação de até OCUPACAO_MAXIMA.
+Índices de busca, estatísticas e versões são mantidos pelos próprios triggers.
+"""
+import math
+import os
+import random
+from datetime import date, datetime, time, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+from agenda import HORA_ABERTURA, HORA_FECHAMENTO, SALAS
+from extensions import db
+from forms import ESCOLARIDADES, ESTADOS_CIVIS, SERVICOS_BUSCADOS
+from models import Appointment, MedicalRecord, Patient, User
+from passwords import gerar_hash
+from patient_search import normalizar
+
+LOTE_PADRAO = 5000
+OCUPACAO_MAXIMA = 0.85
+DIAS_FUTUROS = 60
+DURACOES = (30, 40, 60)
+
+NOMES = ('Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+         'Juliana', 'Lucas', 'Mariana', 'Mateus', 'Natália', 'Otávio', 'Patrícia', 'Rafael', 'Sofia', 'Thiago',
+         'Vitória', 'José', 'Maria', 'Antônio', 'Francisca', 'Conceição', 'Sebastião', 'Luíza', 'Raimundo', 'Cecília')
+SOBRENOMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Melo', 'Barbosa', 'Cardoso', 'Rocha', 'Dias',
+              'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas', 'Conceição')
+RUAS = ('Rua das Flores', 'Avenida Brasil', 'Rua São João', 'Rua XV de Novembro', 'Avenida Paulista',
+        'Rua da Consolação', 'Rua Sete de Setembro', 'Travessa do Comércio', 'Rua Direita', 'Alameda Santos')
+FRASES = (
+    'Paciente relata melhora do sono após ajuste da rotina.',
+    'Humor eutímico, discurso organizado e coerente.',
+    'Iniciado registro diário de pensamentos automáticos.',
+    'Discutidas estratégias de enfrentamento no trabalho.',
+    'Família participou da sessão; conflitos com o filho adolescente.',
+    'Sem ideação suicida. Rede de apoio preservada.',
+    'Retomou atividade física três vezes por semana.',
+    'Relata luto pela perda da mãe há seis meses.',
+    'Exercícios de respiração diafragmática praticados em sessão.',
+    'Encaminhado para avaliação psiquiátrica.',
+    'Orientado sobre higiene do sono.',
+    'Aderente às tarefas combinadas na última sessão.',
+)
+# Frases com medicação ou sintoma, para que os termos tenham frequências variadas
+MODELOS = (
+    'Mantém uso de {medicamento} {dose} mg, sem efeitos colaterais relevantes.',
+    'Iniciado {medicamento} {dose} mg à noite.',
+    'Suspendeu {medicamento} por conta própria; orientado sobre os riscos.',
+    'Queixa principal: {sintoma}.',
+    'Relata {sintoma} há {semanas} semanas.',
+    'Nega {sintoma}.',
+)
+MEDICAMENTOS = ('sertralina', 'fluoxetina', 'escitalopram', 'paroxetina', 'venlafaxina', 'duloxetina',
+                'bupropiona', 'mirtazapina', 'trazodona', 'quetiapina', 'risperidona', 'aripiprazol', 'lítio',
+                'lamotrigina', 'clonazepam', 'alprazolam', 'diazepam', 'zolpidem', 'metilfenidato', 'pregabalina')
+SINTOMAS = ('insônia', 'ansiedade', 'irritabilidade', 'tristeza persistente', 'apatia', 'fadiga', 'cefaleia',
+            'taquicardia', 'tremores', 'pesadelos', 'compulsão alimentar', 'falta de apetite', 'crises de pânico',
+            'dificuldade de concentração', 'pensamentos intrusivos', 'isolamento social', 'choro fácil',
+            'agitação', 'sonolência diurna', 'dores musculares')
+
+
+def _escolhas(opcoes):
+    return [valor for valor, _ in opcoes]
+
+
+def _em_lotes(linhas, lote):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == lote:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _inserir(tabela, linhas, lote):
+    total = 0
+    for bloco in _em_lotes(linhas, lote):
+        db.session.execute(tabela.insert(), bloco)
+        db.session.commit()
+        total += len(bloco)
+    return total
+
+
+def _faixa_de_ids(modelo):
+    return db.session.execute(select(func.min(modelo.id), func.max(modelo.id))).one()
+
+
+# --- Geradores de linhas ---
+
+def _pacientes(rng, quantidade, inicio):
+    escolaridades, estados_civis, servicos = map(_escolhas, (ESCOLARIDADES, ESTADOS_CIVIS, SERVICOS_BUSCADOS))
+    agora = datetime.utcnow()
+    for i in range(inicio, inicio + quantidade):
+        nome, sobrenome, ultimo = rng.choice(NOMES), rng.choice(SOBRENOMES), rng.choice(SOBRENOMES)
+        yield dict(
+            nome_completo=f'{nome} {sobrenome} {ultimo}',
+            data_nascimento=date(1940, 1, 1) + timedelta(days=rng.randrange(80 * 365)),
+            paciente_dependente='nao',
+            endereco=f'{rng.choice(RUAS)}, {rng.randrange(1, 3000)}',
+            # Únicos, para não cair na deduplicação da importação (patient_import.py)
+            email=normalizar(f'{nome}.{sobrenome}.{i}@exemplo.com.br'),
+            telefone=f'(11) 9{i // 10000 % 10000:04d}-{i % 10000:04d}',
+            escolaridade=rng.choice(escolaridades),
+            estado_civil=rng.choice(estados_civis),
+            servico_buscado=rng.choice(servicos),
+            criado_em=agora,
+        )
+
+
+def _dias_uteis(desde, ate):
+    dia = desde
+    while dia <= ate:
+        if dia.weekday() < 5:
+            yield dia
+        dia += timedelta(days=1)
+
+
+def _agendamentos(rng, quantidade, dias, salas, medicos, pacientes):
+    """Escolhe `quantidade` horários (dia, hora, sala) em ordem, por amostragem sequencial."""
+    horas = range(HORA_ABERTURA, HORA_FECHAMENTO)
+    restantes, vagas = quantidade, len(dias) * len(horas) * len(salas)
+    for d, dia in enumerate(dias):
+        for hora in horas:
+            for s, sala in enumerate(salas):
+                if rng.random() * vagas < restantes:
+                    restantes -= 1
+                    # Médicos distintos por horário: nunca há conflito de médico
+                    yield dict(paciente_id=rng.randint(*pacientes), medico_id=medicos[(s + d + hora) % len(medicos)],
+                               sala=sala, data_hora=datetime.combine(dia, time(hora)),
+                               duracao=rng.choice(DURACOES), criado_em=datetime.combine(dia, time(8)))
+                vagas -= 1
+
+
+def _registros(rng, quantidade, desde, ate, medicos, pacientes):
+    primeiro, ultimo = pacientes
+    segundos = int((ate - desde).total_seconds())
+    for _ in range(quantidade):
+        # Poucos pacientes com muitas sessões e muitos com poucas
+        paciente_id = primeiro + int((ultimo - primeiro + 1) * rng.random() ** 2)
+        data_sessao = desde + timedelta(seconds=rng.randrange(segundos))
+        frases = rng.sample(FRASES, rng.randint(1, 4)) + [
+            rng.choice(MODELOS).format(medicamento=rng.choice(MEDICAMENTOS), dose=rng.choice((10, 25, 50, 100)),
+                                       sintoma=rng.choice(SINTOMAS), semanas=rng.randint(1, 12))
+            for _ in range(rng.randint(1, 2))]
+        rng.shuffle(frases)
+        yield dict(paciente_id=paciente_id, medico_id=rng.choice(medicos), data_sessao=data_sessao,
+                   evolucao=' '.join(frases), criado_em=data_sessao)
+
+
+# --- Comando ---
+
+def _usuarios(prefixo, funcao, quantidade, senha_hash):
+    nomes = [f'{prefixo}{i:03d}' for i in range(1, quantidade + 1)]
+    existentes = set(db.session.scalars(select(User.username).where(User.username.in_(nomes))))
+    db.session.add_all(User(username=nome, senha=senha_hash, nome_completo=f'{funcao.capitalize()} {nome[-3:]}',
+                            funcao=funcao) for nome in nomes if nome not in existentes)
+    db.session.commit()
+    return list(db.session.scalars(select(User.id).where(User.username.in_(nomes)).order_by(User.id)))
+
+
+def gerar_dados(pacientes=0, agendamentos=0, registros=0, medicos=8, anos=3, senha='dados123',
+                semente=42, lote=LOTE_PADRAO, hoje=None, eco=None):
+    """Insere os dados pedidos e retorna {tabela: linhas inseridas}.
+
+    Os usuários sintéticos (medico001..., recepcao001) recebem `senha`.
+    Agendamentos e evoluções usam os pacientes já existentes quando `pacientes` é 0.
+    """
+    rng = random.Random(semente)
+    eco = eco or (lambda mensagem: None)
+    hoje = hoje or date.today()
+    desde = hoje - timedelta(days=365 * anos)
+    dias = list(_dias_uteis(desde, hoje + timedelta(days=DIAS_FUTUROS)))
+    horarios = len(dias) * (HORA_FECHAMENTO - HORA_ABERTURA)
+    salas = list(SALAS) + [f'Sala {n}' for n in range(len(SALAS) + 1,
+                                                      math.ceil(agendamentos / (horarios * OCUPACAO_MAXIMA)) + 1)]
+
+    senha_hash = gerar_hash(senha)
+    ids_medicos = _usuarios('medico', 'médico', max(medicos, len(salas)), senha_hash)
+    _usuarios('recepcao', 'recepcao', 1, senha_hash)
+    inseridos = {}
+
+    _, ultimo = _faixa_de_ids(Patient)
+    eco(f'Pacientes: {pacientes}...')
+    inseridos['pacientes'] = _inserir(Patient.__table__, _pacientes(rng, pacientes, (ultimo or 0) + 1), lote)
+    faixa = _faixa_de_ids(Patient)
+    if (agendamentos or registros) and faixa[0] is None:
+        raise ValueError('Não há pacientes para os agendamentos e evoluções.')
+
+    eco(f'Agendamentos: {agendamentos} em {len(salas)} salas, {len(dias)} dias úteis...')
+    inseridos['agendamentos'] = _inserir(
+        Appointment.__table__, _agendamentos(rng, agendamentos, dias, salas, ids_medicos, faixa), lote)
+
+    eco(f'Evoluções: {registros}...')
+    inseridos['registros'] = _inserir(
+        MedicalRecord.__table__,
+        _registros(rng, registros, datetime.combine(desde, time()), datetime.combine(hoje, time()), ids_medicos, faixa),
+        lote)
+    return inseridos
+
+
+@click.command('gerar-dados')
+@click.option('--pacientes', type=int, default=1000, show_default=True)
+@click.option('--agendamentos', type=int, default=10000, show_default=True)
+@click.option('--registros', type=int, default=5000, show_default=True, help='Evoluções de prontuário.')
+@click.option('--medicos', type=int, default=8, show_default=True, help='Mínimo; cresce com o número de salas.')
+@click.option('--anos', type=int, default=3, show_default=True, help='Histórico de agendamentos e evoluções.')
+@click.option('--senha', default='dados123', show_default=True, help='Senha dos usuários sintéticos.')
+@click.option('--semente', type=int, default=42, show_default=True)
+@click.option('--lote', type=int, default=LOTE_PADRAO, show_default=True, help='Linhas por INSERT.')
+@click.option('--forcar', is_flag=True, help='Gera mesmo com CLINICA_ENV=production.')
+@with_appcontext
+def gerar_dados_comando(pacientes, agendamentos, registros, medicos, anos, senha, semente, lote, forcar):
+    """Gera pacientes, agendamentos e evoluções sintéticos em lote."""
+    # Os usuários sintéticos entram com uma senha conhecida, e os pacientes se misturam aos reais
+    if os.environ.get('CLINICA_ENV') == 'production' and not forcar:
+        raise click.ClickException('CLINICA_ENV=production: recusado para não misturar dados sintéticos aos reais '
+                                   '(use --forcar se for mesmo isso).')
+    inicio = datetime.now()
+    try:
+        inseridos = gerar_dados(pacientes, agendamentos, registros, medicos, anos, senha, semente, lote, eco=print)
+    except ValueError as erro:
+        raise click.ClickException(str(erro))
+    segundos = (datetime.now() - inicio).total_seconds()
+    print(f'{inseridos["pacientes"]} pacientes, {inseridos["agendamentos"]} agendamentos e '
+          f'{inseridos["registros"]} evoluções inseridos em {segundos:.1f} s.')
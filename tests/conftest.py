@@ -0,0 +1,16 @@
+"""Configuração dos testes: os módulos da aplicação ficam na raiz do repositório."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_plans import banco_de_verificacao  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    """Perfil de testes sobre um SQLite temporário, com o orçamento de consultas estrito."""
+    with banco_de_verificacao(estrito=True) as app:
+        yield app
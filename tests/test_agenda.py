@@ -0,0 +1,215 @@
+"""Motor de agendamento (agenda.py): conflitos, horários livres e séries recorrentes."""
+from datetime import date, datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from agenda import (DURACAO_MAXIMA, SALAS, IndiceOcupacao, Livre, criar_serie, gerar_ocorrencias, horarios_livres,
+                    verificar_conflito, verificar_serie)
+from extensions import db
+from models import Appointment, Patient, User
+from query_budget import CABECALHO, orcamento_da_rota
+
+
+@pytest.fixture(scope='module')
+def pessoas(app):
+    """(paciente_id, médico A, médico B)."""
+    with app.app_context():
+        medicos = [User(username=f'medico_agenda_{i}', senha='-', nome_completo=f'Dr. Agenda {i}', funcao='médico')
+                   for i in range(2)]
+        paciente = Patient(nome_completo='Paciente Agenda', data_nascimento=datetime(1980, 1, 1).date(),
+                           endereco='-', email='agenda@example.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia')
+        db.session.add_all([*medicos, paciente])
+        db.session.commit()
+        return paciente.id, medicos[0].id, medicos[1].id
+
+
+def _agendar(pessoas, medico_id, sala, inicio, duracao):
+    agendamento = Appointment(paciente_id=pessoas[0], medico_id=medico_id, sala=sala, data_hora=inicio,
+                              duracao=duracao)
+    db.session.add(agendamento)
+    db.session.commit()
+    return agendamento.id
+
+
+def _pelo_indice(inicio, duracao, sala=None, medico_id=None):
+    # O dia inteiro no índice: a volta até DURACAO_MAXIMA é do próprio índice, não da consulta
+    dia = datetime.combine(inicio.date(), datetime.min.time())
+    indice = IndiceOcupacao.carregar(dia, dia + timedelta(days=1), sala=sala, medico_id=medico_id)
+    return indice.conflito(inicio, duracao, sala=sala, medico_id=medico_id)
+
+
+# A consulta ao banco e o índice em memória têm a mesma semântica
+IMPLEMENTACOES = (verificar_conflito, _pelo_indice)
+
+
+def test_consultas_encostadas_nao_conflitam(app, pessoas):
+    _, medico, _ = pessoas
+    with app.app_context():
+        _agendar(pessoas, medico, 'Sala 1', datetime(2030, 3, 4, 10), 30)
+        for conflito in IMPLEMENTACOES:
+            assert conflito(datetime(2030, 3, 4, 10, 30), 30, sala='Sala 1', medico_id=medico) is None
+            assert conflito(datetime(2030, 3, 4, 9, 30), 30, sala='Sala 1', medico_id=medico) is None
+            assert conflito(datetime(2030, 3, 4, 10, 29), 30, sala='Sala 1') is not None
+
+
+def test_medico_ocupado_em_outra_sala(app, pessoas):
+    _, medico, outro = pessoas
+    with app.app_context():
+        _agendar(pessoas, medico, 'Sala 2', datetime(2030, 3, 5, 14), 60)
+        for conflito in IMPLEMENTACOES:
+            ocupacao = conflito(datetime(2030, 3, 5, 14, 30), 30, sala='Sala 3', medico_id=medico)
+            assert ocupacao is not None and ocupacao.sala == 'Sala 2' and ocupacao.medico_id == medico
+            assert conflito(datetime(2030, 3, 5, 14, 30), 30, sala='Sala 3', medico_id=outro) is None
+
+
+def test_limite_de_duracao_maxima(app, pessoas):
+    _, medico, _ = pessoas
+    inicio = datetime(2030, 3, 6, 12)
+    with app.app_context():
+        # Começa exatamente DURACAO_MAXIMA antes e termina em `inicio`: fica fora da janela e não conflita
+        _agendar(pessoas, medico, 'Sala 1', inicio - timedelta(minutes=DURACAO_MAXIMA), DURACAO_MAXIMA)
+        # Um minuto depois já alcança `inicio`
+        _agendar(pessoas, medico, 'Sala 4', inicio - timedelta(minutes=DURACAO_MAXIMA - 1), DURACAO_MAXIMA)
+        for conflito in IMPLEMENTACOES:
+            assert conflito(inicio, 30, sala='Sala 1') is None
+            ocupacao = conflito(inicio, 30, sala='Sala 4')
+            assert ocupacao is not None and ocupacao.fim == inicio + timedelta(minutes=1)
+
+
+def test_excluir_o_proprio_agendamento(app, pessoas):
+    _, medico, _ = pessoas
+    inicio = datetime(2030, 3, 7, 9)
+    with app.app_context():
+        proprio = _agendar(pessoas, medico, 'Sala 1', inicio, 40)
+        assert verificar_conflito(inicio, 40, sala='Sala 1', medico_id=medico).id == proprio
+        assert verificar_conflito(inicio, 40, sala='Sala 1', medico_id=medico, excluir_id=proprio) is None
+        outro = _agendar(pessoas, medico, 'Sala 2', inicio + timedelta(minutes=20), 30)
+        assert verificar_conflito(inicio, 40, sala='Sala 1', medico_id=medico, excluir_id=proprio).id == outro
+
+
+# --- Horários livres ---
+
+def _livres(dia, duracao=30, **kwargs):
+    return horarios_livres(dia, dia, duracao, **kwargs)
+
+
+def test_expediente_vai_ate_a_ultima_consulta_das_17h(app):
+    dia = date(2030, 4, 1)
+    with app.app_context():
+        # A rota de agendamento aceita 17:00; a busca oferece esse início
+        assert _livres(dia, 40, sala='Sala 1') == [
+            Livre('Sala 1', datetime(2030, 4, 1, 9), datetime(2030, 4, 1, 17, 40))]
+
+
+def test_agendamentos_sobrepostos_na_mesma_sala(app, pessoas):
+    _, medico, outro = pessoas
+    with app.app_context():
+        _agendar(pessoas, medico, 'Sala 1', datetime(2030, 4, 2, 10), 60)
+        _agendar(pessoas, outro, 'Sala 1', datetime(2030, 4, 2, 10, 30), 60)
+        # A sala só vaga quando o segundo termina, não quando o primeiro termina
+        assert _livres(date(2030, 4, 2), sala='Sala 1') == [
+            Livre('Sala 1', datetime(2030, 4, 2, 9), datetime(2030, 4, 2, 10)),
+            Livre('Sala 1', datetime(2030, 4, 2, 11, 30), datetime(2030, 4, 2, 17, 30)),
+        ]
+
+
+def test_medico_ocupado_bloqueia_todas_as_salas(app, pessoas):
+    _, medico, outro = pessoas
+    dia = date(2030, 4, 3)
+    with app.app_context():
+        _agendar(pessoas, medico, 'Sala 2', datetime(2030, 4, 3, 14), 60)
+        livres = _livres(dia, medico_id=medico)
+        assert {livre.sala for livre in livres} == set(SALAS)
+        for sala in SALAS:
+            assert [(l.inicio.hour, l.fim.hour) for l in livres if l.sala == sala] == [(9, 14), (15, 17)]
+        # Para outro médico, só a Sala 2 está ocupada
+        assert [l for l in _livres(dia, medico_id=outro) if l.sala == 'Sala 3'] == [
+            Livre('Sala 3', datetime(2030, 4, 3, 9), datetime(2030, 4, 3, 17, 30))]
+
+
+def test_agora_recorta_o_que_ja_passou(app, pessoas):
+    _, medico, _ = pessoas
+    with app.app_context():
+        _agendar(pessoas, medico, 'Sala 1', datetime(2030, 4, 4, 11), 60)
+        livres = _livres(date(2030, 4, 4), sala='Sala 1', agora=datetime(2030, 4, 4, 10, 40))
+        # 10:40-11:00 não cabe uma consulta de 30 minutos; o resto do dia começa às 12:00
+        assert livres == [Livre('Sala 1', datetime(2030, 4, 4, 12), datetime(2030, 4, 4, 17, 30))]
+        livres = _livres(date(2030, 4, 4), sala='Sala 1', agora=datetime(2030, 4, 4, 11, 30))
+        assert livres == [Livre('Sala 1', datetime(2030, 4, 4, 12), datetime(2030, 4, 4, 17, 30))]
+
+
+def test_fim_e_inicio_no_mesmo_instante(app, pessoas):
+    _, medico, outro = pessoas
+    with app.app_context():
+        # Fim de uma e início da outra às 10:30, na sala e no médico: nenhum buraco aparece entre elas
+        _agendar(pessoas, medico, 'Sala 1', datetime(2030, 4, 5, 10), 30)
+        _agendar(pessoas, outro, 'Sala 1', datetime(2030, 4, 5, 10, 30), 30)
+        _agendar(pessoas, medico, 'Sala 2', datetime(2030, 4, 5, 10, 30), 30)
+        assert _livres(date(2030, 4, 5), sala='Sala 1', medico_id=medico) == [
+            Livre('Sala 1', datetime(2030, 4, 5, 9), datetime(2030, 4, 5, 10)),
+            Livre('Sala 1', datetime(2030, 4, 5, 11), datetime(2030, 4, 5, 17, 30)),
+        ]
+
+
+# --- Séries recorrentes ---
+
+def _da_serie(serie_id):
+    return db.session.scalars(db.select(Appointment).filter_by(serie_id=serie_id)
+                              .order_by(Appointment.data_hora)).all()
+
+
+def test_serie_nao_conflita_consigo_mesma(app, pessoas):
+    _, medico, _ = pessoas
+    inicio = datetime(2030, 5, 6, 10)
+    with app.app_context():
+        ocorrencias = verificar_serie([inicio, inicio + timedelta(minutes=20), inicio + timedelta(minutes=40)],
+                                      40, 'Sala 1', medico)
+        assert ocorrencias[0].conflito is None
+        # A segunda cruza a primeira (ainda não gravada); a terceira começa quando a primeira termina
+        assert ocorrencias[1].conflito is not None and ocorrencias[1].conflito.id is None
+        assert ocorrencias[1].conflito.inicio == inicio
+        assert ocorrencias[2].conflito is None
+
+
+def test_serie_pula_ocorrencias_em_conflito(app, pessoas):
+    paciente, medico, outro = pessoas
+    inicio = datetime(2030, 5, 13, 15)
+    with app.app_context():
+        sala_ocupada = _agendar(pessoas, outro, 'Sala 1', inicio + timedelta(weeks=1, minutes=30), 30)
+        medico_ocupado = _agendar(pessoas, medico, 'Sala 3', inicio + timedelta(weeks=3), 60)
+        ocorrencias = verificar_serie(gerar_ocorrencias(inicio, 'semanal', 5), 60, 'Sala 1', medico)
+        assert [o.conflito.id if o.conflito else None for o in ocorrencias] == \
+            [None, sala_ocupada, None, medico_ocupado, None]
+
+        serie_id = criar_serie(ocorrencias, paciente, medico, 'Sala 1', 60, 'Série')
+        db.session.commit()
+        gravados = _da_serie(serie_id)
+        assert [a.data_hora for a in gravados] == [inicio + timedelta(weeks=i) for i in (0, 2, 4)]
+        assert {(a.paciente_id, a.medico_id, a.sala, a.duracao, a.observacoes) for a in gravados} == \
+            {(paciente, medico, 'Sala 1', 60, 'Série')}
+        # Cada chamada abre uma série nova, mesmo sem nada para gravar
+        assert criar_serie(ocorrencias[1:2], paciente, medico, 'Sala 1', 60) != serie_id
+
+
+def test_rota_grava_a_serie_dentro_do_orcamento(app, pessoas):
+    paciente, _, _ = pessoas
+    with app.app_context():
+        db.session.add(User(username='medico_serie', senha=generate_password_hash('serie'),
+                            nome_completo='Dr. Série', funcao='médico'))
+        db.session.commit()
+    cliente = app.test_client()
+    assert cliente.post('/login', data={'username': 'medico_serie', 'password': 'serie'}).status_code == 302
+
+    # Com o orçamento estrito, um INSERT por ocorrência levantaria OrcamentoExcedido aqui
+    resposta = cliente.post('/agendamento', data={
+        'paciente_id': paciente, 'sala': 'Sala 2', 'data_hora': '2030-06-03T11:00', 'duracao': '30',
+        'recorrencia': 'quinzenal', 'ocorrencias': 12})
+    assert resposta.status_code == 302
+    assert int(resposta.headers[CABECALHO]) <= orcamento_da_rota(app, 'main.agendamento')
+    with app.app_context():
+        gravados = db.session.scalars(db.select(Appointment).filter(Appointment.data_hora >= datetime(2030, 6, 3),
+                                                                   Appointment.sala == 'Sala 2')).all()
+        assert len(gravados) == 12
+        assert len({a.serie_id for a in gravados}) == 1 and gravados[0].serie_id
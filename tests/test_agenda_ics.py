@@ -0,0 +1,74 @@
+"""Agenda do médico (calendar_feed.py): troca do link do feed .ics e ETags por médico."""
+import re
+from datetime import date, datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import Appointment, Patient, User
+
+SENHA = 'agenda-ics'
+
+
+@pytest.fixture(scope='module')
+def medico(app):
+    with app.app_context():
+        usuario = User(username='medico_ics', senha=generate_password_hash(SENHA), nome_completo='Dr. Feed',
+                       funcao='médico')
+        db.session.add(usuario)
+        db.session.commit()
+    cliente = app.test_client()
+    assert cliente.post('/login', data={'username': 'medico_ics', 'password': SENHA}).status_code == 302
+    return cliente
+
+
+def _link(cliente):
+    html = cliente.get('/lista_agendamentos').get_data(as_text=True)
+    return re.search(r'href="http://localhost(/agenda/[^"]+\.ics)"', html).group(1)
+
+
+def test_novo_link_invalida_o_anterior(app, medico):
+    anonimo = app.test_client()
+    antigo = _link(medico)
+    assert anonimo.get(antigo).status_code == 200
+
+    assert medico.post('/lista_agendamentos/novo_link').status_code == 302
+    novo = _link(medico)
+    assert novo != antigo
+    assert anonimo.get(antigo).status_code == 404
+    assert anonimo.get(novo).status_code == 200
+
+
+def test_token_adulterado(app):
+    assert app.test_client().get('/agenda/1.abc.ics').status_code == 404
+
+
+def test_etag_da_agenda_so_muda_com_os_agendamentos_do_medico(app, medico):
+    with app.app_context():
+        medico_id = db.session.scalar(db.select(User.id).filter_by(username='medico_ics'))
+        outro = User(username='outro_ics', senha='-', nome_completo='Dra. Outra', funcao='médico')
+        paciente = Patient(nome_completo='Paciente Feed', data_nascimento=date(1980, 1, 1), endereco='-',
+                           email='feed@example.com', telefone='0', escolaridade='medio', estado_civil='solteiro',
+                           servico_buscado='terapia')
+        db.session.add_all([outro, paciente])
+        db.session.commit()
+        outro_id, paciente_id = outro.id, paciente.id
+
+    def agendar(medico_id, hora):
+        with app.app_context():
+            db.session.add(Appointment(paciente_id=paciente_id, medico_id=medico_id, sala='Sala 1', duracao=30,
+                                       data_hora=datetime(2030, 8, 1, hora)))
+            db.session.commit()
+
+    urls = ['/lista_agendamentos', f'/api/agenda?medico={medico_id}']
+    etags = {url: medico.get(url).headers['ETag'] for url in [*urls, '/api/agenda']}
+    agendar(outro_id, 9)
+    for url in urls:
+        assert medico.get(url, headers={'If-None-Match': etags[url]}).status_code == 304, url
+    # Sem filtro por médico, /api/agenda depende de todos os agendamentos
+    assert medico.get('/api/agenda', headers={'If-None-Match': etags['/api/agenda']}).status_code == 200
+
+    agendar(medico_id, 10)
+    for url in urls:
+        assert medico.get(url, headers={'If-None-Match': etags[url]}).status_code == 200, url
@@ -0,0 +1,60 @@
+"""Arquivamento (archive.py): ids reaproveitados e busca nas evoluções arquivadas."""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from sqlalchemy import text
+
+from archive import IdsReaproveitados, IndiceDeBuscaIncompleto, arquivar
+from extensions import db
+from models import Appointment, MedicalRecord, Patient, User
+from record_search import buscar_evolucoes, reindexar
+
+
+def test_evolucoes_arquivadas_continuam_na_busca(app):
+    with app.app_context():
+        medico = User(username='medico_busca_arquivo', senha='-', nome_completo='Dr. Busca', funcao='médico')
+        paciente = Patient(nome_completo='Paciente Busca', data_nascimento=date(1980, 1, 1), endereco='-',
+                           email='busca.arquivo@example.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia')
+        db.session.add_all([medico, paciente])
+        db.session.flush()
+        db.session.add_all(MedicalRecord(paciente_id=paciente.id, medico_id=medico.id, data_sessao=data,
+                                         evolucao='Relata insônia persistente.')
+                           for data in (datetime(2020, 3, 1, 10), datetime.now()))
+        db.session.commit()
+        corte = datetime(2021, 1, 1)
+
+        assert arquivar(corte)['medical_record'] == 1
+        resultados, _ = buscar_evolucoes('insônia')
+        assert sorted(r['arquivada'] for r in resultados) == [0, 1]
+
+        # Índice principal esvaziado: arquivar apagaria linhas que ele não conhece
+        db.session.execute(text("INSERT INTO evolucao_busca (evolucao_busca) VALUES ('delete-all')"))
+        db.session.commit()
+        with pytest.raises(IndiceDeBuscaIncompleto):
+            arquivar(corte)
+        assert reindexar() == 2
+        assert arquivar(corte)['medical_record'] == 0
+
+
+def test_para_se_ids_do_arquivo_podem_ser_reaproveitados(app):
+    with app.app_context():
+        medico = User(username='medico_arquivo', senha='-', nome_completo='Dr. Arquivo', funcao='médico')
+        paciente = Patient(nome_completo='Paciente Arquivo', data_nascimento=date(1980, 1, 1), endereco='-',
+                           email='arquivo@example.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia')
+        db.session.add_all([medico, paciente])
+        db.session.flush()
+        antigos = [Appointment(paciente_id=paciente.id, medico_id=medico.id, sala='Sala 1', duracao=30,
+                               data_hora=datetime(2020, 1, 1, 9) + timedelta(days=i)) for i in range(3)]
+        db.session.add_all(antigos)
+        db.session.commit()
+        corte = datetime(2021, 1, 1)
+
+        assert arquivar(corte)['appointment'] == 2
+        # A linha de maior id (não arquivada) sai; o próximo INSERT reaproveitaria um id arquivado
+        db.session.delete(antigos[-1])
+        db.session.commit()
+        with pytest.raises(IdsReaproveitados):
+            arquivar(corte)
@@ -0,0 +1,35 @@
+"""Busca nas evoluções (record_search.py): índice reconstruído e triggers de UPDATE/DELETE."""
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from extensions import db
+from models import MedicalRecord, Patient, User
+from record_search import buscar_evolucoes, reindexar
+
+
+def test_reindexar_e_alterar_evolucoes(app):
+    with app.app_context():
+        medico = User(username='medico_busca', senha='-', nome_completo='Dr. Busca', funcao='médico')
+        paciente = Patient(nome_completo='Paciente Busca', data_nascimento=date(1980, 1, 1), endereco='-',
+                           email='busca@example.com', telefone='0', escolaridade='medio',
+                           estado_civil='solteiro', servico_buscado='terapia')
+        db.session.add_all([medico, paciente])
+        db.session.flush()
+        registros = [MedicalRecord(paciente_id=paciente.id, medico_id=medico.id, data_sessao=datetime(2025, 1, 1),
+                                   evolucao=texto) for texto in ('Relata insônia.', 'Queixa de ansiedade.')]
+        db.session.add_all(registros)
+        db.session.commit()
+        # Como um banco migrado antes de o índice ser preenchido
+        db.session.execute(text("INSERT INTO evolucao_busca (evolucao_busca) VALUES ('delete-all')"))
+        db.session.commit()
+        assert buscar_evolucoes('insonia')[0] == []
+
+        assert reindexar() == 2
+        registros[0].evolucao = 'Relata insônia e pesadelos.'
+        db.session.delete(registros[1])
+        db.session.commit()
+
+        assert [r['id'] for r in buscar_evolucoes('pesadelos')[0]] == [registros[0].id]
+        assert buscar_evolucoes('ansiedade')[0] == []
+        db.session.execute(text("INSERT INTO evolucao_busca (evolucao_busca) VALUES ('integrity-check')"))
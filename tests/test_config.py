@@ -0,0 +1,11 @@
+"""Verificações de configuração feitas por create_app."""
+import pytest
+
+from app import create_app
+from config import ProductionConfig
+
+
+def test_producao_sem_secret_key_nao_inicia(monkeypatch):
+    monkeypatch.setattr(ProductionConfig, 'SECRET_KEY', None)
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app('production')
@@ -0,0 +1,23 @@
+"""Dados sintéticos (synthetic_data.py): recusa em produção."""
+from extensions import db
+from models import Patient
+
+ARGUMENTOS = ['gerar-dados', '--pacientes', '3', '--agendamentos', '0', '--registros', '0', '--medicos', '1']
+
+
+def _pacientes(app):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count()).select_from(Patient))
+
+
+def test_recusa_em_producao(app):
+    resultado = app.test_cli_runner().invoke(args=ARGUMENTOS, env={'CLINICA_ENV': 'production'})
+    assert resultado.exit_code != 0
+    assert 'production' in resultado.output
+    assert _pacientes(app) == 0
+
+
+def test_forcar_em_producao(app):
+    resultado = app.test_cli_runner().invoke(args=[*ARGUMENTOS, '--forcar'], env={'CLINICA_ENV': 'production'})
+    assert resultado.exit_code == 0, resultado.output
+    assert _pacientes(app) == 3
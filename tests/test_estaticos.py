@@ -0,0 +1,106 @@
+"""Arquivos estáticos compilados (assets.py): nomes com hash, url() do CSS, .br/.gz e --limpar."""
+import gzip
+import re
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from assets import PASTA_COMPILADOS, construir
+from extensions import db
+from models import User
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASH = '[0-9a-f]{10}'
+JS = b'function ola() { return "Consultas de hoje"; }\n' * 50
+PNG = bytes(range(256))
+
+
+@pytest.fixture
+def static(app, tmp_path, monkeypatch):
+    """static/ temporário com um CSS que referencia uma imagem, um JS e a imagem."""
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'img').mkdir()
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'img' / 'logo.png').write_bytes(PNG)
+    (tmp_path / 'js' / 'app.js').write_bytes(JS)
+    (tmp_path / 'css' / 'site.css').write_text(
+        '.a { background: url("../img/logo.png"); }\n'
+        '.b { background: url(/static/img/logo.png?v=1); }\n'
+        '.c { background: url(https://cdn.example.com/x.png); }\n' * 20)
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    return tmp_path
+
+
+def test_nomes_com_hash_e_url_do_css(static):
+    manifesto = construir(str(static))
+    assert set(manifesto) == {'css/site.css', 'img/logo.png', 'js/app.js'}
+    for nome, item in manifesto.items():
+        base, extensao = nome.rsplit('.', 1)
+        assert re.fullmatch(rf'{base}\.{HASH}\.{extensao}', item['arquivo'])
+        assert (static / PASTA_COMPILADOS / item['arquivo']).is_file()
+
+    logo = manifesto['img/logo.png']['arquivo']
+    css = (static / PASTA_COMPILADOS / manifesto['css/site.css']['arquivo']).read_text()
+    # Relativo ao CSS compilado, que fica em dist/css; a query string e as aspas são mantidas
+    assert f'url("../{logo}")' in css
+    assert f'url(../{logo}?v=1)' in css
+    assert 'url(https://cdn.example.com/x.png)' in css
+    assert 'img/logo.png' not in css
+
+
+def test_versoes_comprimidas(static):
+    manifesto = construir(str(static))
+    esperadas = ['br', 'gzip'] if brotli else ['gzip']
+    assert manifesto['js/app.js']['codificacoes'] == esperadas
+    # Imagens não são comprimidas
+    assert manifesto['img/logo.png']['codificacoes'] == []
+    compilado = static / PASTA_COMPILADOS / manifesto['js/app.js']['arquivo']
+    assert gzip.decompress(compilado.with_name(compilado.name + '.gz').read_bytes()) == JS
+
+
+def test_limpar_remove_compilacoes_anteriores(app, static):
+    antigo = construir(str(static))['js/app.js']['arquivo']
+    (static / 'js' / 'app.js').write_bytes(JS + b'// nova versao\n')
+
+    cli = app.test_cli_runner()
+    assert cli.invoke(args=['construir-estaticos']).exit_code == 0
+    assert (static / PASTA_COMPILADOS / antigo).is_file()
+
+    resultado = cli.invoke(args=['construir-estaticos', '--limpar'])
+    assert resultado.exit_code == 0, resultado.output
+    dist = static / PASTA_COMPILADOS
+    assert not list(dist.glob(antigo + '*'))
+    assert len(list((dist / 'js').glob('app.*.js'))) == 1
+    assert (dist / 'manifest.json').is_file()
+
+
+def test_escolhe_a_codificacao_e_varia_so_por_ela(app, static, monkeypatch):
+    manifesto = construir(str(static))
+    monkeypatch.setitem(app.extensions['estaticos'], 'manifesto', manifesto)
+    with app.app_context():
+        db.session.add(User(username='estaticos', senha=generate_password_hash('estaticos'),
+                            nome_completo='Estáticos', funcao='médico'))
+        db.session.commit()
+    logado = app.test_client()
+    assert logado.post('/login', data={'username': 'estaticos', 'password': 'estaticos'}).status_code == 302
+
+    url = f'/static/dist/{manifesto["js/app.js"]["arquivo"]}'
+    for cliente in (app.test_client(), logado):
+        for aceita, codificacao in [('br, gzip', 'br' if brotli else 'gzip'), ('gzip', 'gzip'), ('', None)]:
+            resposta = cliente.get(url, headers={'Accept-Encoding': aceita})
+            assert resposta.status_code == 200
+            assert resposta.content_encoding == codificacao
+            assert resposta.headers['Vary'] == 'Accept-Encoding'
+            assert 'Set-Cookie' not in resposta.headers
+            assert 'immutable' in resposta.headers['Cache-Control']
+            corpo = resposta.get_data()
+            resposta.close()
+            if codificacao == 'br':
+                corpo = brotli.decompress(corpo)
+            elif codificacao == 'gzip':
+                corpo = gzip.decompress(corpo)
+            assert corpo == JS
@@ -0,0 +1,23 @@
+"""Exportação do prontuário em DOCX (exporters.py)."""
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+
+from exporters import escrever_docx
+
+docx = pytest.importorskip('docx')
+
+
+def test_docx_com_texto_parecido_com_xml():
+    destino = BytesIO()
+    nome = 'Ana </w:p> <w:sectPr> & Cia'
+    escrever_docx(destino, nome, [(datetime(2025, 1, 2), 'primeira\n<w:body>'), (datetime(2025, 1, 3), 'segunda')])
+    destino.seek(0)
+    documento = docx.Document(destino)
+    assert [p.text for p in documento.paragraphs] == [
+        f'Prontuário de {nome}',
+        'Data: 02/01/2025', 'Evolução: primeira\n<w:body>', '---',
+        'Data: 03/01/2025', 'Evolução: segunda', '---',
+    ]
+    assert len(documento.sections) == 1
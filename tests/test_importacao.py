@@ -0,0 +1,32 @@
+"""Importação de pacientes (patient_import.py): codificação do CSV."""
+import pytest
+
+from extensions import db
+from models import Patient
+from patient_import import ArquivoInvalido, importar_pacientes
+
+CABECALHO = ('nome_completo;data_nascimento;paciente_dependente;endereco;email;telefone;'
+             'escolaridade;estado_civil;servico_buscado\n')
+
+
+def _csv(tmp_path, conteudo):
+    caminho = tmp_path / 'pacientes.csv'
+    caminho.write_bytes(conteudo)
+    return str(caminho)
+
+
+def test_csv_em_cp1252(app, tmp_path):
+    linha = 'João Conceição;1985-02-01;não;Rua São Bento;joao@example.com;(11) 91234-5678;médio;casado;terapia\n'
+    caminho = _csv(tmp_path, (CABECALHO + linha).encode('cp1252'))
+    with app.app_context():
+        resultado = importar_pacientes(caminho, str(tmp_path / 'erros.csv'))
+        assert resultado.importadas == 1
+        assert db.session.scalar(db.select(Patient.nome_completo).filter_by(email='joao@example.com')) \
+            == 'João Conceição'
+
+
+def test_codificacao_desconhecida(app, tmp_path):
+    # 0x81 não existe em utf-8 (sozinho) nem em cp1252
+    caminho = _csv(tmp_path, CABECALHO.encode() + b'Jo\x81o;1985-02-01;nao;Rua;x@example.com;1;medio;casado;terapia\n')
+    with app.app_context(), pytest.raises(ArquivoInvalido, match='Codificação'):
+        importar_pacientes(caminho, str(tmp_path / 'erros.csv'))
@@ -0,0 +1,30 @@
+"""Exportações em lote (jobs.py): jobs interrompidos por um reinício do servidor."""
+from extensions import db
+from jobs import interromper_jobs_orfaos
+from models import ExportJob, User
+
+
+def test_jobs_orfaos_viram_erro(app):
+    with app.app_context():
+        usuario = User(username='exportador', senha='-', nome_completo='Exportador', funcao='administrador')
+        db.session.add(usuario)
+        db.session.flush()
+        jobs = [ExportJob(formato='docx', status=status, criado_por_id=usuario.id)
+                for status in ('pendente', 'executando', 'concluido')]
+        db.session.add_all(jobs)
+        db.session.commit()
+
+        assert interromper_jobs_orfaos() == 2
+        assert [job.status for job in jobs] == ['erro', 'erro', 'concluido']
+        assert jobs[1].erro and jobs[1].concluido_em
+
+
+def test_comando_interromper_exportacoes(app):
+    with app.app_context():
+        usuario = db.session.scalar(db.select(User).filter_by(username='exportador'))
+        db.session.add(ExportJob(formato='xlsx', status='executando', criado_por_id=usuario.id))
+        db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=['interromper-exportacoes'])
+    assert resultado.exit_code == 0, resultado.output
+    assert resultado.output.startswith('1 exportações')
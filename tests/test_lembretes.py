@@ -0,0 +1,82 @@
+"""Lembretes de consulta (reminders.py): caixa de saída Maildir, sem repetir lembretes."""
+import mailbox
+from datetime import date, datetime
+
+import pytest
+
+from extensions import db
+from models import Appointment, Patient, User
+from reminders import LOTES_MINIMOS_POOL, enviar_lembretes
+
+
+@pytest.fixture
+def caixa(app, tmp_path, monkeypatch):
+    pasta = tmp_path / 'lembretes'
+    monkeypatch.setitem(app.config, 'LEMBRETES_DIR', str(pasta))
+    return pasta
+
+
+@pytest.fixture(scope='module')
+def pessoas(app):
+    """(médico, pacientes com e-mail, com só telefone e sem contato)."""
+    with app.app_context():
+        medico = User(username='medico_lembretes', senha='-', nome_completo='Dra. Lembrete', funcao='médico')
+        contatos = [('email@example.com', '(11) 90000-0001'), ('', '(11) 90000-0002'), ('', ' ')]
+        pacientes = [Patient(nome_completo=f'Paciente Lembrete {i}', data_nascimento=date(1980, 1, 1), endereco='-',
+                             email=email, telefone=telefone, escolaridade='medio', estado_civil='solteiro',
+                             servico_buscado='terapia')
+                     for i, (email, telefone) in enumerate(contatos)]
+        db.session.add_all([medico, *pacientes])
+        db.session.commit()
+        return medico.id, [paciente.id for paciente in pacientes]
+
+
+def _agendar(pessoas, horarios):
+    medico, pacientes = pessoas
+    agendamentos = [Appointment(paciente_id=pacientes[i % len(pacientes)], medico_id=medico, sala='Sala 1',
+                                data_hora=horario, duracao=30) for i, horario in enumerate(horarios)]
+    db.session.add_all(agendamentos)
+    db.session.commit()
+    return agendamentos
+
+
+def _message_ids(pasta):
+    return sorted(mensagem['Message-ID'] for mensagem in mailbox.Maildir(str(pasta), create=False))
+
+
+def _message_id(agendamento):
+    return f'<lembrete-{agendamento.id}-{agendamento.data_hora:%Y%m%d%H%M}@clinica.local>'
+
+
+def test_segunda_execucao_nao_repete_e_remarcado_recebe_novo(app, pessoas, caixa):
+    dia = date(2030, 7, 1)
+    with app.app_context():
+        agendamentos = _agendar(pessoas, [datetime(2030, 7, 1, hora) for hora in (9, 10, 11)])
+
+        assert enviar_lembretes(app, dia, workers=1) == {'gravados': 2, 'sem_contato': 1}
+        assert _message_ids(caixa) == sorted(_message_id(a) for a in agendamentos[:2])
+
+        assert enviar_lembretes(app, dia, workers=1) == {'gravados': 0, 'sem_contato': 1}
+        assert len(_message_ids(caixa)) == 2
+
+        # Remarcado no mesmo dia: o horário avisado mudou, então sai um lembrete novo, com outro Message-ID
+        antigo = _message_id(agendamentos[1])
+        agendamentos[1].data_hora = datetime(2030, 7, 1, 15, 30)
+        db.session.commit()
+        assert enviar_lembretes(app, dia, workers=1)['gravados'] == 1
+        ids = _message_ids(caixa)
+        assert len(ids) == 3 and antigo in ids and _message_id(agendamentos[1]) in ids
+
+
+def test_lotes_no_pool_de_processos(app, pessoas, caixa):
+    dia = date(2030, 7, 2)
+    with app.app_context():
+        _, pacientes = pessoas
+        # Só pacientes com contato, um lembrete por lote: lotes suficientes para usar o pool ('spawn')
+        horarios = [datetime(2030, 7, 2, 9 + i) for i in range(2 * LOTES_MINIMOS_POOL)]
+        agendamentos = _agendar((pessoas[0], pacientes[:2]), horarios)
+
+        assert enviar_lembretes(app, dia, lote=1, workers=2) == {'gravados': len(horarios), 'sem_contato': 0}
+        assert _message_ids(caixa) == sorted(_message_id(a) for a in agendamentos)
+        assert enviar_lembretes(app, dia, lote=1, workers=2)['gravados'] == 0
+        assert len(_message_ids(caixa)) == len(horarios)
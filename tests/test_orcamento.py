@@ -0,0 +1,121 @@
+"""Orçamento de consultas (query_budget.py) de todas as rotas com @orcamento_consultas.
+
+Roda no perfil de testes com SQL_ORCAMENTO_ESTRITO: uma rota que passa do
+orçamento levanta OrcamentoExcedido no cliente de teste e o teste falha (numa
+resposta em fluxo, como o feed .ics, quando ela é fechada). Os
+dados têm vários pacientes, agendamentos, evoluções e exportações, para um
+carregamento preguiçoso por linha aparecer na contagem.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from calendar_feed import token_agenda
+from extensions import db
+from models import Appointment, ExportJob, MedicalRecord, Patient, User
+from query_budget import CABECALHO, OrcamentoExcedido, orcamento_da_rota
+
+SENHA = 'orcamento'
+PACIENTES = 5
+
+
+@pytest.fixture(scope='module')
+def dados(app):
+    """Ids e URLs das rotas, depois de gravar os dados de teste."""
+    with app.app_context():
+        medico = User(username='medico', senha=generate_password_hash(SENHA), nome_completo='Dra. Orçamento',
+                      funcao='médico')
+        admin = User(username='admin', senha=generate_password_hash(SENHA), nome_completo='Administração',
+                     funcao='administrador')
+        db.session.add_all([medico, admin])
+        pacientes = [Patient(nome_completo=f'Paciente {i}', data_nascimento=date(1990, 1, 1 + i),
+                             endereco='Rua A', email=f'paciente{i}@example.com', telefone='(11) 90000-0000',
+                             escolaridade='medio', estado_civil='solteiro', servico_buscado='terapia')
+                     for i in range(PACIENTES)]
+        db.session.add_all(pacientes)
+        db.session.flush()
+        amanha = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for i, paciente in enumerate(pacientes):
+            db.session.add(Appointment(paciente_id=paciente.id, medico_id=medico.id, sala=f'Sala {i % 2 + 1}',
+                                       data_hora=amanha + timedelta(hours=i), duracao=50))
+            db.session.add_all(MedicalRecord(paciente_id=paciente.id, medico_id=medico.id,
+                                             data_sessao=datetime(2025, 1, 1 + j, 10),
+                                             evolucao=f'Sessão {j}: paciente relata ansiedade. ' * 20)
+                               for j in range(3))
+        db.session.add_all(ExportJob(formato='xlsx', status='concluido', total=PACIENTES, concluidos=PACIENTES,
+                                     criado_por_id=admin.id) for _ in range(3))
+        db.session.commit()
+        paciente_id = pacientes[0].id
+        registro_id = db.session.scalar(db.select(MedicalRecord.id).filter_by(paciente_id=paciente_id))
+        token = token_agenda(medico.id)
+    return {
+        'medico': [
+            ('main.dashboard', '/dashboard'),
+            ('main.lista_pacientes', '/lista_pacientes'),
+            ('main.api_busca_pacientes', '/api/pacientes/busca?q=Paciente'),
+            ('main.prontuario', f'/prontuario/{paciente_id}'),
+            ('main.prontuario_evolucoes', f'/prontuario/{paciente_id}/evolucoes'),
+            ('main.prontuario_evolucao', f'/prontuario/{paciente_id}/evolucoes/{registro_id}'),
+            ('main.busca_evolucoes', '/busca_evolucoes?q=ansiedade'),
+            ('main.agendamento', '/agendamento'),
+            ('main.api_horarios_livres', '/api/horarios_livres'),
+            ('main.lista_agendamentos', '/lista_agendamentos'),
+            ('main.api_agenda', '/api/agenda'),
+            ('main.exportar_docx', f'/exportar_docx/{paciente_id}'),
+            ('main.exportar_xlsx', f'/exportar_xlsx/{paciente_id}'),
+        ],
+        'admin': [
+            ('main.dashboard_detalhado', '/dashboard_detalhado'),
+            ('main.api_estatisticas', '/api/estatisticas'),
+            ('main.exportacoes', '/jobs'),
+        ],
+        None: [('main.agenda_ics', f'/agenda/{token}.ics')],
+    }
+
+
+def _cliente(app, usuario):
+    cliente = app.test_client()
+    if usuario:
+        resposta = cliente.post('/login', data={'username': usuario, 'password': SENHA})
+        assert resposta.status_code == 302
+    return cliente
+
+
+def test_todas_as_rotas_com_orcamento_sao_cobertas(app, dados):
+    cobertas = {endpoint for rotas in dados.values() for endpoint, _ in rotas}
+    com_orcamento = {endpoint for endpoint in app.view_functions if orcamento_da_rota(app, endpoint) is not None}
+    assert com_orcamento - cobertas == set()
+
+
+@pytest.mark.parametrize('usuario', ['medico', 'admin', None])
+def test_rotas_cabem_no_orcamento(app, dados, usuario):
+    cliente = _cliente(app, usuario)
+    for endpoint, url in dados[usuario]:
+        # Com o orçamento estrito, uma rota acima dele levanta OrcamentoExcedido aqui
+        # (nas respostas em fluxo, ao fechá-las depois de gerar o corpo)
+        resposta = cliente.get(url)
+        assert resposta.status_code == 200, url
+        assert int(resposta.headers[CABECALHO]) <= orcamento_da_rota(app, endpoint), url
+        resposta.get_data()
+        resposta.close()
+
+
+def test_orcamento_excedido_levanta(app, dados, monkeypatch):
+    monkeypatch.setattr(app.view_functions['main.dashboard'], 'orcamento_sql', 0)
+    cliente = _cliente(app, 'medico')
+    with pytest.raises(OrcamentoExcedido):
+        cliente.get('/dashboard')
+
+
+def test_resposta_em_fluxo_conta_as_consultas_do_gerador(app, dados, monkeypatch):
+    # O feed .ics consulta os agendamentos enquanto o corpo é gerado, depois do after_request
+    endpoint, url = dados[None][0]
+    resposta = _cliente(app, None).get(url)
+    antes_do_corpo = int(resposta.headers[CABECALHO])
+    resposta.close()
+    monkeypatch.setattr(app.view_functions[endpoint], 'orcamento_sql', antes_do_corpo)
+    resposta = _cliente(app, None).get(url)
+    assert resposta.get_data()
+    with pytest.raises(OrcamentoExcedido):
+        resposta.close()
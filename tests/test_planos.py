@@ -0,0 +1,33 @@
+"""Planos de consulta e orçamentos das rotas principais (a verificação de `flask verificar-planos`)."""
+import pytest
+
+from query_plans import banco_de_verificacao, coletar_consultas, falhas, varreduras_completas
+
+
+@pytest.fixture(scope='module')
+def verificacao():
+    with banco_de_verificacao() as app:
+        respostas = {}
+        por_rota = coletar_consultas(app, respostas)
+        yield app, por_rota, respostas, falhas(app, por_rota)
+
+
+def test_rotas_respondem(verificacao):
+    _, _, respostas, _ = verificacao
+    assert {rota: status for rota, status in respostas.items() if status >= 400} == {}
+
+
+def test_consultas_usam_indices(verificacao):
+    _, _, _, encontradas = verificacao
+    assert [f'{rota}: {mensagem}' for tipo, rota, mensagem in encontradas if tipo == 'plano'] == []
+
+
+def test_rotas_cabem_no_orcamento(verificacao):
+    _, _, _, encontradas = verificacao
+    assert [f'{rota}: {mensagem}' for tipo, rota, mensagem in encontradas if tipo == 'orcamento'] == []
+
+
+def test_varredura_completa_e_detectada():
+    plano = ['SCAN patient', 'SEARCH appointment USING INDEX ix_appointment_data_hora (data_hora>?)',
+             'CO-ROUTINE historico', 'SCAN historico']
+    assert varreduras_completas(plano) == ['patient']
@@ -0,0 +1,20 @@
+"""Ponto de entrada WSGI.
+
+    gunicorn -w 4 --preload wsgi:app
+
+Com --preload a aplicação é criada uma vez no processo mestre e os workers a
+herdam pelo fork; com PRELOAD_EXPORTERS=1 as bibliotecas de exportação também
+são importadas antes do fork e compartilhadas entre os workers.
+
+Exportações em lote que estavam em andamento quando o servidor parou não são
+marcadas como erro aqui: este módulo é importado por cada worker sem --preload
+(e por cada worker reiniciado), que marcaria os jobs vivos dos outros. Isso é
+feito uma vez no mestre, em gunicorn.conf.py (ver jobs.py).
+"""
+from app import create_app
+
+app = create_app()
+
+if app.config['PRELOAD_EXPORTERS']:
+    from exporters import carregar_bibliotecas
+    carregar_bibliotecas()